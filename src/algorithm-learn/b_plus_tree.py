@@ -7,27 +7,50 @@ B+树是一种自平衡的树数据结构，常用于数据库和文件系统中
 3. 保持树的高度平衡，所有叶子节点在同一层
 """
 
-from typing import List, Optional, Tuple, Union, Any
+import heapq
+from array import array
+import math
+import mmap
+import operator
+import os
+from bisect import bisect_left, bisect_right
+import pickle
+import struct
+import sys
+import tempfile
+import weakref
+from itertools import chain, islice
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 
 class BPlusTreeNode:
     """B+树节点基类"""
     
+    # 使用 __slots__ 去掉每个节点的 __dict__，节省内存并加快属性访问
+    __slots__ = ('is_leaf', 'keys', 'parent', 'epoch', 'summary')
+    
     def __init__(self, is_leaf: bool = False):
         self.is_leaf = is_leaf
         self.keys: List[Any] = []
         self.parent: Optional['BPlusTreeNode'] = None
+        self.epoch = 0  # 创建节点时树的快照纪元，小于当前纪元说明可能被快照共享
+        self.summary: Optional[Tuple[Any, ...]] = None  # 子树聚合值（启用聚合时维护），父节点据此汇总各子节点
     
     def is_full(self, order: int) -> bool:
         """检查节点是否已满"""
         return len(self.keys) >= order
     
+    def min_keys(self, order: int) -> int:
+        """非根节点至少需要的键数"""
+        return order // 2
+    
     def is_underflow(self, order: int) -> bool:
         """检查节点是否过少（需要合并）"""
         # 根节点特殊处理
         if self.parent is None:
             return len(self.keys) < 1  # 根节点至少有一个键（除非树为空）
-        return len(self.keys) < (order // 2)
+        return len(self.keys) < self.min_keys(order)
     
     def __repr__(self) -> str:
         return f"{'Leaf' if self.is_leaf else 'Internal'}Node(keys={self.keys})"
@@ -36,20 +59,23 @@ class BPlusTreeNode:
 class BPlusTreeLeafNode(BPlusTreeNode):
     """B+树叶节点"""
     
+    __slots__ = ('values', 'next_leaf', 'prev_leaf')
+    
     def __init__(self):
         super().__init__(is_leaf=True)
         self.values: List[Any] = []
         self.next_leaf: Optional['BPlusTreeLeafNode'] = None  # 指向下一个叶子节点
+        self.prev_leaf: Optional['BPlusTreeLeafNode'] = None  # 指向上一个叶子节点（逆序扫描）
     
-    def insert(self, key: Any, value: Any, order: int) -> Tuple[bool, Optional['BPlusTreeLeafNode']]:
+    def insert(self, key: Any, value: Any, order: int,
+               split_at: Optional[int] = None) -> Tuple[bool, Optional['BPlusTreeLeafNode']]:
         """
         向叶子节点插入键值对
+        split_at: 需要分裂时左侧保留的键数，None 表示对半分裂
         返回: (是否成功, 分裂产生的新节点)
         """
-        # 找到插入位置
-        idx = 0
-        while idx < len(self.keys) and self.keys[idx] < key:
-            idx += 1
+        # 二分查找插入位置
+        idx = bisect_left(self.keys, key)
         
         # 如果键已存在，更新值
         if idx < len(self.keys) and self.keys[idx] == key:
@@ -57,19 +83,23 @@ class BPlusTreeLeafNode(BPlusTreeNode):
             return True, None
         
         # 插入键值对
-        self.keys.insert(idx, key)
+        try:
+            self.keys.insert(idx, key)
+        except OverflowError as e:
+            raise _key_range_error(self, key) from e
         self.values.insert(idx, value)
         
         # 检查是否需要分裂
         if self.is_full(order):
-            return True, self._split(order)
+            return True, self._split(order, split_at)
         
         return True, None
     
-    def _split(self, order: int) -> 'BPlusTreeLeafNode':
-        """分裂叶子节点"""
-        mid = order // 2
-        new_leaf = BPlusTreeLeafNode()
+    def _split(self, order: int, split_at: Optional[int] = None) -> 'BPlusTreeLeafNode':
+        """分裂叶子节点，左侧保留 split_at 个键（默认 order // 2）"""
+        mid = order // 2 if split_at is None else split_at
+        new_leaf = type(self)()
+        new_leaf.epoch = self.epoch
         
         # 将后半部分的键值对移动到新节点
         new_leaf.keys = self.keys[mid:]
@@ -79,41 +109,48 @@ class BPlusTreeLeafNode(BPlusTreeNode):
         
         # 更新链表指针
         new_leaf.next_leaf = self.next_leaf
+        new_leaf.prev_leaf = self
+        if self.next_leaf is not None:
+            self.next_leaf.prev_leaf = new_leaf
         self.next_leaf = new_leaf
         new_leaf.parent = self.parent
         
         return new_leaf
     
+    def subtree_size(self) -> int:
+        """以该节点为根的子树中的键值对数量"""
+        return len(self.keys)
+    
     def search(self, key: Any) -> Optional[Any]:
         """在叶子节点中搜索键"""
-        try:
-            idx = self.keys.index(key)
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
             return self.values[idx]
-        except ValueError:
-            return None
+        return None
     
     def delete(self, key: Any, order: int) -> bool:
         """从叶子节点删除键值对"""
-        try:
-            idx = self.keys.index(key)
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
             self.keys.pop(idx)
             self.values.pop(idx)
             return True
-        except ValueError:
-            return False
+        return False
     
     def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
         """范围查询"""
         result = []
         current = self
         
+        # 只在第一个叶子中二分定位起点，之后的叶子从头开始
+        start = bisect_left(current.keys, start_key)
         while current is not None:
-            for i, key in enumerate(current.keys):
-                if start_key <= key <= end_key:
-                    result.append((key, current.values[i]))
-                elif key > end_key:
-                    return result
+            end = bisect_right(current.keys, end_key)
+            result.extend(zip(current.keys[start:end], current.values[start:end]))
+            if end < len(current.keys):
+                return result
             current = current.next_leaf
+            start = 0
         
         return result
 
@@ -121,23 +158,31 @@ class BPlusTreeLeafNode(BPlusTreeNode):
 class BPlusTreeInternalNode(BPlusTreeNode):
     """B+树内部节点"""
     
+    __slots__ = ('children', 'counts')
+    
     def __init__(self):
         super().__init__(is_leaf=False)
         self.children: List[BPlusTreeNode] = []
+        self.counts: List[int] = []  # counts[i] 为 children[i] 子树中的键值对数量（用于 rank/select）
+    
+    def subtree_size(self) -> int:
+        """以该节点为根的子树中的键值对数量"""
+        return sum(self.counts)
     
     def insert_child(self, key: Any, child: BPlusTreeNode, order: int) -> Tuple[bool, Optional[Tuple['BPlusTreeInternalNode', Any]]]:
         """
         向内部节点插入子节点
         返回: (是否成功, (分裂产生的新节点, 分裂键) 或 None)
         """
-        # 找到插入位置
-        idx = 0
-        while idx < len(self.keys) and self.keys[idx] < key:
-            idx += 1
+        # 二分查找插入位置
+        idx = bisect_left(self.keys, key)
         
-        # 插入键和子节点
+        # 插入键和子节点；child 是 children[idx] 分裂出来的，计数从左侧转移过来
+        child_size = child.subtree_size()
         self.keys.insert(idx, key)
         self.children.insert(idx + 1, child)
+        self.counts.insert(idx + 1, child_size)
+        self.counts[idx] -= child_size
         child.parent = self
         
         # 检查是否需要分裂
@@ -150,7 +195,8 @@ class BPlusTreeInternalNode(BPlusTreeNode):
     def _split(self, order: int) -> Tuple['BPlusTreeInternalNode', Any]:
         """分裂内部节点，返回新节点和分裂键"""
         mid = order // 2
-        new_internal = BPlusTreeInternalNode()
+        new_internal = type(self)()
+        new_internal.epoch = self.epoch
         
         # 分裂键
         split_key = self.keys[mid]
@@ -160,6 +206,8 @@ class BPlusTreeInternalNode(BPlusTreeNode):
         # 分裂子节点
         new_internal.children = self.children[mid + 1:]
         self.children = self.children[:mid + 1]
+        new_internal.counts = self.counts[mid + 1:]
+        self.counts = self.counts[:mid + 1]
         
         # 更新父节点引用
         for child in new_internal.children:
@@ -169,30 +217,478 @@ class BPlusTreeInternalNode(BPlusTreeNode):
         
         return new_internal, split_key
     
+    def min_keys(self, order: int) -> int:
+        """
+        非根内部节点至少需要的键数
+        
+        内部节点分裂时中间键被上推，右半部分只剩 ceil(order/2) - 1 个键，
+        即至少 order // 2 个子节点。
+        """
+        return (order - 1) // 2
+    
     def get_child_index(self, key: Any) -> int:
-        """根据键找到子节点索引"""
-        idx = 0
-        while idx < len(self.keys) and key >= self.keys[idx]:
-            idx += 1
-        return idx
+        """根据键找到子节点索引（第一个大于 key 的分隔键的位置）"""
+        return bisect_right(self.keys, key)
+
+
+def _sorted_runs(items: Iterable[Tuple[Any, Any]], run_size: int) -> Iterator[Tuple[Any, Any]]:
+    """
+    外部归并排序：按 run_size 切分输入，每段排序后写入临时文件，再多路归并流式输出
+    
+    只有一段时不落盘，直接在内存中排序。相同键保持输入顺序（稳定排序），
+    因此后出现的值排在后面。
+    """
+    iterator = iter(items)
+    run = _sorted_run(iterator, run_size)
+    pending = _sorted_run(iterator, run_size)
+    if not pending:
+        yield from run
+        return
+    
+    files = []
+    try:
+        while run:
+            spill = tempfile.TemporaryFile()
+            files.append(spill)
+            for item in run:
+                pickle.dump(item, spill, protocol=pickle.HIGHEST_PROTOCOL)
+            spill.seek(0)
+            run, pending = pending, (_sorted_run(iterator, run_size) if pending else [])
+        yield from heapq.merge(*(_read_run(spill) for spill in files), key=itemgetter(0))
+    finally:
+        for spill in files:
+            spill.close()
+
+
+def _sorted_run(iterator: Iterator[Tuple[Any, Any]], run_size: int) -> List[Tuple[Any, Any]]:
+    """读取最多 run_size 个键值对并按键排序"""
+    return sorted((tuple(item) for item in islice(iterator, run_size)), key=itemgetter(0))
+
+
+def _read_run(spill: Any) -> Iterator[Tuple[Any, Any]]:
+    """逐个读取临时文件中已排序的键值对"""
+    while True:
+        try:
+            yield pickle.load(spill)
+        except EOFError:
+            return
+
+
+# 类型化键模式支持的键类型 -> array 类型码
+KEY_TYPES = {
+    "int32": "i",
+    "int64": "q",
+    "uint32": "I",
+    "uint64": "Q",
+    "float32": "f",
+    "float64": "d",
+}
+
+_typed_leaf_classes = {}
+
+
+def _key_range_error(leaf: Any, key: Any) -> ValueError:
+    """类型化叶子的 array 放不下 key（如 uint32 的负数、int64 的 2**63）时抛出的异常"""
+    return ValueError(f"key {key!r} is out of range for key_type {getattr(leaf, 'key_type', None)!r}")
+
+# dump() 文件头：魔数, 版本, 阶数, 键类型名（空表示普通键）, 是否小端, 键数量, 数据块数量
+_DUMP_HEADER = struct.Struct('<8sII8s?qq')
+# 数据块头：叶子数, 键字节数, 值字节数；之后依次是各叶子的键数（uint32 数组）、键、值
+_DUMP_CHUNK = struct.Struct('<IQQ')
+_DUMP_MAGIC = b'BPTDUMP1'
+_DUMP_VERSION = 1
+
+
+class Aggregate(NamedTuple):
+    """
+    可维护在子树上的聚合（幺半群）
+    
+    identity 是单位元，combine 必须满足结合律（不要求交换律，左侧子树总在左参数），
+    lift 把一个 (键, 值) 映射为聚合值。
+    """
+    identity: Any
+    combine: Callable[[Any, Any], Any]
+    lift: Callable[[Any, Any], Any]
+
+
+def _combine_min(a: Any, b: Any) -> Any:
+    """以 None 为单位元的 min"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return b if b < a else a
+
+
+def _combine_max(a: Any, b: Any) -> Any:
+    """以 None 为单位元的 max"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return b if b > a else a
+
+
+def _lift_value(key: Any, value: Any) -> Any:
+    return value
+
+
+def _lift_one(key: Any, value: Any) -> int:
+    return 1
+
+
+# 内置聚合，对值做汇总；空区间的 min/max 为 None
+AGGREGATES: Dict[str, Aggregate] = {
+    "sum": Aggregate(0, operator.add, _lift_value),
+    "count": Aggregate(0, operator.add, _lift_one),
+    "min": Aggregate(None, _combine_min, _lift_value),
+    "max": Aggregate(None, _combine_max, _lift_value),
+}
+
+
+def _typed_leaf_class(base: type, key_type: str) -> type:
+    """
+    生成（并缓存）叶子键为 array 的 base 子类
+    
+    array 与 list 一样支持下标、切片、insert/pop/extend 和 bisect，叶子上的
+    分裂、借键与合并都是整段切片搬移，不需要改动；内部节点的键仍用 list（数量少）。
+    """
+    cls = _typed_leaf_classes.get((base, key_type))
+    if cls is None:
+        typecode = KEY_TYPES[key_type]
+        
+        def __init__(self):
+            base.__init__(self)
+            self.keys = array(typecode)
+        
+        cls = type(f"{base.__name__}[{key_type}]", (base,),
+                   {"__slots__": (), "__init__": __init__, "key_type": key_type})
+        _typed_leaf_classes[(base, key_type)] = cls
+    return cls
+
+
+def _iter_leaves(root: 'BPlusTreeNode') -> Iterator['BPlusTreeLeafNode']:
+    """从根下降按键序产出全部叶子，不依赖叶子链表（快照中的链表可能已被改写）"""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.is_leaf:
+            yield node
+        else:
+            stack.extend(reversed(node.children))
+
+
+def _dump_leaves(path: str, leaves: Iterable['BPlusTreeLeafNode'], order: int,
+                 key_type: Optional[str], size: int, chunk_keys: int) -> None:
+    """
+    把叶子按顺序写成 dump 文件，见 BPlusTree.dump
+    
+    先写同目录下的临时文件再 os.replace，读者不会看到写了一半的文件。
+    """
+    typecode = KEY_TYPES[key_type] if key_type else None
+    tmp_path = f"{path}.tmp"
+    chunks = 0
+    with open(tmp_path, 'wb') as f:
+        f.write(bytes(_DUMP_HEADER.size))
+        leaves = iter(leaves)
+        while True:
+            batch, count = [], 0
+            for leaf in leaves:
+                if leaf.keys:
+                    batch.append(leaf)
+                    count += len(leaf.keys)
+                    if count >= chunk_keys:
+                        break
+            if not batch:
+                break
+            sizes = array('I', [len(leaf.keys) for leaf in batch])
+            if typecode:
+                keys = array(typecode)
+                for leaf in batch:
+                    keys.extend(leaf.keys)
+                key_bytes = keys.tobytes()
+            else:
+                key_bytes = pickle.dumps(list(chain.from_iterable(leaf.keys for leaf in batch)),
+                                         protocol=pickle.HIGHEST_PROTOCOL)
+            value_bytes = pickle.dumps(list(chain.from_iterable(leaf.values for leaf in batch)),
+                                       protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(_DUMP_CHUNK.pack(len(batch), len(key_bytes), len(value_bytes)))
+            f.write(sizes.tobytes())
+            f.write(key_bytes)
+            f.write(value_bytes)
+            chunks += 1
+        f.seek(0)
+        f.write(_DUMP_HEADER.pack(_DUMP_MAGIC, _DUMP_VERSION, order, (key_type or '').encode(),
+                                  sys.byteorder == 'little', size, chunks))
+    os.replace(tmp_path, path)
 
 
 class BPlusTree:
     """B+树主类"""
     
-    def __init__(self, order: int = 4):
+    # 节点类型，子类可以替换为带额外字段的节点（例如并发版本的锁存器）
+    leaf_class = BPlusTreeLeafNode
+    internal_class = BPlusTreeInternalNode
+    
+    # 顺序追加时最右叶子分裂后左侧保留的比例：对半分裂会让追加写入的叶子永远只有半满
+    append_split_ratio = 0.9
+    
+    def __init__(self, order: int = 4, key_type: Optional[str] = None,
+                 aggregates: Union[None, Iterable[str], Dict[str, Aggregate]] = None):
         """
         初始化B+树
         
         Args:
             order: B+树的阶数，决定每个节点的最大键数
+            key_type: 数值键的类型（见 KEY_TYPES，如 "int64"、"float64"）。指定后叶子用
+                array 连续存放原生数值，省去每个键的装箱对象；键类型不符（如字符串）时插入抛出
+                TypeError，超出该类型的取值范围（如 uint32 的负数、int64 的 2**63）时抛出 ValueError
+            aggregates: 要在子树上维护的聚合，内置名称（见 AGGREGATES）的列表，
+                或 {名称: Aggregate} 字典；启用后可用 aggregate() 做 O(order * log n) 的区间聚合
         """
         if order < 3:
             raise ValueError("Order must be at least 3")
+        if key_type is not None:
+            if key_type not in KEY_TYPES:
+                raise ValueError(f"unsupported key_type {key_type!r}, expected one of {sorted(KEY_TYPES)}")
+            self.leaf_class = _typed_leaf_class(self.leaf_class, key_type)
         
         self.order = order
-        self.root: Optional[BPlusTreeNode] = BPlusTreeLeafNode()
+        self.key_type = key_type
+        self.root: Optional[BPlusTreeNode] = self.leaf_class()
         self.height = 1
+        self._size = 0  # 键值对总数，插入/删除时维护
+        # 写时复制：纪元小于 _epoch 的节点可能被快照共享，修改前先复制
+        self._epoch = 0
+        self._snapshots: 'weakref.WeakSet[BPlusTreeSnapshot]' = weakref.WeakSet()
+        # 最右叶子及其路径的缓存，键递增的插入直接追加而不从根下降；结构变化时清空
+        self._tail: Optional[Tuple[BPlusTreeLeafNode, List[Tuple[BPlusTreeInternalNode, int]]]] = None
+        
+        # 子树聚合：每个节点的 summary 按 _aggregate_names 的顺序存放各聚合值；
+        # 写操作把内容变化的节点记入 _touched，结束时自底向上重算它们及其祖先
+        if aggregates is None:
+            specs = {}
+        elif isinstance(aggregates, dict):
+            specs = dict(aggregates)
+        else:
+            specs = {}
+            for name in aggregates:
+                if name not in AGGREGATES:
+                    raise ValueError(f"unknown aggregate {name!r}, expected one of {sorted(AGGREGATES)}")
+                specs[name] = AGGREGATES[name]
+        self._aggregate_names: Tuple[str, ...] = tuple(specs)
+        self._aggregate_specs: Tuple[Aggregate, ...] = tuple(specs.values())
+        self._touched: List[BPlusTreeNode] = []
+        if self._aggregate_specs:
+            self.root.summary = self._summarize(self.root)
+        # 操作统计，enable_metrics() 开启后才创建
+        self._metrics: Optional['TreeMetrics'] = None
+    
+    @classmethod
+    def bulk_load(cls, items: Iterable[Tuple[Any, Any]], order: int = 4,
+                  fill_factor: float = 1.0, run_size: Optional[int] = None,
+                  key_type: Optional[str] = None,
+                  aggregates: Union[None, Iterable[str], Dict[str, Aggregate]] = None) -> 'BPlusTree':
+        """
+        批量构建B+树，输入可以无序
+        
+        Args:
+            items: (键, 值) 可迭代对象，重复键保留最后出现的值
+            order: B+树的阶数
+            fill_factor: 节点填充率 (0, 1]，1.0 表示叶子装满 order-1 个键
+            run_size: 为 None 时在内存中排序；否则按 run_size 分段排序并落盘做外部归并
+            key_type: 数值键类型，同 __init__
+            aggregates: 子树聚合，同 __init__
+        
+        时间复杂度：O(n log n)，输入已有序时为 O(n)（Timsort 识别有序段）
+        """
+        if run_size is None:
+            pairs = sorted((tuple(item) for item in items), key=itemgetter(0))
+        else:
+            if run_size < 1:
+                raise ValueError("run_size must be positive")
+            pairs = _sorted_runs(items, run_size)
+        return cls.from_sorted(pairs, order, fill_factor, key_type, aggregates)
+    
+    @classmethod
+    def from_sorted(cls, items: Iterable[Tuple[Any, Any]], order: int = 4,
+                    fill_factor: float = 1.0, key_type: Optional[str] = None,
+                    aggregates: Union[None, Iterable[str], Dict[str, Aggregate]] = None) -> 'BPlusTree':
+        """
+        从按键有序的 (键, 值) 序列自底向上构建B+树，只遍历输入一次
+        
+        叶子按 fill_factor 装填并串成链表，然后逐层生成内部节点直到只剩根节点。
+        相邻的重复键保留最后一个值；键逆序时抛出 ValueError。
+        
+        时间复杂度：O(n)
+        """
+        if not 0 < fill_factor <= 1:
+            raise ValueError("fill_factor must be in (0, 1]")
+        
+        tree = cls(order, key_type=key_type, aggregates=aggregates)
+        min_keys = order // 2
+        leaf_capacity = max(min_keys, min(order - 1, int((order - 1) * fill_factor)))
+        
+        # 1. 流式装填叶子节点
+        leaves = [tree.leaf_class()]
+        leaf = leaves[0]
+        for key, value in items:
+            if leaf.keys and key <= leaf.keys[-1]:
+                if key < leaf.keys[-1]:
+                    raise ValueError(f"from_sorted requires keys in ascending order: {key!r} after {leaf.keys[-1]!r}")
+                leaf.values[-1] = value
+                continue
+            if len(leaf.keys) >= leaf_capacity:
+                new_leaf = tree.leaf_class()
+                leaf.next_leaf = new_leaf
+                new_leaf.prev_leaf = leaf
+                leaves.append(new_leaf)
+                leaf = new_leaf
+            try:
+                leaf.keys.append(key)
+            except OverflowError as e:
+                raise _key_range_error(leaf, key) from e
+            leaf.values.append(value)
+        
+        # 最后一个叶子可能不足半满，与前一个叶子合并或平分
+        if len(leaves) > 1 and len(leaf.keys) < min_keys:
+            prev = leaves[-2]
+            keys, values = prev.keys + leaf.keys, prev.values + leaf.values
+            if len(keys) <= order - 1:
+                prev.keys, prev.values = keys, values
+                prev.next_leaf = None
+                leaves.pop()
+            else:
+                half = len(keys) // 2
+                prev.keys, leaf.keys = keys[:half], keys[half:]
+                prev.values, leaf.values = values[:half], values[half:]
+        
+        # 2. 自底向上逐层构建内部节点
+        tree._build_levels(leaves, fill_factor)
+        return tree
+    
+    def _build_levels(self, leaves: List['BPlusTreeLeafNode'], fill_factor: float = 1.0) -> None:
+        """在已串成链表的叶子之上逐层生成内部节点，设置根、树高、键数量和聚合"""
+        order = self.order
+        level: List[BPlusTreeNode] = list(leaves)
+        # low_keys[i] 是 level[i] 与左邻之间的分隔键，最左侧的不会被用到
+        low_keys = [None] + [self._leaf_separator(left, right) for left, right in zip(level, level[1:])]
+        min_children = (order + 1) // 2
+        fanout = max(min_children, min(order, int(order * fill_factor)))
+        while len(level) > 1:
+            parents: List[BPlusTreeNode] = []
+            parent_low_keys = []
+            start = 0
+            for size in self._group_sizes(len(level), fanout, min_children, order):
+                node = self.internal_class()
+                node.children = level[start:start + size]
+                node.keys = low_keys[start + 1:start + size]
+                node.counts = [child.subtree_size() for child in node.children]
+                for child in node.children:
+                    child.parent = node
+                parents.append(node)
+                parent_low_keys.append(low_keys[start])
+                start += size
+            level, low_keys = parents, parent_low_keys
+            self.height += 1
+        
+        self.root = level[0]
+        self._size = self.root.subtree_size()
+        if self._aggregate_specs:
+            self._touched = list(leaves)
+            self._refresh_aggregates()
+    
+    def dump(self, path: str, chunk_keys: int = 65536) -> None:
+        """
+        以紧凑的二进制格式把树写入 path，由 BPlusTree.load 读回
+        
+        只写叶子：相邻叶子凑够 chunk_keys 个键组成一个数据块，块内的键和值各用一次
+        pickle 序列化为整个列表；类型化键直接写 array 的原始字节。内部节点不写入，
+        load 时由叶子自底向上重建（O(n / order)），叶子的划分原样保留。
+        聚合函数无法序列化，load 时重新指定。
+        """
+        _dump_leaves(path, _iter_leaves(self.root), self.order, self.key_type, self._size, chunk_keys)
+    
+    def freeze(self) -> 'FrozenBPlusTree':
+        """
+        生成当前内容的只读副本：键值平铺为连续数组，查找只需一次二分，
+        可通过共享内存供多个进程使用，见 frozen_b_plus_tree 模块。之后对树的修改不影响副本。
+        """
+        from frozen_b_plus_tree import FrozenBPlusTree  # 延迟导入，避免循环依赖
+        return FrozenBPlusTree.from_tree(self)
+    
+    @classmethod
+    def load(cls, path: str, aggregates: Union[None, Iterable[str], Dict[str, Aggregate]] = None) -> 'BPlusTree':
+        """
+        读取 dump() 写出的文件
+        
+        文件整体 mmap 后按块解码：每块一次 pickle.loads（类型化键是一次 frombytes 内存拷贝），
+        再按记录的叶子键数切片成叶子。数据本来就是有序、已分好叶子的，跳过了逐键的有序性
+        检查和装填循环，只剩自底向上建内部节点。
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _DUMP_HEADER.size:
+                raise ValueError(f"{path} is not a B+ tree dump")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with data, memoryview(data) as view:
+            magic, version, order, key_type, little, size, chunks = _DUMP_HEADER.unpack_from(data, 0)
+            if magic != _DUMP_MAGIC or version != _DUMP_VERSION:
+                raise ValueError(f"{path} is not a B+ tree dump")
+            key_type = key_type.rstrip(b'\0').decode() or None
+            swap = little != (sys.byteorder == 'little')
+            tree = cls(order, key_type=key_type, aggregates=aggregates)
+            
+            leaves: List[BPlusTreeLeafNode] = []
+            offset = _DUMP_HEADER.size
+            for _ in range(chunks):
+                count, key_len, value_len = _DUMP_CHUNK.unpack_from(data, offset)
+                offset += _DUMP_CHUNK.size
+                sizes = array('I')
+                sizes.frombytes(view[offset:offset + count * sizes.itemsize])
+                offset += count * sizes.itemsize
+                if key_type:
+                    keys = array(KEY_TYPES[key_type])
+                    keys.frombytes(view[offset:offset + key_len])
+                else:
+                    keys = pickle.loads(view[offset:offset + key_len])
+                offset += key_len
+                values = pickle.loads(view[offset:offset + value_len])
+                offset += value_len
+                if swap:
+                    sizes.byteswap()
+                    if key_type:
+                        keys.byteswap()
+                
+                start = 0
+                for n in sizes:
+                    leaf = tree.leaf_class()
+                    leaf.keys = keys[start:start + n]
+                    leaf.values = values[start:start + n]
+                    if leaves:
+                        leaves[-1].next_leaf = leaf
+                        leaf.prev_leaf = leaves[-1]
+                    leaves.append(leaf)
+                    start += n
+        
+        tree._build_levels(leaves or [tree.leaf_class()])
+        if tree._size != size:
+            raise ValueError(f"{path} is corrupt: expected {size} keys, found {tree._size}")
+        return tree
+    
+    @staticmethod
+    def _group_sizes(total: int, size: int, minimum: int, maximum: int) -> List[int]:
+        """将 total 个节点按 size 分组，最后一组不足 minimum 时与前一组合并或平分"""
+        sizes = [size] * (total // size)
+        rest = total % size
+        if rest:
+            sizes.append(rest)
+        if len(sizes) > 1 and sizes[-1] < minimum:
+            combined = sizes.pop() + sizes.pop()
+            if combined <= maximum:
+                sizes.append(combined)
+            else:
+                sizes.extend([combined // 2, combined - combined // 2])
+        return sizes
     
     def search(self, key: Any) -> Optional[Any]:
         """搜索键对应的值"""
@@ -201,41 +697,202 @@ class BPlusTree:
             return None
         return node.search(key)
     
+    def _find_path(self, key: Any) -> Tuple[BPlusTreeLeafNode, List[Tuple[BPlusTreeInternalNode, int]]]:
+        """找到包含给定键的叶子节点，同时记录经过的 (内部节点, 子节点下标)"""
+        current = self.root
+        path = []
+        while not current.is_leaf:
+            idx = bisect_right(current.keys, key)
+            path.append((current, idx))
+            current = current.children[idx]
+        return current, path
+    
+    def _find_bounded_path(self, key: Any) -> Tuple[BPlusTreeLeafNode, List[Tuple[BPlusTreeInternalNode, int]], Any]:
+        """
+        与 _find_path 相同，另外返回叶子的上界分隔键（最右叶子为 None）
+        
+        所有 < 上界的键都属于这个叶子，批量操作据此判断后续键能否复用同一次下降。
+        """
+        current = self.root
+        path = []
+        upper = None
+        while not current.is_leaf:
+            idx = bisect_right(current.keys, key)
+            if idx < len(current.keys):
+                upper = current.keys[idx]
+            path.append((current, idx))
+            current = current.children[idx]
+        return current, path, upper
+    
     def _find_leaf(self, key: Any) -> Optional[BPlusTreeLeafNode]:
         """找到包含给定键的叶子节点"""
         current = self.root
+        if current is None:
+            return None
         
-        while current is not None and not current.is_leaf:
-            if isinstance(current, BPlusTreeInternalNode):
-                idx = current.get_child_index(key)
-                current = current.children[idx]
-            else:
-                break
+        # 热路径：直接在分隔键上二分，避免逐层方法调用
+        while not current.is_leaf:
+            current = current.children[bisect_right(current.keys, key)]
+        
+        return current
+    
+    def snapshot(self) -> 'BPlusTreeSnapshot':
+        """
+        创建当前内容的只读快照，O(1)
+        
+        快照与树共享全部节点；之后的写操作先复制要修改的节点及其到根的路径（写时复制），
+        快照看到的节点内容永远不变。快照不再被引用后，只有它引用的旧节点随之被回收。
+        树的写操作需由单个线程执行（快照也在该线程创建），已创建的快照可以在其他线程中并发读取。
+        """
+        snap = BPlusTreeSnapshot(self.root, self.height, self.order, self._size, self.key_type)
+        self._snapshots.add(snap)
+        self._epoch += 1
+        return snap
+    
+    def _make_writable(self, leaf: BPlusTreeLeafNode,
+                       path: List[Tuple[BPlusTreeInternalNode, int]]) -> Tuple[BPlusTreeLeafNode, List[Tuple[BPlusTreeInternalNode, int]]]:
+        """
+        保证根到叶子路径上的节点都属于当前纪元，被快照共享的节点先复制再挂回父节点
         
-        return current if isinstance(current, BPlusTreeLeafNode) else None
+        没有存活的快照时直接返回，原地修改。
+        """
+        if not self._snapshots:
+            return leaf, path
+        self._tail = None
+        node = self.root
+        if node.epoch != self._epoch:
+            node = self._copy_node(node)
+            self.root = node
+        new_path = []
+        for _, idx in path:
+            new_path.append((node, idx))
+            node = self._writable_child(node, idx)
+        return node, new_path
+    
+    def _writable_child(self, parent: BPlusTreeInternalNode, idx: int) -> BPlusTreeNode:
+        """返回可修改的 parent.children[idx]，parent 本身必须已可修改"""
+        child = parent.children[idx]
+        if child.epoch == self._epoch or not self._snapshots:
+            return child
+        copy = self._copy_node(child)
+        copy.parent = parent
+        parent.children[idx] = copy
+        return copy
+    
+    def _copy_node(self, node: BPlusTreeNode) -> BPlusTreeNode:
+        """
+        复制节点的内容（键、值、子节点、计数），旧节点保持不变留给快照
+        
+        父指针和叶子链表只供树本身使用（快照只从根下降读取），因此直接把
+        相邻叶子和子节点的指针改到副本上，不需要连带复制它们。
+        """
+        copy = type(node)()
+        copy.epoch = self._epoch
+        copy.keys = node.keys[:]
+        copy.parent = node.parent
+        copy.summary = node.summary
+        if node.is_leaf:
+            copy.values = list(node.values)
+            copy.prev_leaf, copy.next_leaf = node.prev_leaf, node.next_leaf
+            if node.prev_leaf is not None:
+                node.prev_leaf.next_leaf = copy
+            if node.next_leaf is not None:
+                node.next_leaf.prev_leaf = copy
+        else:
+            copy.children = list(node.children)
+            copy.counts = list(node.counts)
+            for child in copy.children:
+                child.parent = copy
+        return copy
     
     def insert(self, key: Any, value: Any) -> bool:
-        """插入键值对"""
+        """
+        插入键值对
+        
+        键大于当前最大键（时间戳、自增 ID 这类追加写入）时走快速路径：直接追加到
+        缓存的最右叶子；最右叶子满时按 append_split_ratio 偏右分裂，左侧叶子接近装满。
+        """
+        tail = self._tail
+        if tail is not None and not self._snapshots:
+            leaf, path = tail
+            keys = leaf.keys
+            if keys and key > keys[-1] and len(keys) + 1 < self.order:
+                try:
+                    keys.append(key)
+                except OverflowError as e:
+                    raise _key_range_error(leaf, key) from e
+                leaf.values.append(value)
+                self._size += 1
+                for node, idx in path:
+                    node.counts[idx] += 1
+                if self._aggregate_specs:
+                    # 追加在最右端：路径上每个节点的聚合直接与新值合并，不必重算
+                    lifted = [spec.lift(key, value) for spec in self._aggregate_specs]
+                    for node in [leaf] + [node for node, _ in path]:
+                        node.summary = tuple(spec.combine(old, new) for spec, old, new
+                                             in zip(self._aggregate_specs, node.summary, lifted))
+                return True
+        
         # 找到叶子节点
-        leaf = self._find_leaf(key)
-        if leaf is None:
-            return False
+        leaf, path = self._make_writable(*self._find_path(key))
+        appending = leaf.next_leaf is None and (not leaf.keys or key > leaf.keys[-1])
         
         # 在叶子节点插入
-        success, new_node = leaf.insert(key, value, self.order)
+        size_before = len(leaf.keys)
+        split_at = self._append_split_at() if appending else None
+        success, new_node = leaf.insert(key, value, self.order, split_at)
+        
+        # 新增键（而非覆盖）时更新总数和沿途的子树计数；分裂只会发生在新增键时
+        if new_node is not None or len(leaf.keys) > size_before:
+            self._size += 1
+            for node, idx in path:
+                node.counts[idx] += 1
         
+        if self._aggregate_specs:
+            self._touched.append(leaf)
         if new_node is not None:
-            self._handle_split(leaf, new_node)
+            self._handle_split(leaf, new_node, self._leaf_separator(leaf, new_node))
+        self._refresh_aggregates()
         
+        if appending and self._tail is None:
+            self._tail = self._find_path(key)
         return success
     
-    def _handle_split(self, old_node: BPlusTreeNode, new_node: BPlusTreeNode) -> None:
-        """处理节点分裂"""
+    @staticmethod
+    def _leaf_separator(left: BPlusTreeLeafNode, right: BPlusTreeLeafNode) -> Any:
+        """
+        相邻叶子 left、right 之间提升到父节点的分隔键，须满足 left 的键 < 分隔键 <= right 的键
+        
+        默认取 right 的首键；子类可以换成更短的键（见 prefix_b_plus_tree）。
+        """
+        return right.keys[0]
+    
+    def _append_split_at(self) -> int:
+        """
+        追加写入时最右叶子分裂的位置（左侧保留的键数）
+        
+        分裂后的最右叶子可能少于最少键数，后续追加会把它填满；
+        它下溢时（删除）照常借键或合并。
+        """
+        return min(self.order - 1, max(self.order // 2, int(self.order * self.append_split_ratio)))
+    
+    def _handle_split(self, old_node: BPlusTreeNode, new_node: BPlusTreeNode, split_key: Any) -> None:
+        """
+        处理节点分裂
+        
+        split_key 是需要提升到父节点的分隔键：叶子分裂时为新叶子的第一个键，
+        内部节点分裂时为被上推（不再保留在子节点中）的中间键。
+        """
+        self._tail = None
+        if self._aggregate_specs:
+            self._touched.extend((old_node, new_node))
         # 如果旧节点是根节点，创建新的根节点
         if old_node.parent is None:
-            new_root = BPlusTreeInternalNode()
-            new_root.keys = [new_node.keys[0]]
+            new_root = self.internal_class()
+            new_root.epoch = self._epoch
+            new_root.keys = [split_key]
             new_root.children = [old_node, new_node]
+            new_root.counts = [old_node.subtree_size(), new_node.subtree_size()]
             old_node.parent = new_root
             new_node.parent = new_root
             self.root = new_root
@@ -244,77 +901,1128 @@ class BPlusTree:
         
         # 否则，将新节点插入到父节点
         parent = old_node.parent
-        split_key = new_node.keys[0]
-        
         success, result = parent.insert_child(split_key, new_node, self.order)
         
         if result is not None:
-            # 父节点也分裂了
-            if isinstance(result, tuple):
-                new_parent, parent_split_key = result
-                self._handle_split(parent, new_parent)
-            else:
-                self._handle_split(parent, result)
+            # 父节点也分裂了，上推的是父节点的中间键
+            new_parent, parent_split_key = result
+            self._handle_split(parent, new_parent, parent_split_key)
     
     def delete(self, key: Any) -> bool:
         """删除键值对"""
-        leaf = self._find_leaf(key)
-        if leaf is None:
+        leaf, path = self._find_path(key)
+        idx = bisect_left(leaf.keys, key)
+        if idx == len(leaf.keys) or leaf.keys[idx] != key:
             return False
+        # 确认键存在后再复制路径，删除不存在的键不产生新版本
+        leaf, path = self._make_writable(leaf, path)
         
         # 从叶子节点删除
-        success = leaf.delete(key, self.order)
-        if not success:
-            return False
+        leaf.delete(key, self.order)
+        
+        self._size -= 1
+        for node, idx in path:
+            node.counts[idx] -= 1
+        if self._aggregate_specs:
+            self._touched.append(leaf)
         
         # 检查是否下溢，需要处理
         if leaf.is_underflow(self.order):
             self._handle_underflow(leaf)
+        self._refresh_aggregates()
         
         return True
     
+    def get_many(self, keys: Iterable[Any]) -> List[Optional[Any]]:
+        """
+        批量查找，返回与输入顺序一致的值列表（不存在为 None）
+        
+        先对键排序，落在同一个叶子里的键共用一次下降；超出当前叶子时先尝试
+        沿 next_leaf 走到相邻叶子，跨度较大时才重新从根下降。
+        """
+        keys = list(keys)
+        result: List[Optional[Any]] = [None] * len(keys)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        leaf, upper = None, None
+        for pos in order:
+            key = keys[pos]
+            if leaf is None or (upper is not None and key >= upper):
+                following = leaf.next_leaf if leaf is not None else None
+                if following is not None and (following.next_leaf is None or key < following.next_leaf.keys[0]):
+                    # 键要么在相邻叶子里，要么不存在；用后继叶子的首键作为查找上界即可
+                    leaf = following
+                    upper = following.next_leaf.keys[0] if following.next_leaf is not None else None
+                else:
+                    leaf, _, upper = self._find_bounded_path(key)
+            result[pos] = leaf.search(key)
+        return result
+    
+    def put_many(self, items: Iterable[Tuple[Any, Any]]) -> int:
+        """
+        批量插入，重复键以最后出现的值为准，返回新增键的数量
+        
+        按键排序后，每个受影响的叶子只下降一次：把属于它的新键线性归并进去，
+        超出容量时一次性切成若干个大小均匀的叶子，而不是逐个键反复分裂。
+        """
+        pending = sorted((tuple(item) for item in items), key=itemgetter(0))
+        if self.key_type:
+            # 整批键先转换一次，越界或类型不符时在修改任何叶子之前抛出，批次要么全部写入要么不写
+            try:
+                array(KEY_TYPES[self.key_type], (key for key, _ in pending))
+            except OverflowError as e:
+                raise ValueError(f"batch contains a key out of range for key_type {self.key_type!r}") from e
+        added_total = 0
+        i = 0
+        while i < len(pending):
+            leaf, path, upper = self._find_bounded_path(pending[i][0])
+            leaf, path = self._make_writable(leaf, path)
+            j = i
+            while j < len(pending) and (upper is None or pending[j][0] < upper):
+                j += 1
+            
+            added = self._merge_into_leaf(leaf, pending[i:j])
+            if self._aggregate_specs:
+                self._touched.append(leaf)
+            if added:
+                self._size += added
+                for node, idx in path:
+                    node.counts[idx] += added
+                added_total += added
+            if len(leaf.keys) >= self.order:
+                self._split_leaf_into_runs(leaf)
+            i = j
+        self._refresh_aggregates()
+        return added_total
+    
+    def delete_many(self, keys: Iterable[Any]) -> int:
+        """
+        批量删除，返回实际删除的键数量
+        
+        每个受影响的叶子下降一次，删除属于它的全部键后再统一处理一次下溢。
+        """
+        pending = sorted(set(keys))
+        deleted_total = 0
+        i = 0
+        while i < len(pending):
+            leaf, path, upper = self._find_bounded_path(pending[i])
+            j = i
+            while j < len(pending) and (upper is None or pending[j] < upper):
+                j += 1
+            
+            doomed = set(pending[i:j])
+            kept = [idx for idx, key in enumerate(leaf.keys) if key not in doomed]
+            deleted = len(leaf.keys) - len(kept)
+            if deleted:
+                leaf, path = self._make_writable(leaf, path)
+                keys = leaf.keys[:0]
+                keys.extend(leaf.keys[idx] for idx in kept)
+                leaf.keys = keys
+                leaf.values = [leaf.values[idx] for idx in kept]
+                self._size -= deleted
+                for node, idx in path:
+                    node.counts[idx] -= deleted
+                deleted_total += deleted
+                if self._aggregate_specs:
+                    self._touched.append(leaf)
+                if leaf.is_underflow(self.order):
+                    self._handle_underflow(leaf)
+            i = j
+        self._refresh_aggregates()
+        return deleted_total
+    
+    def delete_range(self, start_key: Any = None, end_key: Any = None) -> int:
+        """
+        删除 [start_key, end_key]（None 表示不限）内的全部键，返回删除的数量
+        
+        先在两端把树切开，再把两侧拼回去，中间整段子树直接丢弃，不逐个删除；
+        时间复杂度：O(order * log² n)，与被删除的键数无关。
+        """
+        if start_key is not None and end_key is not None and end_key < start_key:
+            return 0
+        if start_key is None:
+            # 本树只剩 <= end_key 的键，整体丢弃后接回其余部分
+            rest = self._split_off(end_key, inclusive=False) if end_key is not None else None
+            removed = len(self)
+            self._reset()
+            if rest is not None:
+                self.concat(rest)
+            return removed
+        middle = self._split_off(start_key, inclusive=True)
+        if end_key is not None:
+            rest = middle._split_off(end_key, inclusive=False)
+            self.concat(rest)
+        return len(middle)
+    
+    def split_at(self, key: Any) -> 'BPlusTree':
+        """
+        把 >= key 的键整体移到一棵新树并返回，本树只保留 < key 的键
+        
+        沿 key 的路径把每层节点切成左右两半，各层的左半部分（或右半部分）按键序
+        逐个拼接成一棵树，不重新插入任何键；时间复杂度：O(order * log² n)。
+        """
+        return self._split_off(key, inclusive=True)
+    
+    def concat(self, other: 'BPlusTree') -> None:
+        """
+        把 other 的全部键接到本树之后，other 变为空树
+        
+        other 的键必须都大于本树的键，两棵树的阶数、键类型和聚合必须相同。
+        较矮的树整体挂到较高树的边缘路径上，时间复杂度：O(order * log n)。
+        """
+        if other is self:
+            raise ValueError("cannot concat a tree with itself")
+        if (other.order, other.key_type, other._aggregate_names) != (self.order, self.key_type, self._aggregate_names):
+            raise ValueError("concat requires trees with the same order, key_type and aggregates")
+        if len(other) == 0:
+            return
+        if len(self) and not self._last_leaf().keys[-1] < other._first_leaf().keys[0]:
+            raise ValueError("all keys of the other tree must be greater than the keys of this tree")
+        
+        # 两棵树的旧节点都可能被各自的快照共享：合并快照集合，并让它们都早于当前纪元
+        self._snapshots.update(other._snapshots)
+        self._epoch = max(self._epoch, other._epoch) + 1
+        fragment, height, size = other.root, other.height, len(other)
+        other._reset()
+        
+        self._tail = None
+        self._append_fragment(self._writable_root(fragment), height)
+        self._size += size
+        self._refresh_aggregates()
+    
+    def _split_off(self, key: Any, inclusive: bool) -> 'BPlusTree':
+        """把 >= key（inclusive=False 时为 > key）的键移到新树并返回"""
+        other = type(self)(self.order, key_type=self.key_type,
+                           aggregates=dict(zip(self._aggregate_names, self._aggregate_specs)) or None)
+        # 移过去的旧节点仍可能被本树的快照共享
+        other._epoch = self._epoch
+        other._snapshots = weakref.WeakSet(self._snapshots)
+        if self._size == 0:
+            return other
+        
+        self._tail = None
+        leaf, path = self._make_writable(*self._find_path(key))
+        left_pieces: List[Tuple[BPlusTreeNode, int]] = []
+        right_pieces: List[Tuple[BPlusTreeNode, int]] = []
+        height = self.height
+        for node, idx in path:
+            # children[:idx] 的键都 < key，children[idx + 1:] 的键都 > key
+            left_pieces.append(self._slice_piece(node, 0, idx, height))
+            right_pieces.append(self._slice_piece(node, idx + 1, len(node.children), height))
+            height -= 1
+        
+        # 切开叶子和叶子链表
+        pos = (bisect_left if inclusive else bisect_right)(leaf.keys, key)
+        prev_leaf, next_leaf = leaf.prev_leaf, leaf.next_leaf
+        left_leaf = leaf if pos > 0 else None
+        right_leaf = None
+        if pos == 0:
+            right_leaf = leaf
+        elif pos < len(leaf.keys):
+            right_leaf = type(leaf)()
+            right_leaf.epoch = self._epoch
+            right_leaf.keys, leaf.keys = leaf.keys[pos:], leaf.keys[:pos]
+            right_leaf.values, leaf.values = leaf.values[pos:], leaf.values[:pos]
+            right_leaf.next_leaf = next_leaf
+            if next_leaf is not None:
+                next_leaf.prev_leaf = right_leaf
+        left_end = left_leaf if left_leaf is not None else prev_leaf
+        right_start = right_leaf if right_leaf is not None else next_leaf
+        if left_end is not None:
+            left_end.next_leaf = None
+        if right_start is not None:
+            right_start.prev_leaf = None
+        left_pieces.append((left_leaf, 1) if left_leaf is not None else None)
+        right_pieces.append((right_leaf, 1) if right_leaf is not None else None)
+        right_pieces.reverse()
+        
+        # 按键序把各段拼成两棵树
+        self._reset()
+        for tree, pieces in ((self, left_pieces), (other, right_pieces)):
+            for piece in pieces:
+                if piece is not None:
+                    if tree._aggregate_specs:
+                        tree._touched.append(piece[0])
+                    tree._append_fragment(*piece)
+            tree._size = tree.root.subtree_size()
+            tree._refresh_aggregates()
+        return other
+    
+    def _slice_piece(self, node: BPlusTreeInternalNode, start: int, stop: int,
+                     height: int) -> Optional[Tuple[BPlusTreeNode, int]]:
+        """用 node.children[start:stop] 组成一棵子树，返回 (根, 高度)；只有一个子节点时直接用它"""
+        if start >= stop:
+            return None
+        if stop - start == 1:
+            return self._writable_child(node, start), height - 1
+        piece = self.internal_class()
+        piece.epoch = self._epoch
+        piece.keys = node.keys[start:stop - 1]
+        piece.children = node.children[start:stop]
+        piece.counts = node.counts[start:stop]
+        for child in piece.children:
+            child.parent = piece
+        return piece, height
+    
+    def _append_fragment(self, fragment: BPlusTreeNode, height: int) -> None:
+        """
+        把高为 height 的子树接到本树右侧，子树的键都大于本树的键
+        
+        高度相同时新建根；否则把较矮的一方挂到较高一方的最右（或最左）路径上同高度的位置，
+        父节点满了照常分裂。挂上去的根和接缝两侧的叶子可能少于最少键数，再逐个借键或合并。
+        """
+        fragment.parent = None
+        if self.root.is_leaf and not self.root.keys:
+            self.root, self.height = fragment, height
+            return
+        self.root = self._writable_root(self.root)
+        left_root, left_height = self.root, self.height
+        
+        # 接上叶子链表
+        last = self._edge_leaf(left_root, rightmost=True)
+        first = self._edge_leaf(fragment, rightmost=False)
+        last.next_leaf, first.prev_leaf = first, last
+        separator = self._leaf_separator(last, first)
+        
+        if left_height == height:
+            root = self.internal_class()
+            root.epoch = self._epoch
+            root.keys = [separator]
+            root.children = [left_root, fragment]
+            root.counts = [left_root.subtree_size(), fragment.subtree_size()]
+            left_root.parent = fragment.parent = root
+            self.root, self.height = root, height + 1
+            unsafe = [left_root, fragment]
+        elif left_height > height:
+            size = fragment.subtree_size()
+            node = left_root
+            for _ in range(left_height - height - 1):
+                node.counts[-1] += size
+                node = self._writable_child(node, len(node.children) - 1)
+            node.keys.append(separator)
+            node.children.append(fragment)
+            node.counts.append(size)
+            fragment.parent = node
+            unsafe = [fragment]
+        else:
+            size = left_root.subtree_size()
+            node = fragment
+            for _ in range(height - left_height - 1):
+                node.counts[0] += size
+                node = self._writable_child(node, 0)
+            node.keys.insert(0, separator)
+            node.children.insert(0, left_root)
+            node.counts.insert(0, size)
+            left_root.parent = node
+            self.root, self.height = fragment, height
+            unsafe = [left_root]
+        
+        if left_height != height:
+            if self._aggregate_specs:
+                self._touched.append(node)
+            if node.is_full(self.order):
+                new_node, split_key = node._split(self.order)
+                self._handle_split(node, new_node, split_key)
+        if self._aggregate_specs:
+            self._touched.extend(unsafe + [last, first])
+        for node in unsafe + [last, first]:
+            self._fix_underflow(node)
+    
+    def _fix_underflow(self, node: BPlusTreeNode) -> None:
+        """反复借键或合并，直到 node 不再下溢或已被合并掉（内部节点每次只借一个键）"""
+        while node.parent is not None and node.is_underflow(self.order):
+            if not any(child is node for child in node.parent.children):
+                return
+            self._handle_underflow(node)
+    
+    def _writable_root(self, node: BPlusTreeNode) -> BPlusTreeNode:
+        """无父节点的子树根被快照共享时先复制"""
+        if self._snapshots and node.epoch != self._epoch:
+            node = self._copy_node(node)
+            node.parent = None
+        return node
+    
+    def _edge_leaf(self, root: BPlusTreeNode, rightmost: bool) -> BPlusTreeLeafNode:
+        """沿最右（或最左）路径下降到叶子，路径上被快照共享的节点先复制"""
+        node = root
+        while not node.is_leaf:
+            node = self._writable_child(node, len(node.children) - 1 if rightmost else 0)
+        return node
+    
+    def _reset(self) -> None:
+        """变为空树（保留阶数、键类型、聚合与快照信息）"""
+        self.root = self.leaf_class()
+        self.root.epoch = self._epoch
+        if self._aggregate_specs:
+            self.root.summary = self._summarize(self.root)
+        self.height = 1
+        self._size = 0
+        self._tail = None
+    
+    @staticmethod
+    def _merge_into_leaf(leaf: BPlusTreeLeafNode, items: List[Tuple[Any, Any]]) -> int:
+        """把有序的 (键, 值) 线性归并进叶子，已存在的键覆盖值，返回新增键的数量"""
+        old_keys, old_values = leaf.keys, leaf.values
+        if len(items) * 8 < len(old_keys):
+            # 稀疏批次（随机键分散到各叶子）：逐个二分后原地插入，搬移由 C 层完成，
+            # 比逐元素的 Python 归并循环快得多。先把整批键转换进一个空的同类容器，
+            # 类型化叶子的键越界或类型不符时在修改叶子之前就抛出
+            try:
+                old_keys[:0].extend(key for key, _ in items)
+            except OverflowError as e:
+                raise ValueError(f"batch contains a key out of range for key_type {getattr(leaf, 'key_type', None)!r}") from e
+            added = lo = 0
+            for b, (key, value) in enumerate(items):
+                if b + 1 < len(items) and items[b + 1][0] == key:
+                    continue
+                lo = bisect_left(old_keys, key, lo)
+                if lo < len(old_keys) and old_keys[lo] == key:
+                    old_values[lo] = value
+                else:
+                    old_keys.insert(lo, key)
+                    old_values.insert(lo, value)
+                    added += 1
+            return added
+        keys, values = old_keys[:0], []
+        a = b = 0
+        while b < len(items):
+            key, value = items[b]
+            # 同一批次中相邻的重复键只保留最后一个
+            if b + 1 < len(items) and items[b + 1][0] == key:
+                b += 1
+                continue
+            if a < len(old_keys) and old_keys[a] < key:
+                keys.append(old_keys[a])
+                values.append(old_values[a])
+                a += 1
+                continue
+            if a < len(old_keys) and old_keys[a] == key:
+                a += 1
+            try:
+                keys.append(key)
+            except OverflowError as e:
+                raise _key_range_error(leaf, key) from e
+            values.append(value)
+            b += 1
+        keys.extend(old_keys[a:])
+        values.extend(old_values[a:])
+        added = len(keys) - len(old_keys)
+        leaf.keys, leaf.values = keys, values
+        return added
+    
+    def _split_leaf_into_runs(self, leaf: BPlusTreeLeafNode) -> None:
+        """把超出容量的叶子切成 ceil(n / (order-1)) 个大小均匀的叶子，并逐个挂到父节点上"""
+        total = len(leaf.keys)
+        runs = -(-total // (self.order - 1))
+        base, extra = divmod(total, runs)
+        sizes = [base + 1] * extra + [base] * (runs - extra)
+        
+        current = leaf
+        for size in sizes[:-1]:
+            # current 持有剩余的全部键，切下 size 个留在 current，其余移到新叶子
+            new_leaf = self.leaf_class()
+            new_leaf.epoch = self._epoch
+            new_leaf.keys, current.keys = current.keys[size:], current.keys[:size]
+            new_leaf.values, current.values = current.values[size:], current.values[:size]
+            new_leaf.next_leaf, new_leaf.prev_leaf = current.next_leaf, current
+            if current.next_leaf is not None:
+                current.next_leaf.prev_leaf = new_leaf
+            current.next_leaf = new_leaf
+            new_leaf.parent = current.parent
+            self._handle_split(current, new_leaf, self._leaf_separator(current, new_leaf))
+            current = new_leaf
+    
     def _handle_underflow(self, node: BPlusTreeNode) -> None:
-        """处理节点下溢"""
-        # TODO: 实现节点合并和重新分配
-        pass
+        """
+        处理节点下溢
+        
+        优先从相邻兄弟借键（重新分配），兄弟借出后会低于最少键数时与之合并，
+        合并会从父节点删除一个分隔键，因此可能向上递归；根节点只剩一个子节点时降低树高。
+        叶子可能一次缺多个键（批量删除），此时一次借足；内部节点每次最多缺一个键。
+        """
+        self._tail = None
+        parent = node.parent
+        if parent is None:
+            # 根节点：内部根只剩一个子节点时，让该子节点成为新根
+            if not node.is_leaf and not node.keys:
+                self.root = node.children[0]
+                self.root.parent = None
+                self.height -= 1
+            return
+        
+        idx = self._index_in_parent(node)
+        left = parent.children[idx - 1] if idx > 0 else None
+        right = parent.children[idx + 1] if idx + 1 < len(parent.children) else None
+        min_keys = node.min_keys(self.order)
+        need = max(1, min_keys - len(node.keys)) if node.is_leaf else 1
+        
+        # 被修改的兄弟先复制（被并入左侧的右兄弟只读，不必复制）
+        if left is not None and len(left.keys) - need >= min_keys:
+            sibling = self._writable_child(parent, idx - 1)
+            self._borrow_from_left(node, sibling, parent, idx, need)
+        elif right is not None and len(right.keys) - need >= min_keys:
+            sibling = self._writable_child(parent, idx + 1)
+            self._borrow_from_right(node, sibling, parent, idx, need)
+        elif left is not None:
+            sibling = self._writable_child(parent, idx - 1)
+            self._merge(sibling, node, parent, idx - 1)
+        else:
+            sibling = node
+            self._merge(node, right, parent, idx)
+        if self._aggregate_specs:
+            self._touched.extend((node, sibling))
+        
+        if parent.is_underflow(self.order):
+            self._handle_underflow(parent)
+    
+    @staticmethod
+    def _index_in_parent(node: BPlusTreeNode) -> int:
+        """找到节点在父节点 children 中的位置"""
+        children = node.parent.children
+        if node.keys:
+            # 节点内任意键都落在它自己的分隔区间内，可直接二分定位
+            idx = bisect_right(node.parent.keys, node.keys[0])
+            if children[idx] is node:
+                return idx
+        for idx, child in enumerate(children):
+            if child is node:
+                return idx
+        raise ValueError("node is not a child of its parent")
+    
+    def _borrow_from_left(self, node: BPlusTreeNode, left: BPlusTreeNode,
+                          parent: BPlusTreeInternalNode, idx: int, count: int = 1) -> None:
+        """从左兄弟借最后 count 个键（内部节点只借一个），并更新父节点中的分隔键"""
+        if node.is_leaf:
+            node.keys[:0] = left.keys[-count:]
+            node.values[:0] = left.values[-count:]
+            del left.keys[-count:]
+            del left.values[-count:]
+            parent.keys[idx - 1] = self._leaf_separator(left, node)
+            moved = count
+        else:
+            # 内部节点：分隔键下移，左兄弟的最后一个键上移
+            node.keys.insert(0, parent.keys[idx - 1])
+            parent.keys[idx - 1] = left.keys.pop()
+            child = left.children.pop()
+            moved = left.counts.pop()
+            node.children.insert(0, child)
+            node.counts.insert(0, moved)
+            child.parent = node
+        parent.counts[idx - 1] -= moved
+        parent.counts[idx] += moved
+    
+    def _borrow_from_right(self, node: BPlusTreeNode, right: BPlusTreeNode,
+                           parent: BPlusTreeInternalNode, idx: int, count: int = 1) -> None:
+        """从右兄弟借前 count 个键（内部节点只借一个），并更新父节点中的分隔键"""
+        if node.is_leaf:
+            node.keys.extend(right.keys[:count])
+            node.values.extend(right.values[:count])
+            del right.keys[:count]
+            del right.values[:count]
+            parent.keys[idx] = self._leaf_separator(node, right)
+            moved = count
+        else:
+            node.keys.append(parent.keys[idx])
+            parent.keys[idx] = right.keys.pop(0)
+            child = right.children.pop(0)
+            moved = right.counts.pop(0)
+            node.children.append(child)
+            node.counts.append(moved)
+            child.parent = node
+        parent.counts[idx + 1] -= moved
+        parent.counts[idx] += moved
+    
+    @staticmethod
+    def _merge(left: BPlusTreeNode, right: BPlusTreeNode,
+               parent: BPlusTreeInternalNode, sep_idx: int) -> None:
+        """把 right 合并进 left，并从父节点删除它们之间的分隔键"""
+        separator = parent.keys.pop(sep_idx)
+        parent.children.pop(sep_idx + 1)
+        parent.counts[sep_idx] += parent.counts.pop(sep_idx + 1)
+        if left.is_leaf:
+            left.keys.extend(right.keys)
+            left.values.extend(right.values)
+            left.next_leaf = right.next_leaf
+            if right.next_leaf is not None:
+                right.next_leaf.prev_leaf = left
+        else:
+            # 内部节点合并时分隔键下移到合并后的节点中
+            left.keys.append(separator)
+            left.keys.extend(right.keys)
+            for child in right.children:
+                child.parent = left
+            left.children.extend(right.children)
+            left.counts.extend(right.counts)
     
     def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
-        """范围查询"""
-        start_leaf = self._find_leaf(start_key)
-        if start_leaf is None:
-            return []
+        """范围查询，返回 [start_key, end_key] 内的全部键值对"""
+        return list(self.iter_range(start_key, end_key))
+    
+    def range_keys(self, start_key: Any = None, end_key: Any = None) -> Union[List[Any], array]:
+        """
+        返回 [start_key, end_key] 内的全部键（None 表示不限），不产生 (键, 值) 元组
         
-        return start_leaf.range_query(start_key, end_key)
+        每个叶子整段切片拷贝。类型化键模式下结果是同类型的 array，可以用
+        numpy.frombuffer(result, dtype=...) 零拷贝转成 ndarray；否则为 list。
+        """
+        leaf = self._first_leaf() if start_key is None else self._find_leaf(start_key)
+        result = leaf.keys[:0]
+        idx = 0 if start_key is None else bisect_left(leaf.keys, start_key)
+        while leaf is not None:
+            keys = leaf.keys
+            stop = len(keys) if end_key is None else bisect_right(keys, end_key, idx)
+            result.extend(keys[idx:stop])
+            if stop < len(keys):
+                break
+            leaf, idx = leaf.next_leaf, 0
+        return result
+    
+    def iter_range(self, start_key: Any = None, end_key: Any = None,
+                   inclusive: Tuple[bool, bool] = (True, True), limit: Optional[int] = None,
+                   reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """
+        惰性范围迭代，按需沿叶子链表产出 (键, 值)
+        
+        Args:
+            start_key: 下界，None 表示从最小键开始
+            end_key: 上界，None 表示到最大键为止
+            inclusive: (是否包含下界, 是否包含上界)
+            limit: 最多产出的条数，None 表示不限
+            reverse: 为 True 时从上界向下界逆序扫描
+        
+        只在第一个叶子中二分定位，之后逐叶子切片输出。迭代期间修改树的结果未定义。
+        时间复杂度：O(log n + k)，k 为实际产出的条数
+        """
+        if limit is not None and limit <= 0:
+            return
+        low_inclusive, high_inclusive = inclusive
+        remaining = limit
+        metrics = self._metrics
+        
+        if not reverse:
+            if start_key is None:
+                leaf, idx = self._first_leaf(), 0
+            else:
+                leaf = self._find_leaf(start_key)
+                find = bisect_left if low_inclusive else bisect_right
+                idx = find(leaf.keys, start_key)
+            while leaf is not None:
+                if metrics is not None:
+                    metrics.leaves_scanned += 1
+                keys = leaf.keys
+                stop = len(keys)
+                if end_key is not None:
+                    stop = (bisect_right if high_inclusive else bisect_left)(keys, end_key, idx)
+                if remaining is not None:
+                    stop = min(stop, idx + remaining)
+                    remaining -= stop - idx
+                values = leaf.values
+                for i in range(idx, stop):
+                    yield keys[i], values[i]
+                if stop < len(keys) or remaining == 0:
+                    return
+                leaf, idx = leaf.next_leaf, 0
+        else:
+            if end_key is None:
+                leaf = self._last_leaf()
+                idx = len(leaf.keys)
+            else:
+                leaf = self._find_leaf(end_key)
+                idx = (bisect_right if high_inclusive else bisect_left)(leaf.keys, end_key)
+            while leaf is not None:
+                if metrics is not None:
+                    metrics.leaves_scanned += 1
+                keys = leaf.keys
+                stop = 0
+                if start_key is not None:
+                    stop = (bisect_left if low_inclusive else bisect_right)(keys, start_key, 0, idx)
+                if remaining is not None:
+                    stop = max(stop, idx - remaining)
+                    remaining -= idx - stop
+                values = leaf.values
+                for i in range(idx - 1, stop - 1, -1):
+                    yield keys[i], values[i]
+                if stop > 0 or remaining == 0:
+                    return
+                leaf = leaf.prev_leaf
+                if leaf is not None:
+                    idx = len(leaf.keys)
+    
+    def items(self, reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """按键序惰性产出全部 (键, 值)"""
+        return self.iter_range(reverse=reverse)
+    
+    def keys(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部键"""
+        return (key for key, _ in self.iter_range(reverse=reverse))
+    
+    def values(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部值"""
+        return (value for _, value in self.iter_range(reverse=reverse))
+    
+    def cursor(self) -> 'BPlusTreeCursor':
+        """创建一个可定位、可前后移动的游标"""
+        return BPlusTreeCursor(self)
+    
+    def _first_leaf(self) -> BPlusTreeLeafNode:
+        """最左边的叶子节点"""
+        current = self.root
+        while not current.is_leaf:
+            current = current.children[0]
+        return current
+    
+    def _last_leaf(self) -> BPlusTreeLeafNode:
+        """最右边的叶子节点"""
+        current = self.root
+        while not current.is_leaf:
+            current = current.children[-1]
+        return current
     
     def traverse(self) -> List[Any]:
         """遍历所有键（有序）"""
-        result = []
+        return list(self.keys())
+    
+    def __iter__(self) -> Iterator[Any]:
+        """按键序迭代全部键"""
+        return self.keys()
+    
+    def __contains__(self, key: Any) -> bool:
+        """检查键是否存在"""
+        return self.search(key) is not None
+    
+    def __len__(self) -> int:
+        """键值对数量，O(1)"""
+        return self._size
+    
+    def rank(self, key: Any, inclusive: bool = False) -> int:
+        """
+        统计小于 key（inclusive=True 时为小于等于）的键的数量
         
-        # 找到最左边的叶子节点
+        沿根到叶子的路径累加左侧兄弟子树的计数，时间复杂度：O(order * log n)
+        """
+        result = 0
         current = self.root
-        while current is not None and not current.is_leaf:
-            if isinstance(current, BPlusTreeInternalNode):
-                current = current.children[0]
-            else:
-                break
+        while not current.is_leaf:
+            idx = bisect_right(current.keys, key)
+            result += sum(current.counts[:idx])
+            current = current.children[idx]
+        find = bisect_right if inclusive else bisect_left
+        return result + find(current.keys, key)
+    
+    def select(self, index: int) -> Tuple[Any, Any]:
+        """
+        返回第 index 小（从 0 开始，支持负数下标）的 (键, 值)
         
-        # 遍历叶子节点链表
-        leaf = current
-        while leaf is not None:
-            result.extend(leaf.keys)
-            if isinstance(leaf, BPlusTreeLeafNode):
-                leaf = leaf.next_leaf
+        时间复杂度：O(order * log n)
+        """
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("BPlusTree index out of range")
+        current = self.root
+        while not current.is_leaf:
+            for idx, count in enumerate(current.counts):
+                if index < count:
+                    break
+                index -= count
+            current = current.children[idx]
+        return current.keys[index], current.values[index]
+    
+    def count_range(self, start_key: Any, end_key: Any) -> int:
+        """统计 [start_key, end_key] 内的键数量，不遍历叶子"""
+        if end_key < start_key:
+            return 0
+        return self.rank(end_key, inclusive=True) - self.rank(start_key)
+    
+    def percentile(self, p: float) -> Any:
+        """
+        返回第 p 百分位的键（最近秩法：第 ceil(p/100 * n) 个键）
+        
+        例如 percentile(50) 为中位数，percentile(99) 为 p99
+        """
+        if not 0 <= p <= 100:
+            raise ValueError("percentile must be in [0, 100]")
+        if self._size == 0:
+            raise ValueError("percentile of an empty tree")
+        index = max(0, math.ceil(p / 100 * self._size) - 1)
+        return self.select(index)[0]
+    
+    def aggregate(self, start_key: Any = None, end_key: Any = None, name: str = "sum") -> Any:
+        """
+        区间 [start_key, end_key]（None 表示不限）内的聚合值，name 为构造时启用的聚合
+        
+        完全落在区间内的子树直接取 summary，只有两条边界路径需要向下展开，
+        时间复杂度：O(order * log n)，不遍历叶子也不生成结果列表。
+        """
+        if name not in self._aggregate_names:
+            raise ValueError(f"aggregate {name!r} is not enabled on this tree")
+        i = self._aggregate_names.index(name)
+        spec = self._aggregate_specs[i]
+        if start_key is not None and end_key is not None and end_key < start_key:
+            return spec.identity
+        return self._aggregate_node(self.root, start_key, end_key, None, None, i, spec)
+    
+    def _aggregate_node(self, node: BPlusTreeNode, start_key: Any, end_key: Any,
+                        low: Any, high: Any, i: int, spec: Aggregate) -> Any:
+        """node 覆盖 [low, high) 内的键（None 表示无界），返回其中落在查询区间内的键的聚合"""
+        if ((start_key is None or (low is not None and start_key <= low))
+                and (end_key is None or (high is not None and high <= end_key))):
+            return node.summary[i]
+        
+        combine = spec.combine
+        result = spec.identity
+        keys = node.keys
+        if node.is_leaf:
+            lift, values = spec.lift, node.values
+            start = 0 if start_key is None else bisect_left(keys, start_key)
+            stop = len(keys) if end_key is None else bisect_right(keys, end_key)
+            for j in range(start, stop):
+                result = combine(result, lift(keys[j], values[j]))
+            return result
+        
+        first = 0 if start_key is None else bisect_right(keys, start_key)
+        last = len(keys) if end_key is None else bisect_right(keys, end_key)
+        for idx in range(first, last + 1):
+            child_low = low if idx == 0 else keys[idx - 1]
+            child_high = high if idx == len(keys) else keys[idx]
+            result = combine(result, self._aggregate_node(node.children[idx], start_key, end_key,
+                                                          child_low, child_high, i, spec))
+        return result
+    
+    def _summarize(self, node: BPlusTreeNode) -> Tuple[Any, ...]:
+        """由叶子的键值或内部节点各子节点的 summary 计算节点的聚合，O(order)"""
+        result = []
+        for i, spec in enumerate(self._aggregate_specs):
+            combine = spec.combine
+            acc = spec.identity
+            if node.is_leaf:
+                lift = spec.lift
+                for key, value in zip(node.keys, node.values):
+                    acc = combine(acc, lift(key, value))
             else:
-                break
+                for child in node.children:
+                    acc = combine(acc, child.summary[i])
+            result.append(acc)
+        return tuple(result)
+    
+    def _refresh_aggregates(self) -> None:
+        """按深度从深到浅重算 _touched 中的节点及其全部祖先的 summary"""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, []
+        levels: Dict[int, List[BPlusTreeNode]] = {}
+        for node in touched:
+            depth = 0
+            ancestor = node.parent
+            while ancestor is not None:
+                depth += 1
+                ancestor = ancestor.parent
+            levels.setdefault(depth, []).append(node)
         
+        done = set()
+        for depth in range(max(levels), -1, -1):
+            for node in levels.get(depth, ()):
+                if id(node) in done:
+                    continue
+                done.add(id(node))
+                node.summary = self._summarize(node)
+                if node.parent is not None:
+                    levels.setdefault(depth - 1, []).append(node.parent)
+    
+    def enable_metrics(self, hooks: Iterable[Callable[[str, float], None]] = ()) -> 'TreeMetrics':
+        """
+        开启操作计数、延迟直方图和结构事件统计（见 metrics_b_plus_tree 模块），返回 TreeMetrics
+        
+        hooks 中的每个 hook(名称, 数值) 在每次操作后以延迟秒数、每次分裂/借键/合并后以 1 调用。
+        已开启时只追加钩子。
+        """
+        from metrics_b_plus_tree import TreeMetrics, instrument  # 延迟导入，避免循环依赖
+        if self._metrics is None:
+            self._metrics = instrument(self, TreeMetrics(hooks))
+        else:
+            for hook in hooks:
+                self._metrics.add_hook(hook)
+        return self._metrics
+    
+    def disable_metrics(self) -> None:
+        """关闭统计并移除全部包装，之后的操作没有统计开销"""
+        if self._metrics is None:
+            return
+        from metrics_b_plus_tree import uninstrument
+        uninstrument(self)
+        self._metrics = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        结构统计：树高、各层节点数、叶子占用率分布和结构内存估算；开启了统计时还包括
+        各操作的次数与延迟、分裂/合并次数、下降经过的节点数和范围扫描经过的叶子数
+        
+        结构部分需要遍历全部节点，O(n / order)，适合定期采样而不是每次操作后调用。
+        leaf_occupancy[i] 是键数占容量 (order - 1) 比例落在 [i/10, (i+1)/10) 内的叶子数（装满计入最后一格）。
+        memory_bytes 只含节点、键列表、值列表等容器本身，不含键和值对象。
+        """
+        levels: List[int] = []
+        occupancy = [0] * 10
+        leaf_keys = internal_children = memory = 0
+        level = [self.root]
+        while level:
+            levels.append(len(level))
+            below = []
+            for node in level:
+                memory += sys.getsizeof(node) + sys.getsizeof(node.keys)
+                if node.is_leaf:
+                    leaf_keys += len(node.keys)
+                    occupancy[min(9, len(node.keys) * 10 // (self.order - 1))] += 1
+                    memory += sys.getsizeof(node.values)
+                else:
+                    internal_children += len(node.children)
+                    memory += sys.getsizeof(node.children) + sys.getsizeof(node.counts)
+                    below.extend(node.children)
+            level = below
+        leaves, internals = levels[-1], sum(levels[:-1])
+        
+        stats: Dict[str, Any] = {
+            'size': self._size,
+            'order': self.order,
+            'height': self.height,
+            'nodes_per_level': levels,
+            'leaves': leaves,
+            'internal_nodes': internals,
+            'leaf_fill': leaf_keys / (leaves * (self.order - 1)),
+            'internal_fill': internal_children / (internals * self.order) if internals else 0.0,
+            'leaf_occupancy': occupancy,
+            'memory_bytes': memory,
+        }
+        if self._metrics is not None:
+            stats.update(self._metrics.snapshot())
+        return stats
+    
+    def __repr__(self) -> str:
+        return f"BPlusTree(order={self.order}, height={self.height}, size={len(self)})"
+
+
+class BPlusTreeCursor:
+    """
+    B+树游标
+    
+    记录当前所在的叶子和下标，seek 时只二分查找一次，之后沿叶子链表前后移动，
+    适合分页这类"每次取一小段、下次接着取"的场景。
+    树被修改后游标位置失效，需要用上次的 key 重新 seek。
+    """
+    
+    __slots__ = ('tree', 'leaf', 'index')
+    
+    def __init__(self, tree: BPlusTree):
+        self.tree = tree
+        self.leaf: Optional[BPlusTreeLeafNode] = None
+        self.index = 0
+    
+    @property
+    def valid(self) -> bool:
+        """游标是否指向一个有效的键值对"""
+        return self.leaf is not None
+    
+    @property
+    def key(self) -> Any:
+        """当前键"""
+        if self.leaf is None:
+            raise IndexError("cursor is not positioned on an entry")
+        return self.leaf.keys[self.index]
+    
+    @property
+    def value(self) -> Any:
+        """当前值"""
+        if self.leaf is None:
+            raise IndexError("cursor is not positioned on an entry")
+        return self.leaf.values[self.index]
+    
+    def seek(self, key: Any, inclusive: bool = True) -> bool:
+        """定位到第一个 >= key（inclusive=False 时 > key）的键，返回是否定位成功"""
+        leaf = self.tree._find_leaf(key)
+        find = bisect_left if inclusive else bisect_right
+        return self._settle_forward(leaf, find(leaf.keys, key))
+    
+    def seek_first(self) -> bool:
+        """定位到最小键"""
+        return self._settle_forward(self.tree._first_leaf(), 0)
+    
+    def seek_last(self) -> bool:
+        """定位到最大键"""
+        leaf = self.tree._last_leaf()
+        return self._settle_backward(leaf, len(leaf.keys) - 1)
+    
+    def next(self) -> bool:
+        """移动到下一个键，返回移动后是否仍有效"""
+        if self.leaf is None:
+            return False
+        return self._settle_forward(self.leaf, self.index + 1)
+    
+    def prev(self) -> bool:
+        """移动到上一个键，返回移动后是否仍有效"""
+        if self.leaf is None:
+            return False
+        return self._settle_backward(self.leaf, self.index - 1)
+    
+    def fetch(self, count: int) -> List[Tuple[Any, Any]]:
+        """从当前位置向后读取最多 count 个键值对，游标停在下一个未读取的位置"""
+        result = []
+        while self.leaf is not None and len(result) < count:
+            result.append((self.leaf.keys[self.index], self.leaf.values[self.index]))
+            self.next()
         return result
     
+    def _settle_forward(self, leaf: Optional[BPlusTreeLeafNode], index: int) -> bool:
+        """从 (leaf, index) 开始向后找到第一个有效位置"""
+        while leaf is not None and index >= len(leaf.keys):
+            leaf, index = leaf.next_leaf, 0
+        self.leaf, self.index = leaf, index
+        return leaf is not None
+    
+    def _settle_backward(self, leaf: Optional[BPlusTreeLeafNode], index: int) -> bool:
+        """从 (leaf, index) 开始向前找到第一个有效位置"""
+        while leaf is not None and index < 0:
+            leaf = leaf.prev_leaf
+            index = len(leaf.keys) - 1 if leaf is not None else 0
+        self.leaf, self.index = leaf, index
+        return leaf is not None
+    
+    def __repr__(self) -> str:
+        if self.leaf is None:
+            return "BPlusTreeCursor(<unpositioned>)"
+        return f"BPlusTreeCursor(key={self.key!r})"
+
+
+class BPlusTreeSnapshot:
+    """
+    B+树的只读快照，由 BPlusTree.snapshot() 创建
+    
+    持有创建时的根节点，这些节点此后不会再被修改。树会原地改写共享节点的
+    父指针和叶子链表，所以快照只从根下降读取：范围迭代用一个 (内部节点, 子节点下标)
+    栈在叶子之间移动，每跨一个叶子摊还 O(1)。
+    """
+    
+    __slots__ = ('root', 'height', 'order', '_size', 'key_type', '__weakref__')
+    
+    def __init__(self, root: BPlusTreeNode, height: int, order: int, size: int,
+                 key_type: Optional[str] = None):
+        self.root = root
+        self.height = height
+        self.order = order
+        self._size = size
+        self.key_type = key_type
+    
+    def search(self, key: Any) -> Optional[Any]:
+        """搜索键对应的值"""
+        node = self.root
+        while not node.is_leaf:
+            node = node.children[bisect_right(node.keys, key)]
+        return node.search(key)
+    
+    def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
+        """范围查询，返回 [start_key, end_key] 内的全部键值对"""
+        return list(self.iter_range(start_key, end_key))
+    
+    def iter_range(self, start_key: Any = None, end_key: Any = None,
+                   inclusive: Tuple[bool, bool] = (True, True), limit: Optional[int] = None,
+                   reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """惰性范围迭代，参数含义与 BPlusTree.iter_range 相同"""
+        if limit is not None and limit <= 0:
+            return
+        low_inclusive, high_inclusive = inclusive
+        remaining = limit
+        seek = end_key if reverse else start_key
+        
+        stack: List[List[Any]] = []
+        node = self.root
+        while not node.is_leaf:
+            if seek is None:
+                idx = len(node.children) - 1 if reverse else 0
+            else:
+                idx = bisect_right(node.keys, seek)
+            stack.append([node, idx])
+            node = node.children[idx]
+        
+        while node is not None:
+            keys, values = node.keys, node.values
+            if not reverse:
+                idx = 0 if seek is None else (bisect_left if low_inclusive else bisect_right)(keys, seek)
+                stop = len(keys)
+                if end_key is not None:
+                    stop = (bisect_right if high_inclusive else bisect_left)(keys, end_key, idx)
+                positions = range(idx, stop)
+                finished = stop < len(keys)
+            else:
+                stop = len(keys) if seek is None else (bisect_right if high_inclusive else bisect_left)(keys, seek)
+                idx = 0
+                if start_key is not None:
+                    idx = (bisect_left if low_inclusive else bisect_right)(keys, start_key, 0, stop)
+                positions = range(stop - 1, idx - 1, -1)
+                finished = idx > 0
+            for i in positions:
+                yield keys[i], values[i]
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+            if finished:
+                return
+            seek = None
+            node = self._next_leaf(stack, reverse)
+    
+    @staticmethod
+    def _next_leaf(stack: List[List[Any]], reverse: bool) -> Optional[BPlusTreeLeafNode]:
+        """沿下降栈移动到扫描方向上的下一个叶子，没有时返回 None"""
+        step = -1 if reverse else 1
+        while stack:
+            frame = stack[-1]
+            parent, idx = frame
+            idx += step
+            if 0 <= idx < len(parent.children):
+                frame[1] = idx
+                node = parent.children[idx]
+                while not node.is_leaf:
+                    child_idx = len(node.children) - 1 if reverse else 0
+                    stack.append([node, child_idx])
+                    node = node.children[child_idx]
+                return node
+            stack.pop()
+        return None
+    
+    def items(self, reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """按键序惰性产出全部 (键, 值)"""
+        return self.iter_range(reverse=reverse)
+    
+    def keys(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部键"""
+        return (key for key, _ in self.iter_range(reverse=reverse))
+    
+    def values(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部值"""
+        return (value for _, value in self.iter_range(reverse=reverse))
+    
+    def traverse(self) -> List[Any]:
+        """遍历所有键（有序）"""
+        return list(self.keys())
+    
+    def dump(self, path: str, chunk_keys: int = 65536) -> None:
+        """把快照写成 dump 文件，格式与 BPlusTree.dump 相同，可在树继续写入的同时进行"""
+        _dump_leaves(path, _iter_leaves(self.root), self.order, self.key_type, self._size, chunk_keys)
+    
+    def freeze(self) -> 'FrozenBPlusTree':
+        """生成快照内容的只读平铺副本，见 BPlusTree.freeze"""
+        from frozen_b_plus_tree import FrozenBPlusTree
+        return FrozenBPlusTree.from_tree(self)
+    
+    def __iter__(self) -> Iterator[Any]:
+        return self.keys()
+    
     def __contains__(self, key: Any) -> bool:
-        """检查键是否存在"""
         return self.search(key) is not None
     
+    def __len__(self) -> int:
+        return self._size
+    
     def __repr__(self) -> str:
-        return f"BPlusTree(order={self.order}, height={self.height}, size={len(self.traverse())})"
+        return f"BPlusTreeSnapshot(order={self.order}, height={self.height}, size={self._size})"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,428 @@
+"""
+B+树基准测试
+按 YCSB 的 A–F 六种负载、三种请求分布、不同数据量和阶数测量 BPlusTree，
+并与两个基线对比：dict + bisect（字典做点查，另维护一个有序键列表做范围扫描）
+和有序列表（键、值两个平行列表，全部操作用 bisect）。
+
+负载（读 / 更新 / 插入 / 扫描 / 读改写 的比例）：
+- A: 50% 读, 50% 更新
+- B: 95% 读, 5% 更新
+- C: 100% 读
+- D: 95% 读, 5% 插入；插入总是追加新的最大键，读偏向最近插入的键（latest 分布，与 --distributions 无关）
+- E: 95% 短扫描（从某个键起 1–100 条）, 5% 插入
+- F: 50% 读, 50% 读改写
+
+请求分布：uniform（均匀）、zipfian（YCSB 的 scrambled zipfian，θ=0.99，热点键打散到整个键空间）、
+sequential（按键序循环访问）。预加载的键为 0, 2, 4, ...；uniform/zipfian 下插入随机的奇数键
+（落在已有键之间），sequential 下插入追加在末尾。
+
+每组配置先用各结构的批量构建方式载入数据（BPlusTree.from_sorted、dict 加 sorted），
+再执行预先生成好的操作序列，逐个操作计时；峰值内存在单独一轮载入中用 tracemalloc 测量，
+不影响计时。结果以 JSON 写到 --output 指定的文件或标准输出（进度与对比报告写到标准错误，
+标准输出可以直接交给 JSON 解析），--compare 与之前保存的结果逐项对比吞吐量，用于跨提交的回归检查。
+
+用法：
+    python benchmark_b_plus_tree.py --workloads A,C,E --records 10000,100000 --orders 4,64,1024 \\
+        --output results.json
+    python benchmark_b_plus_tree.py --output new.json --compare results.json --threshold 0.1
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left, insort
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from b_plus_tree import BPlusTree
+
+
+READ, UPDATE, INSERT, SCAN, RMW = range(5)
+_OP_NAMES = ('read', 'update', 'insert', 'scan', 'read_modify_write')
+
+# 负载 -> 各操作的比例（READ, UPDATE, INSERT, SCAN, RMW）
+WORKLOADS: Dict[str, Tuple[float, float, float, float, float]] = {
+    'A': (0.5, 0.5, 0, 0, 0),
+    'B': (0.95, 0.05, 0, 0, 0),
+    'C': (1.0, 0, 0, 0, 0),
+    'D': (0.95, 0, 0.05, 0, 0),
+    'E': (0, 0, 0.05, 0.95, 0),
+    'F': (0.5, 0, 0, 0, 0.5),
+}
+
+DISTRIBUTIONS = ('uniform', 'zipfian', 'sequential')
+
+# E 负载的扫描长度上限
+MAX_SCAN_LENGTH = 100
+
+_FNV_OFFSET = 0xCBF29CE484222325
+_FNV_PRIME = 0x100000001B3
+_MASK64 = (1 << 64) - 1
+
+
+def _fnv64(value: int) -> int:
+    """FNV-1a 64 位哈希，把 zipfian 的热点名次打散到整个键空间（与 YCSB 相同）"""
+    h = _FNV_OFFSET
+    for _ in range(8):
+        h = ((h ^ (value & 0xFF)) * _FNV_PRIME) & _MASK64
+        value >>= 8
+    return h
+
+
+class ZipfianGenerator:
+    """
+    Gray 等人的 zipfian 生成器（YCSB 的实现）：名次 0 最热，P(i) ∝ 1 / (i+1)^θ
+    
+    zeta(n) 只在构造时计算一次，O(n)；之后每次取样 O(1)。
+    """
+    
+    def __init__(self, n: int, theta: float = 0.99, rng: Optional[random.Random] = None):
+        self.n = n
+        self.theta = theta
+        self.rng = rng or random.Random()
+        self.zetan = math.fsum(i ** -theta for i in range(1, n + 1))
+        zeta2 = 1 + 0.5 ** theta
+        self.alpha = 1 / (1 - theta)
+        self.eta = (1 - (2 / n) ** (1 - theta)) / (1 - zeta2 / self.zetan) if n > 1 else 0.0
+        self._half_pow = 0.5 ** theta
+    
+    def next(self) -> int:
+        u = self.rng.random()
+        uz = u * self.zetan
+        if uz < 1:
+            return 0
+        if uz < 1 + self._half_pow:
+            return 1
+        return min(self.n - 1, int(self.n * (self.eta * u - self.eta + 1) ** self.alpha))
+    
+    def next_scrambled(self) -> int:
+        """名次经哈希打散后的下标，热点键不再集中在键空间的一端"""
+        return _fnv64(self.next()) % self.n
+
+
+def generate_operations(workload: str, distribution: str, records: int, count: int,
+                        seed: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    预先生成操作序列，每项为 (操作, 键, 参数)：SCAN 的参数为扫描条数，其余为写入的值
+    
+    预加载的键为 0, 2, ..., 2 * (records - 1)。
+    """
+    rng = random.Random(seed)
+    mix = WORKLOADS[workload]
+    ops_cumulative = list(accumulate(mix))
+    zipf = ZipfianGenerator(records, rng=rng) if distribution == 'zipfian' or workload == 'D' else None
+    appended = records  # 下一个追加键的下标（键为 2 * 下标）
+    cursor = 0
+    result: List[Tuple[int, int, int]] = []
+    for i in range(count):
+        op = min(bisect_left(ops_cumulative, rng.random() * ops_cumulative[-1]), RMW)
+        if op == INSERT:
+            if workload == 'D' or distribution == 'sequential':
+                key = 2 * appended
+                appended += 1
+            else:
+                key = 2 * rng.randrange(appended) + 1
+            result.append((op, key, i))
+            continue
+        if workload == 'D':
+            # latest：离最新插入的键越近越热
+            idx = max(0, appended - 1 - zipf.next())
+        elif distribution == 'uniform':
+            idx = rng.randrange(records)
+        elif distribution == 'zipfian':
+            idx = zipf.next_scrambled()
+        else:
+            idx = cursor
+            cursor = (cursor + 1) % records
+        result.append((op, 2 * idx, rng.randint(1, MAX_SCAN_LENGTH) if op == SCAN else i))
+    return result
+
+
+class TreeStore:
+    """BPlusTree 适配器"""
+    
+    def __init__(self, items: Sequence[Tuple[int, int]], order: int):
+        self.tree = BPlusTree.from_sorted(items, order=order)
+    
+    def read(self, key: int) -> Any:
+        return self.tree.search(key)
+    
+    def write(self, key: int, value: int) -> None:
+        self.tree.insert(key, value)
+    
+    def scan(self, key: int, count: int) -> List[Tuple[int, int]]:
+        return list(self.tree.iter_range(key, limit=count))
+    
+    def items(self) -> List[Tuple[int, int]]:
+        return list(self.tree.items())
+
+
+class DictBisectStore:
+    """dict 做点查和更新，另维护一个有序键列表供范围扫描；插入新键时 insort"""
+    
+    def __init__(self, items: Sequence[Tuple[int, int]], order: Optional[int] = None):
+        self.data = dict(items)
+        self.keys = sorted(self.data)
+    
+    def read(self, key: int) -> Any:
+        return self.data.get(key)
+    
+    def write(self, key: int, value: int) -> None:
+        if key not in self.data:
+            insort(self.keys, key)
+        self.data[key] = value
+    
+    def scan(self, key: int, count: int) -> List[Tuple[int, int]]:
+        start = bisect_left(self.keys, key)
+        data = self.data
+        return [(k, data[k]) for k in self.keys[start:start + count]]
+    
+    def items(self) -> List[Tuple[int, int]]:
+        return [(key, self.data[key]) for key in self.keys]
+
+
+class SortedListStore:
+    """键、值两个平行的有序列表，全部操作先 bisect"""
+    
+    def __init__(self, items: Sequence[Tuple[int, int]], order: Optional[int] = None):
+        self.keys = [key for key, _ in items]
+        self.values = [value for _, value in items]
+    
+    def read(self, key: int) -> Any:
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            return self.values[idx]
+        return None
+    
+    def write(self, key: int, value: int) -> None:
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            self.values[idx] = value
+        else:
+            self.keys.insert(idx, key)
+            self.values.insert(idx, value)
+    
+    def scan(self, key: int, count: int) -> List[Tuple[int, int]]:
+        start = bisect_left(self.keys, key)
+        return list(zip(self.keys[start:start + count], self.values[start:start + count]))
+    
+    def items(self) -> List[Tuple[int, int]]:
+        return list(zip(self.keys, self.values))
+
+
+STRUCTURES: Dict[str, Callable[..., Any]] = {
+    'bplustree': TreeStore,
+    'dict_bisect': DictBisectStore,
+    'sorted_list': SortedListStore,
+}
+
+
+def run_operations(store: Any, operations: Iterable[Tuple[int, int, int]]) -> Tuple[float, List[array]]:
+    """执行操作序列并逐个计时，返回 (总耗时秒数, 每种操作的纳秒延迟数组)"""
+    read, write, scan = store.read, store.write, store.scan
+    
+    def do_rmw(key: int, value: int) -> None:
+        read(key)
+        write(key, value)
+    handlers = (read, write, write, scan, do_rmw)
+    samples = [array('q') for _ in handlers]
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for op, key, arg in operations:
+        t0 = clock()
+        handlers[op](key, arg) if op != READ else read(key)
+        samples[op].append(clock() - t0)
+    return time.perf_counter() - start, samples
+
+
+def _latency(samples: Sequence[int]) -> Dict[str, float]:
+    """微秒为单位的 p50 / p99 / 均值 / 最大值（精确值，由排序得到）"""
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'count': n,
+        'p50_us': ordered[max(0, math.ceil(n * 0.5) - 1)] / 1000,
+        'p99_us': ordered[max(0, math.ceil(n * 0.99) - 1)] / 1000,
+        'mean_us': sum(ordered) / n / 1000,
+        'max_us': ordered[-1] / 1000,
+    }
+
+
+def _peak_memory(factory: Callable[..., Any], items: Sequence[Tuple[int, int]], order: Optional[int]) -> int:
+    """用 tracemalloc 测量构建结构时的峰值内存（不含已存在的键值对象）"""
+    tracemalloc.start()
+    try:
+        store = factory(items, order)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del store
+    return peak
+
+
+def benchmark_one(structure: str, workload: str, distribution: str, records: int, operations: int,
+                  order: Optional[int] = None, seed: int = 0, measure_memory: bool = True,
+                  ops: Optional[List[Tuple[int, int, int]]] = None) -> Dict[str, Any]:
+    """测量一组配置，返回一条结果记录"""
+    factory = STRUCTURES[structure]
+    items = [(2 * i, i) for i in range(records)]
+    if ops is None:
+        ops = generate_operations(workload, distribution, records, operations, seed)
+    
+    start = time.perf_counter()
+    store = factory(items, order)
+    load_seconds = time.perf_counter() - start
+    elapsed, samples = run_operations(store, ops)
+    del store
+    
+    result: Dict[str, Any] = {
+        'structure': structure,
+        'workload': workload,
+        'distribution': 'latest' if workload == 'D' else distribution,
+        'records': records,
+        'order': order,
+        'operations': len(ops),
+        'load_seconds': load_seconds,
+        'seconds': elapsed,
+        'throughput_ops_s': len(ops) / elapsed if elapsed else 0.0,
+        'latency': {_OP_NAMES[op]: _latency(data) for op, data in enumerate(samples) if data},
+        'overall_latency': _latency([ns for data in samples for ns in data]) if ops else {},
+    }
+    if measure_memory:
+        result['peak_memory_bytes'] = _peak_memory(factory, items, order)
+    return result
+
+
+def run_suite(workloads: Sequence[str], distributions: Sequence[str], records: Sequence[int],
+              orders: Sequence[int], operations: int, baselines: Sequence[str] = ('dict_bisect', 'sorted_list'),
+              seed: int = 0, measure_memory: bool = True,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    运行全部配置组合；同一 (负载, 分布, 数据量) 下所有结构执行同一个操作序列
+    
+    D 负载的读分布固定为 latest，每个数据量只运行一次。
+    """
+    results = []
+    for workload in workloads:
+        for distribution in (distributions[:1] if workload == 'D' else distributions):
+            for n in records:
+                ops = generate_operations(workload, distribution, n, operations, seed)
+                configs = [('bplustree', order) for order in orders] + [(name, None) for name in baselines]
+                for structure, order in configs:
+                    result = benchmark_one(structure, workload, distribution, n, operations, order,
+                                           seed, measure_memory, ops)
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+    return {'meta': _environment(seed), 'results': results}
+
+
+def _environment(seed: int) -> Dict[str, Any]:
+    """运行环境，便于判断两份结果能否直接比较"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': seed,
+    }
+
+
+def _config_key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (result['structure'], result['workload'], result['distribution'], result['records'], result['order'])
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    按配置逐项对比两份结果的吞吐量，返回 [{配置..., 'ratio': 新/旧, 'regression': bool}]
+    
+    只对比两份结果中都存在的配置；ratio < 1 - threshold 记为回归。
+    """
+    old = {_config_key(result): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        previous = old.get(_config_key(result))
+        if previous is None or not previous['throughput_ops_s']:
+            continue
+        ratio = result['throughput_ops_s'] / previous['throughput_ops_s']
+        rows.append({
+            'structure': result['structure'], 'workload': result['workload'],
+            'distribution': result['distribution'], 'records': result['records'], 'order': result['order'],
+            'ratio': ratio, 'regression': ratio < 1 - threshold,
+        })
+    return rows
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    name = result['structure'] + (f"(order={result['order']})" if result['order'] else "")
+    overall = result['overall_latency']
+    memory = f", 内存 {result['peak_memory_bytes'] / 2 ** 20:.1f} MB" if 'peak_memory_bytes' in result else ""
+    print(f"  {result['workload']} {result['distribution']:<10} n={result['records']:<9} {name:<22} "
+          f"{result['throughput_ops_s']:>12,.0f} ops/s  p50 {overall.get('p50_us', 0):.2f} us  "
+          f"p99 {overall.get('p99_us', 0):.2f} us{memory}", file=sys.stderr)
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(float(part)) for part in text.split(',') if part]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BPlusTree YCSB-style benchmark")
+    parser.add_argument('--workloads', default='A,B,C,D,E,F', help="comma separated subset of A-F")
+    parser.add_argument('--distributions', default='uniform,zipfian,sequential')
+    parser.add_argument('--records', type=_int_list, default=[10000, 100000], help="e.g. 1e4,1e5,1e6")
+    parser.add_argument('--orders', type=_int_list, default=[4, 64, 1024])
+    parser.add_argument('--operations', type=lambda text: int(float(text)), default=100000)
+    parser.add_argument('--baselines', default='dict_bisect,sorted_list', help="comma separated, or empty")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="previous JSON results to compare throughput against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+    
+    workloads = [w.strip().upper() for w in args.workloads.split(',') if w.strip()]
+    distributions = [d.strip() for d in args.distributions.split(',') if d.strip()]
+    baselines = [b.strip() for b in args.baselines.split(',') if b.strip()]
+    for name, values, allowed in (('workload', workloads, WORKLOADS), ('distribution', distributions, DISTRIBUTIONS),
+                                  ('baseline', baselines, STRUCTURES)):
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            parser.error(f"unknown {name}(s): {', '.join(unknown)}")
+    
+    report = run_suite(workloads, distributions, args.records, args.orders, args.operations, baselines,
+                       args.seed, not args.no_memory, progress=_print_result)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report, args.threshold)
+        regressions = [row for row in rows if row['regression']]
+        print(f"\n与 {args.compare} 对比 {len(rows)} 项配置，回归 {len(regressions)} 项:", file=sys.stderr)
+        for row in regressions:
+            print(f"  {row['structure']}(order={row['order']}) {row['workload']} {row['distribution']} "
+                  f"n={row['records']}: 吞吐量 {row['ratio']:.2f}x", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+带写缓冲（LSM 风格）的B+树
+突发写入时每次 insert 都可能触发叶子分裂和列表搬移，尾延迟随之抖动。
+BufferedBPlusTree 在 BPlusTree 前面放一个内存写缓冲（memtable）：
+1. insert/delete 只写入缓冲字典，删除写入墓碑（tombstone），O(1)
+2. 读操作按 活跃缓冲 -> 正在刷写的缓冲 -> 树 的优先级合并结果，墓碑遮蔽树中的旧值
+3. 缓冲达到 buffer_size 条后整体排序，通过 put_many/delete_many 批量归并进树：
+   每个受影响的叶子只下降一次、一次性切分，而不是逐个键分裂
+
+background=True 时刷写在后台线程进行：缓冲写满后换上一个新的空缓冲继续接收写入，
+旧缓冲交给后台线程归并；上一批还没刷完时写入方等待（反压），缓冲占用的内存有上界。
+与 BPlusTree 一样，读写接口应由同一个线程调用；后台线程是树唯一的另一个使用者，二者用锁协调。
+"""
+
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from b_plus_tree import KEY_TYPES, BPlusTree
+
+
+# 墓碑：缓冲中表示"该键已删除"
+_TOMBSTONE = object()
+_MISSING = object()
+
+
+class BufferedBPlusTree:
+    """
+    带写缓冲的B+树
+    
+    接口与 BPlusTree 的常用子集相同：insert/delete/search/range_query/iter_range 等。
+    调用 flush() 可以立即把缓冲归并进树；close()（或 with 语句）会停止后台线程并刷写剩余数据。
+    """
+    
+    def __init__(self, tree: Optional[BPlusTree] = None, order: int = 64, buffer_size: int = 4096,
+                 background: bool = False, key_type: Optional[str] = None):
+        """
+        Args:
+            tree: 被缓冲的树，None 时新建一棵
+            order: 新建树的阶数
+            buffer_size: 缓冲中累计多少个键后刷写
+            background: 是否在后台线程刷写
+            key_type: 新建树的数值键类型，同 BPlusTree
+        """
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self.tree = tree if tree is not None else BPlusTree(order, key_type=key_type)
+        self.buffer_size = buffer_size
+        self.background = background
+        self._active: Dict[Any, Any] = {}
+        self._active_sorted: Optional[List[Any]] = None  # 活跃缓冲的有序键，写入新键时失效
+        self._frozen: Dict[Any, Any] = {}  # 正在后台刷写的缓冲，刷写期间只读
+        self._frozen_entries: List[Tuple[Any, Any]] = []  # 同一缓冲按键排序的条目，供范围查询使用
+        # 写入缓冲前检查键用：类型化树的 array 类型码，否则取一个已有的键做一次比较
+        self._typecode = KEY_TYPES[self.tree.key_type] if self.tree.key_type else None
+        self._sample = next(self.tree.keys(), _MISSING)
+        # _tree_lock 保护树本身；_cond 保护缓冲交换和后台线程的启停
+        self._tree_lock = threading.Lock()
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        # 统计信息
+        self.flushes = 0
+        self.flushed_keys = 0
+        self.stall_seconds = 0.0
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(target=self._flush_loop, name="bplustree-flusher", daemon=True)
+            self._thread.start()
+    
+    # ---- 写操作 ----
+    
+    def insert(self, key: Any, value: Any) -> bool:
+        """插入键值对，键已存在时更新值"""
+        self._check_open()
+        if key not in self._active:
+            self._check_key(key)
+            self._active_sorted = None
+        self._active[key] = value
+        if len(self._active) >= self.buffer_size:
+            self._rotate()
+        return True
+    
+    def delete(self, key: Any) -> bool:
+        """删除键，返回删除前键是否存在；只写入墓碑，不修改树"""
+        self._check_open()
+        if key not in self:
+            return False
+        if key not in self._active:
+            self._active_sorted = None
+        self._active[key] = _TOMBSTONE
+        if len(self._active) >= self.buffer_size:
+            self._rotate()
+        return True
+    
+    def flush(self) -> None:
+        """把缓冲中的全部修改归并进树，返回时树已包含此前的所有写入"""
+        self._check_open()
+        if self._active:
+            self._rotate()
+        if self.background:
+            with self._cond:
+                while self._frozen and self._error is None:
+                    self._cond.wait()
+            self._raise_error()
+    
+    def close(self) -> None:
+        """刷写剩余数据并停止后台线程"""
+        if self._closed:
+            return
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+    
+    # ---- 读操作 ----
+    
+    def search(self, key: Any) -> Optional[Any]:
+        """搜索键对应的值，缓冲中的新值和墓碑优先于树"""
+        for table in (self._active, self._frozen):
+            value = table.get(key, _MISSING)
+            if value is not _MISSING:
+                return None if value is _TOMBSTONE else value
+        with self._tree_lock:
+            return self.tree.search(key)
+    
+    def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
+        """范围查询，返回 [start_key, end_key] 内的全部键值对"""
+        return list(self.iter_range(start_key, end_key))
+    
+    def iter_range(self, start_key: Any = None, end_key: Any = None,
+                   inclusive: Tuple[bool, bool] = (True, True), limit: Optional[int] = None,
+                   reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """
+        惰性范围迭代，参数含义与 BPlusTree.iter_range 相同
+        
+        开始迭代时复制两个缓冲中落在区间内的条目，并对树取一个写时复制快照，
+        三路有序归并：同一个键以优先级最高的来源为准，墓碑不产出。
+        迭代期间的写入和后台刷写都不影响本次结果。
+        """
+        if limit is not None and limit <= 0:
+            return
+        if self._active_sorted is None:
+            self._active_sorted = sorted(self._active)
+        keys = self._active_sorted
+        lo, hi = self._bounds(keys, start_key, end_key, inclusive)
+        active = [(key, self._active[key]) for key in keys[lo:hi]]
+        # 先取刷写中的条目再对树取快照：后台恰好刷完时两边内容相同，不会漏掉
+        entries = self._frozen_entries
+        lo, hi = self._bounds(entries, start_key, end_key, inclusive, key=itemgetter(0))
+        frozen = entries[lo:hi]
+        if reverse:
+            active.reverse()
+            frozen.reverse()
+        sources = [active, frozen]
+        with self._tree_lock:
+            snap = self.tree.snapshot()
+        sources.append(snap.iter_range(start_key, end_key, inclusive, reverse=reverse))
+        
+        # heapq.merge 对相等的键按来源顺序产出，第一个就是优先级最高的
+        last = _MISSING
+        for key, value in heapq.merge(*sources, key=itemgetter(0), reverse=reverse):
+            if last is not _MISSING and key == last:
+                continue
+            last = key
+            if value is _TOMBSTONE:
+                continue
+            yield key, value
+            if limit is not None:
+                limit -= 1
+                if limit == 0:
+                    return
+    
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """按键序惰性产出全部 (键, 值)"""
+        return self.iter_range()
+    
+    def keys(self) -> Iterator[Any]:
+        """按键序惰性产出全部键"""
+        return (key for key, _ in self.iter_range())
+    
+    def traverse(self) -> List[Any]:
+        """遍历所有键（有序）"""
+        return list(self.keys())
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓冲与刷写统计"""
+        return {
+            'buffered': len(self._active) + len(self._frozen),
+            'tombstones': sum(1 for table in (self._active, self._frozen)
+                              for value in table.values() if value is _TOMBSTONE),
+            'flushes': self.flushes,
+            'flushed_keys': self.flushed_keys,
+            'stall_seconds': self.stall_seconds,
+            'tree_size': len(self.tree),
+        }
+    
+    def __enter__(self) -> 'BufferedBPlusTree':
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def __iter__(self) -> Iterator[Any]:
+        return self.keys()
+    
+    def __contains__(self, key: Any) -> bool:
+        for table in (self._active, self._frozen):
+            value = table.get(key, _MISSING)
+            if value is not _MISSING:
+                return value is not _TOMBSTONE
+        with self._tree_lock:
+            # 值可能就是 None，用键数判断是否存在
+            return self.tree.count_range(key, key) > 0
+    
+    def __len__(self) -> int:
+        """树中键数加上缓冲造成的增减，需要对每个缓冲键查一次树，O(b log n)"""
+        with self._tree_lock:
+            size = len(self.tree)
+            pending = dict(self._frozen)
+            pending.update(self._active)
+            for key, value in pending.items():
+                size += (value is not _TOMBSTONE) - self.tree.count_range(key, key)
+        return size
+    
+    def __repr__(self) -> str:
+        return (f"BufferedBPlusTree(order={self.tree.order}, buffered={len(self._active) + len(self._frozen)}, "
+                f"background={self.background})")
+    
+    # ---- 内部实现 ----
+    
+    @staticmethod
+    def _bounds(items: List[Any], start_key: Any, end_key: Any, inclusive: Tuple[bool, bool],
+                key: Any = None) -> Tuple[int, int]:
+        """有序序列中落在区间内的下标范围 [lo, hi)"""
+        low_inclusive, high_inclusive = inclusive
+        lo, hi = 0, len(items)
+        if start_key is not None:
+            lo = (bisect_left if low_inclusive else bisect_right)(items, start_key, key=key)
+        if end_key is not None:
+            hi = (bisect_right if high_inclusive else bisect_left)(items, end_key, key=key)
+        return lo, max(lo, hi)
+    
+    def _rotate(self) -> None:
+        """缓冲写满或显式 flush：同步模式直接归并，后台模式交给刷写线程"""
+        batch, self._active, self._active_sorted = self._active, {}, None
+        if not self.background:
+            try:
+                self._apply(batch)
+            except BaseException:
+                # 归并失败时把这批条目放回缓冲，已接受的写入不丢失；put_many 之后重放是幂等的
+                self._active = batch
+                raise
+            return
+        with self._cond:
+            if self._frozen:
+                start = time.perf_counter()
+                while self._frozen and self._error is None:
+                    self._cond.wait()
+                self.stall_seconds += time.perf_counter() - start
+            self._raise_error()
+            self._frozen_entries = sorted(batch.items(), key=itemgetter(0))
+            self._frozen = batch
+            self._cond.notify_all()
+    
+    def _apply(self, batch: Dict[Any, Any]) -> None:
+        """把一批缓冲条目按键序批量归并进树"""
+        entries = sorted(batch.items(), key=itemgetter(0))
+        with self._tree_lock:
+            self.tree.put_many([(key, value) for key, value in entries if value is not _TOMBSTONE])
+            self.tree.delete_many([key for key, value in entries if value is _TOMBSTONE])
+        self.flushes += 1
+        self.flushed_keys += len(entries)
+    
+    def _flush_loop(self) -> None:
+        """后台线程：等待交换出来的缓冲并归并进树"""
+        while True:
+            with self._cond:
+                while not self._frozen and not self._closed:
+                    self._cond.wait()
+                if not self._frozen:
+                    return
+                batch = self._frozen
+            try:
+                self._apply(batch)
+            except BaseException as e:  # 交给写入方在下一次 flush/rotate 时抛出
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._frozen, self._frozen_entries = {}, []
+                self._cond.notify_all()
+    
+    def _check_key(self, key: Any) -> None:
+        """
+        写入缓冲前检查新键：树拒绝的键要等到刷写时才暴露，会让整批写入一起失败。
+        类型化树按 key_type 转换一次，否则与一个已有的键比较一次（类型不可比较时抛出 TypeError）
+        """
+        if self._typecode is not None:
+            try:
+                array(self._typecode, (key,))
+            except OverflowError as e:
+                raise ValueError(f"key {key!r} is out of range for key_type {self.tree.key_type!r}") from e
+        elif self._sample is _MISSING:
+            self._sample = key
+        else:
+            self._sample < key
+    
+    def _check_open(self) -> None:
+        if self._closed:
+            raise ValueError("BufferedBPlusTree is closed")
+        self._raise_error()
+    
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("background flush failed") from self._error
@@ -0,0 +1,663 @@
+"""
+线程安全的并发B+树
+在 BPlusTree 的基础上为每个节点加上读写锁存器（latch）和版本号：
+1. 读操作先走乐观路径：不加锁，从根下降时记录每个节点的版本号，
+   读完后校验版本没有变化；多次校验失败再退回到共享锁存器的加锁下降。
+2. 写操作先乐观：共享锁存器下降到叶子的父节点，只对叶子加排他锁存器，
+   叶子"安全"（插入不会分裂、删除不会下溢）就直接修改；否则改用悲观的
+   锁存器耦合（latch crabbing）：自顶向下加排他锁存器，一旦子节点安全就释放全部祖先。
+3. 分裂/合并还会修改兄弟节点和相邻叶子，这些锁存器用非阻塞方式获取，
+   获取失败就释放全部锁存器后重试，因此只存在自顶向下和从左到右两种阻塞等待方向，不会死锁。
+
+写操作修改节点前把版本号加一（变为奇数），完成后再加一，乐观读者据此发现并发修改。
+注意：CPython 有 GIL 时读线程无法真正并行，乐观读路径的价值在于不与写者争抢锁存器；
+在 free-threaded Python 上读吞吐可以随线程数增长。
+ConcurrentBPlusTree 持有一棵节点带锁存器的 BPlusTree 而不是继承它：并发版本不维护子树计数、
+聚合和写时复制，rank/select、游标、split/concat 等依赖它们的接口不提供。
+"""
+
+import random
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from b_plus_tree import KEY_TYPES, BPlusTree, BPlusTreeInternalNode, BPlusTreeLeafNode, BPlusTreeNode
+
+
+class RWLatch:
+    """读写锁存器：多个读者或一个写者，有写者等待时新读者让路，避免写者饥饿"""
+    
+    __slots__ = ('_cond', '_readers', '_writer', '_waiting_writers')
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    def acquire_shared(self) -> None:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_shared(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+    
+    def acquire_exclusive(self, blocking: bool = True) -> bool:
+        with self._cond:
+            if not blocking:
+                if self._writer or self._readers:
+                    return False
+                self._writer = True
+                return True
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+            return True
+    
+    def release_exclusive(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class ConcurrentLeafNode(BPlusTreeLeafNode):
+    """带锁存器和版本号的叶子节点"""
+    
+    __slots__ = ('latch', 'version')
+    
+    def __init__(self):
+        super().__init__()
+        self.latch = RWLatch()
+        self.version = 0
+
+
+class ConcurrentInternalNode(BPlusTreeInternalNode):
+    """带锁存器和版本号的内部节点"""
+    
+    __slots__ = ('latch', 'version')
+    
+    def __init__(self):
+        super().__init__()
+        self.latch = RWLatch()
+        self.version = 0
+
+
+class _Restart(Exception):
+    """获取兄弟节点锁存器失败，需要释放全部锁存器后重试"""
+
+
+_RETRY = object()
+
+
+class _LatchedTree(BPlusTree):
+    """节点带锁存器和版本号的B+树，ConcurrentBPlusTree 用它存放节点并复用分裂/合并的实现"""
+    
+    leaf_class = ConcurrentLeafNode
+    internal_class = ConcurrentInternalNode
+
+
+class ConcurrentBPlusTree:
+    """
+    支持多线程并发读写的B+树
+    
+    节点保存在 self.tree（一棵节点带锁存器的 BPlusTree）中，对外只提供能在锁存器下
+    安全执行的接口：点查、范围迭代、增删及其批量版本，以及经由范围迭代的整树读取。
+    范围迭代每次只在一个叶子上持有共享锁存器，产出结果时不持有任何锁存器，
+    因此慢速消费者不会阻塞写者。
+    """
+    
+    def __init__(self, order: int = 4, key_type: Optional[str] = None, optimistic_retries: int = 8):
+        """
+        Args:
+            order: B+树的阶数
+            key_type: 数值键类型，同 BPlusTree
+            optimistic_retries: 乐观读校验失败多少次后改用加锁读
+        """
+        self.tree = _LatchedTree(order, key_type)
+        self.order = order
+        self.key_type = key_type
+        self.optimistic_retries = optimistic_retries
+        # 保护 tree.root / tree.height 的锁存器和版本号
+        self._root_latch = RWLatch()
+        self._root_version = 0
+        self._size_lock = threading.Lock()
+        # 统计信息（近似值，不加锁累加）
+        self.optimistic_reads = 0
+        self.locked_reads = 0
+        self.optimistic_writes = 0
+        self.locked_writes = 0
+        self.restarts = 0
+    
+    @classmethod
+    def from_sorted(cls, items: Iterable[Tuple[Any, Any]], order: int = 4, fill_factor: float = 1.0,
+                    key_type: Optional[str] = None) -> 'ConcurrentBPlusTree':
+        """从按键有序的 (键, 值) 序列自底向上构建，见 BPlusTree.from_sorted"""
+        tree = cls(order, key_type)
+        tree.tree = _LatchedTree.from_sorted(items, order, fill_factor, key_type)
+        return tree
+    
+    @classmethod
+    def bulk_load(cls, items: Iterable[Tuple[Any, Any]], order: int = 4, fill_factor: float = 1.0,
+                  key_type: Optional[str] = None) -> 'ConcurrentBPlusTree':
+        """批量构建，输入可以无序，见 BPlusTree.bulk_load"""
+        tree = cls(order, key_type)
+        tree.tree = _LatchedTree.bulk_load(items, order, fill_factor, key_type=key_type)
+        return tree
+    
+    @classmethod
+    def load(cls, path: str) -> 'ConcurrentBPlusTree':
+        """读取 dump() 写出的文件，见 BPlusTree.load"""
+        loaded = _LatchedTree.load(path)
+        tree = cls(loaded.order, loaded.key_type)
+        tree.tree = loaded
+        return tree
+    
+    # ---- 读操作 ----
+    
+    def search(self, key: Any) -> Optional[Any]:
+        """搜索键对应的值：先乐观读，多次校验失败后加锁读"""
+        for _ in range(self.optimistic_retries):
+            result = self._optimistic_search(key)
+            if result is not _RETRY:
+                self.optimistic_reads += 1
+                return result
+        self.locked_reads += 1
+        leaf, latched = self._descend_shared(key)
+        try:
+            return leaf.search(key)
+        finally:
+            latched.release_shared()
+    
+    def get_many(self, keys: Iterable[Any]) -> List[Optional[Any]]:
+        """批量查找（逐个查找，每次下降独立加锁）"""
+        return [self.search(key) for key in keys]
+    
+    def iter_range(self, start_key: Any = None, end_key: Any = None,
+                   inclusive: Tuple[bool, bool] = (True, True), limit: Optional[int] = None,
+                   reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """
+        惰性范围迭代，参数含义与 BPlusTree.iter_range 相同
+        
+        每次在共享锁存器保护下复制一个叶子中的结果，然后释放锁存器再产出；
+        下一段从上一个叶子的分隔键重新下降，不依赖可能被并发修改的叶子链表。
+        """
+        if limit is not None and limit <= 0:
+            return
+        low_inclusive, high_inclusive = inclusive
+        remaining = limit
+        
+        if not reverse:
+            seek, seek_inclusive = start_key, low_inclusive
+            while True:
+                chunk, seek = self._read_chunk(seek, seek_inclusive, reverse=False)
+                seek_inclusive = True
+                for key, value in chunk:
+                    if end_key is not None and (key > end_key or (key == end_key and not high_inclusive)):
+                        return
+                    yield key, value
+                    if remaining is not None:
+                        remaining -= 1
+                        if remaining == 0:
+                            return
+                if seek is None:
+                    return
+        else:
+            seek, seek_inclusive = end_key, high_inclusive
+            while True:
+                chunk, seek = self._read_chunk(seek, seek_inclusive, reverse=True)
+                seek_inclusive = False
+                for key, value in chunk:
+                    if start_key is not None and (key < start_key or (key == start_key and not low_inclusive)):
+                        return
+                    yield key, value
+                    if remaining is not None:
+                        remaining -= 1
+                        if remaining == 0:
+                            return
+                if seek is None:
+                    return
+    
+    def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
+        """范围查询，返回 [start_key, end_key] 内的全部键值对"""
+        return list(self.iter_range(start_key, end_key))
+    
+    def items(self, reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """按键序惰性产出全部 (键, 值)"""
+        return self.iter_range(reverse=reverse)
+    
+    def keys(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部键"""
+        return (key for key, _ in self.iter_range(reverse=reverse))
+    
+    def values(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部值"""
+        return (value for _, value in self.iter_range(reverse=reverse))
+    
+    def traverse(self) -> List[Any]:
+        """遍历所有键（有序）"""
+        return list(self.keys())
+    
+    # 以下整树读取都经由 iter_range：每个叶子在共享锁存器下复制，不会读到写了一半的叶子；
+    # 与写操作并发时结果是各叶子被读取时的内容，而不是某一时刻的整体快照
+    
+    def count_range(self, start_key: Any, end_key: Any) -> int:
+        """[start_key, end_key] 内的键数；并发版本不维护子树计数，逐个数过区间，O(log n + k)"""
+        return sum(1 for _ in self.iter_range(start_key, end_key))
+    
+    def range_keys(self, start_key: Any = None, end_key: Any = None) -> Union[List[Any], array]:
+        """返回 [start_key, end_key] 内的全部键，类型化键模式下为 array"""
+        result = array(KEY_TYPES[self.key_type]) if self.key_type else []
+        result.extend(key for key, _ in self.iter_range(start_key, end_key))
+        return result
+    
+    def snapshot(self) -> 'BPlusTreeSnapshot':
+        """
+        只读快照：复制出全部键值重新建一棵 BPlusTree 再取快照，O(n)
+        
+        并发版本的节点没有写时复制，快照是复制时各叶子的内容，之后的写入不影响它。
+        """
+        return BPlusTree.from_sorted(self.iter_range(), self.order, key_type=self.key_type).snapshot()
+    
+    def dump(self, path: str, chunk_keys: int = 65536) -> None:
+        """先复制出全部键值并重新分好叶子，再按 BPlusTree.dump 的格式写入"""
+        BPlusTree.from_sorted(self.iter_range(), self.order, key_type=self.key_type).dump(path, chunk_keys)
+    
+    def freeze(self) -> 'FrozenBPlusTree':
+        """生成只读副本，见 BPlusTree.freeze"""
+        from frozen_b_plus_tree import FrozenBPlusTree  # 延迟导入，避免循环依赖
+        keys = array(KEY_TYPES[self.key_type]) if self.key_type else []
+        values: List[Any] = []
+        for key, value in self.iter_range():
+            keys.append(key)
+            values.append(value)
+        return FrozenBPlusTree(keys, values, self.order, self.key_type)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        结构统计，字段同 BPlusTree.stats 的结构部分，另含乐观/加锁读写次数
+        
+        逐层遍历，每个节点在共享锁存器下读取；与写操作并发时各层是被读取时的状态。
+        """
+        levels: List[int] = []
+        occupancy = [0] * 10
+        leaf_keys = internal_children = memory = 0
+        self._root_latch.acquire_shared()
+        level, height = [self.tree.root], self.tree.height
+        self._root_latch.release_shared()
+        while level:
+            levels.append(len(level))
+            below = []
+            for node in level:
+                node.latch.acquire_shared()
+                try:
+                    memory += sys.getsizeof(node) + sys.getsizeof(node.keys)
+                    if node.is_leaf:
+                        leaf_keys += len(node.keys)
+                        occupancy[min(9, len(node.keys) * 10 // (self.order - 1))] += 1
+                        memory += sys.getsizeof(node.values)
+                    else:
+                        internal_children += len(node.children)
+                        memory += sys.getsizeof(node.children) + sys.getsizeof(node.counts)
+                        below.extend(node.children)
+                finally:
+                    node.latch.release_shared()
+            level = below
+        leaves, internals = levels[-1], sum(levels[:-1])
+        
+        return {
+            'size': len(self),
+            'order': self.order,
+            'height': height,
+            'nodes_per_level': levels,
+            'leaves': leaves,
+            'internal_nodes': internals,
+            'leaf_fill': leaf_keys / (leaves * (self.order - 1)),
+            'internal_fill': internal_children / (internals * self.order) if internals else 0.0,
+            'leaf_occupancy': occupancy,
+            'memory_bytes': memory,
+            'optimistic_reads': self.optimistic_reads,
+            'locked_reads': self.locked_reads,
+            'optimistic_writes': self.optimistic_writes,
+            'locked_writes': self.locked_writes,
+            'restarts': self.restarts,
+        }
+    
+    def __iter__(self) -> Iterator[Any]:
+        """按键序迭代全部键"""
+        return self.keys()
+    
+    def __contains__(self, key: Any) -> bool:
+        """检查键是否存在（值为 None 的键也算存在）"""
+        return any(True for _ in self.iter_range(key, key))
+    
+    def __len__(self) -> int:
+        """键值对数量，O(1)"""
+        return len(self.tree)
+    
+    def __repr__(self) -> str:
+        return f"ConcurrentBPlusTree(order={self.order}, height={self.tree.height}, size={len(self)})"
+    
+    # ---- 写操作 ----
+    
+    def insert(self, key: Any, value: Any) -> bool:
+        """插入键值对，键已存在时更新值"""
+        self._write(key, value, deleting=False)
+        return True
+    
+    def delete(self, key: Any) -> bool:
+        """删除键值对"""
+        return self._write(key, None, deleting=True)
+    
+    def put_many(self, items: Iterable[Tuple[Any, Any]]) -> int:
+        """批量插入（逐个插入），返回新增键的数量"""
+        return sum(self._write(key, value, deleting=False) for key, value in items)
+    
+    def delete_many(self, keys: Iterable[Any]) -> int:
+        """批量删除（逐个删除），返回实际删除的键数量"""
+        return sum(self._write(key, None, deleting=True) for key in set(keys))
+    
+    # ---- 内部实现：读 ----
+    
+    def _optimistic_search(self, key: Any) -> Any:
+        """无锁下降，任何一步版本校验失败都返回 _RETRY"""
+        root_version = self._root_version
+        if root_version & 1:
+            return _RETRY
+        node = self.tree.root
+        version = node.version
+        if version & 1 or self._root_version != root_version:
+            return _RETRY
+        try:
+            while not node.is_leaf:
+                child = node.children[bisect_right(node.keys, key)]
+                child_version = child.version
+                # 先读子节点版本再校验父节点，保证读到的子节点指针在那一刻仍然有效
+                if child_version & 1 or node.version != version:
+                    return _RETRY
+                node, version = child, child_version
+            value = node.search(key)
+        except (IndexError, TypeError):
+            # 并发修改中读到了不一致的列表，交给版本校验重试
+            return _RETRY
+        if node.version != version:
+            return _RETRY
+        return value
+    
+    def _descend_shared(self, key: Any) -> Tuple[BPlusTreeLeafNode, RWLatch]:
+        """共享锁存器耦合下降到叶子，返回叶子和仍持有的叶子锁存器"""
+        self._root_latch.acquire_shared()
+        node = self.tree.root
+        node.latch.acquire_shared()
+        self._root_latch.release_shared()
+        while not node.is_leaf:
+            child = node.children[bisect_right(node.keys, key)]
+            child.latch.acquire_shared()
+            node.latch.release_shared()
+            node = child
+        return node, node.latch
+    
+    def _read_chunk(self, seek: Any, inclusive: bool, reverse: bool) -> Tuple[List[Tuple[Any, Any]], Any]:
+        """
+        在一个叶子上读取扫描方向上 seek 之后的全部键值对
+        
+        返回 (结果, 下一段的起点)，起点是该叶子在扫描方向上的边界分隔键，None 表示已到尽头。
+        正向：seek 为 None 从最左开始，结果为 >= seek（inclusive=False 时 > seek）的键；
+        逆向：seek 为 None 从最右开始，结果为 <= seek（inclusive=False 时 < seek）的键，降序。
+        """
+        # 逆向且不包含 seek 时用 bisect_left 下降，落到覆盖 "< seek" 区间的叶子
+        descend = bisect_left if (reverse and not inclusive) else bisect_right
+        self._root_latch.acquire_shared()
+        node = self.tree.root
+        node.latch.acquire_shared()
+        self._root_latch.release_shared()
+        bound = None
+        while not node.is_leaf:
+            if seek is None:
+                idx = len(node.children) - 1 if reverse else 0
+            else:
+                idx = descend(node.keys, seek)
+            if reverse and idx > 0:
+                bound = node.keys[idx - 1]
+            elif not reverse and idx < len(node.keys):
+                bound = node.keys[idx]
+            child = node.children[idx]
+            child.latch.acquire_shared()
+            node.latch.release_shared()
+            node = child
+        try:
+            keys, values = node.keys, node.values
+            if not reverse:
+                start = 0 if seek is None else (bisect_left if inclusive else bisect_right)(keys, seek)
+                chunk = list(zip(keys[start:], values[start:]))
+            else:
+                stop = len(keys) if seek is None else (bisect_right if inclusive else bisect_left)(keys, seek)
+                chunk = list(zip(keys[:stop], values[:stop]))
+                chunk.reverse()
+        finally:
+            node.latch.release_shared()
+        return chunk, bound
+    
+    # ---- 内部实现：写 ----
+    
+    def _write(self, key: Any, value: Any, deleting: bool) -> bool:
+        """执行一次插入或删除，返回是否新增/删除了键"""
+        result = self._optimistic_write(key, value, deleting)
+        if result is not _RETRY:
+            self.optimistic_writes += 1
+            return result
+        self.locked_writes += 1
+        while True:
+            try:
+                return self._locked_write(key, value, deleting)
+            except _Restart:
+                self.restarts += 1
+                time.sleep(random.random() * 1e-4)
+    
+    def _optimistic_write(self, key: Any, value: Any, deleting: bool) -> Any:
+        """共享锁存器下降到叶子的父节点，只对叶子加排他锁存器；叶子不安全时返回 _RETRY"""
+        self._root_latch.acquire_shared()
+        node = self.tree.root
+        if node.is_leaf:
+            node.latch.acquire_exclusive()
+            self._root_latch.release_shared()
+        else:
+            node.latch.acquire_shared()
+            self._root_latch.release_shared()
+            while True:
+                child = node.children[bisect_right(node.keys, key)]
+                if child.is_leaf:
+                    child.latch.acquire_exclusive()
+                else:
+                    child.latch.acquire_shared()
+                node.latch.release_shared()
+                node = child
+                if node.is_leaf:
+                    break
+        
+        leaf = node
+        try:
+            idx = bisect_left(leaf.keys, key)
+            exists = idx < len(leaf.keys) and leaf.keys[idx] == key
+            if deleting:
+                if not exists:
+                    return False
+                if leaf.parent is not None and len(leaf.keys) - 1 < leaf.min_keys(self.order):
+                    return _RETRY
+                self._begin_modify([leaf])
+                leaf.delete(key, self.order)
+                self._end_modify([leaf])
+                self._add_size(-1)
+                return True
+            if not exists and len(leaf.keys) + 1 >= self.order:
+                return _RETRY
+            self._begin_modify([leaf])
+            try:
+                leaf.insert(key, value, self.order)
+            finally:
+                # 键无法转换时 leaf.insert 在修改之前抛出，版本号仍须恢复为偶数
+                self._end_modify([leaf])
+            if not exists:
+                self._add_size(1)
+            return not exists
+        finally:
+            leaf.latch.release_exclusive()
+    
+    def _locked_write(self, key: Any, value: Any, deleting: bool) -> bool:
+        """悲观路径：排他锁存器耦合下降，预先锁住可能被修改的兄弟节点后再修改"""
+        held, holds_root = self._descend_exclusive(key, deleting)
+        extra: List[BPlusTreeNode] = []
+        try:
+            leaf = held[-1]
+            idx = bisect_left(leaf.keys, key)
+            exists = idx < len(leaf.keys) and leaf.keys[idx] == key
+            if deleting and not exists:
+                return False
+            
+            if not deleting:
+                if not exists and len(leaf.keys) + 1 >= self.order and leaf.next_leaf is not None:
+                    # 叶子会分裂：新叶子要挂到后继叶子的 prev_leaf 上
+                    self._try_latch(leaf.next_leaf, extra)
+            else:
+                self._latch_rebalance_neighbors(held, extra)
+            
+            modified = held + extra
+            self._begin_modify(modified, holds_root)
+            try:
+                if deleting:
+                    leaf.delete(key, self.order)
+                    if leaf.is_underflow(self.order):
+                        self.tree._handle_underflow(leaf)
+                else:
+                    _, new_node = leaf.insert(key, value, self.order)
+                    if new_node is not None:
+                        self.tree._handle_split(leaf, new_node, self.tree._leaf_separator(leaf, new_node))
+            finally:
+                self._end_modify(modified, holds_root)
+            
+            if deleting:
+                self._add_size(-1)
+                return True
+            if not exists:
+                self._add_size(1)
+            return not exists
+        finally:
+            for node in extra:
+                node.latch.release_exclusive()
+            for node in held:
+                node.latch.release_exclusive()
+            if holds_root:
+                self._root_latch.release_exclusive()
+    
+    def _descend_exclusive(self, key: Any, deleting: bool) -> Tuple[List[BPlusTreeNode], bool]:
+        """
+        排他锁存器耦合下降
+        
+        返回 (从最近的安全祖先到叶子持有锁存器的节点, 是否持有根锁存器)。
+        根节点不安全时同时持有根锁存器，因为 self.tree.root 可能被替换。
+        """
+        self._root_latch.acquire_exclusive()
+        holds_root = True
+        node = self.tree.root
+        node.latch.acquire_exclusive()
+        held = [node]
+        if self._is_safe(node, deleting):
+            self._root_latch.release_exclusive()
+            holds_root = False
+        while not node.is_leaf:
+            child = node.children[bisect_right(node.keys, key)]
+            child.latch.acquire_exclusive()
+            if self._is_safe(child, deleting):
+                for ancestor in held:
+                    ancestor.latch.release_exclusive()
+                held = []
+                if holds_root:
+                    self._root_latch.release_exclusive()
+                    holds_root = False
+            held.append(child)
+            node = child
+        return held, holds_root
+    
+    def _is_safe(self, node: BPlusTreeNode, deleting: bool) -> bool:
+        """节点在本次操作中不会分裂（插入）或下溢（删除）"""
+        if not deleting:
+            return len(node.keys) + 1 < self.order
+        if node.parent is None:
+            # 叶子根永远不需要调整；内部根只有在仅剩一个键时才可能收缩
+            return node.is_leaf or len(node.keys) > 1
+        return len(node.keys) - 1 >= node.min_keys(self.order)
+    
+    def _latch_rebalance_neighbors(self, held: List[BPlusTreeNode], extra: List[BPlusTreeNode]) -> None:
+        """删除可能引起下溢时，非阻塞地锁住每个持有节点的左右兄弟以及叶子的后继"""
+        for i in range(1, len(held)):
+            node, parent = held[i], held[i - 1]
+            idx = self.tree._index_in_parent(node)
+            if idx > 0:
+                self._try_latch(parent.children[idx - 1], extra)
+            if idx + 1 < len(parent.children):
+                right = parent.children[idx + 1]
+                self._try_latch(right, extra)
+                if right.is_leaf and right.next_leaf is not None:
+                    self._try_latch(right.next_leaf, extra)
+            elif node.is_leaf and node.next_leaf is not None:
+                self._try_latch(node.next_leaf, extra)
+    
+    @staticmethod
+    def _try_latch(node: BPlusTreeNode, extra: List[BPlusTreeNode]) -> None:
+        if any(latched is node for latched in extra):
+            return
+        if not node.latch.acquire_exclusive(blocking=False):
+            raise _Restart()
+        extra.append(node)
+    
+    def _begin_modify(self, nodes: List[BPlusTreeNode], holds_root: bool = False) -> None:
+        """版本号变为奇数，乐观读者会因此重试"""
+        if holds_root:
+            self._root_version += 1
+        for node in nodes:
+            node.version += 1
+    
+    def _end_modify(self, nodes: List[BPlusTreeNode], holds_root: bool = False) -> None:
+        """修改完成，版本号回到偶数"""
+        for node in nodes:
+            node.version += 1
+        if holds_root:
+            self._root_version += 1
+    
+    def _add_size(self, delta: int) -> None:
+        with self._size_lock:
+            self.tree._size += delta
+
+
+if __name__ == "__main__":
+    tree = ConcurrentBPlusTree(order=16)
+    tree.put_many((i, i) for i in range(0, 20000, 2))
+    
+    def reader() -> None:
+        for _ in range(20000):
+            key = random.randrange(0, 20000, 2)
+            assert tree.search(key) is not None
+    
+    def writer(offset: int) -> None:
+        for i in range(offset, 20000, 8):
+            tree.insert(i, i)
+            tree.delete(i)
+    
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    threads += [threading.Thread(target=writer, args=(offset,)) for offset in (1, 3, 5, 7)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"{tree}: {time.perf_counter() - start:.2f} 秒, 乐观读 {tree.optimistic_reads}, 加锁读 {tree.locked_reads}, "
+          f"乐观写 {tree.optimistic_writes}, 加锁写 {tree.locked_writes}, 重试 {tree.restarts}")
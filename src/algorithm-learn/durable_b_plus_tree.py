@@ -0,0 +1,491 @@
+"""
+带预写日志（WAL）的持久化B+树
+内存中仍是 BPlusTree，持久化由两部分组成：
+1. 检查点文件：某一时刻全部键值对的有序序列
+2. WAL：检查点之后的每一次 insert/delete，追加写入并带 CRC 校验
+
+写入先追加到 WAL 缓冲区，由后台线程按"组提交"批量 write + fsync：
+第一条记录到达后最多等待 group_commit_ms 毫秒（或攒满 max_batch 条）再统一落盘，
+多个写线程共享一次 fsync。打开时先批量加载检查点，再把 WAL 尾部合并成
+每个键的最终状态，与检查点一起通过 from_sorted 一次性建树，而不是逐条 insert。
+"""
+
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from b_plus_tree import BPlusTree
+
+
+OP_INSERT = 1
+OP_DELETE = 2
+
+# 记录头：负载长度, CRC32
+_RECORD_HEADER = struct.Struct('<II')
+# 检查点头：魔数, 版本, 检查点对应的 LSN, 键值对数量
+_CHECKPOINT_HEADER = struct.Struct('<8sIqq')
+_CHECKPOINT_MAGIC = b'BPTCKPT1'
+_CHECKPOINT_VERSION = 1
+
+
+def read_log(path: str) -> Tuple[List[Tuple[int, int, Any, Any]], int]:
+    """
+    读取 WAL 中的全部完整记录
+    
+    返回: ([(lsn, 操作, 键, 值), ...], 最后一条完整记录之后的文件偏移)
+    遇到截断或校验失败的记录（崩溃时写了一半）即停止，之后的内容视为无效。
+    """
+    records = []
+    if not os.path.exists(path):
+        return records, 0
+    
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        length, crc = _RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(pickle.loads(payload))
+        offset = start + length
+    return records, offset
+
+
+class WriteAheadLog:
+    """
+    追加写日志，后台线程负责组提交
+    
+    append() 只把记录放进内存缓冲区并返回 LSN；wait(lsn) 阻塞到该记录已 fsync。
+    写盘或 fsync 失败时后台线程记下异常并退出，之后的 append()/wait() 都抛出 OSError，
+    而不是让等待落盘的写入者永远阻塞。
+    """
+    
+    def __init__(self, path: str, next_lsn: int = 1, group_commit_ms: float = 2.0,
+                 max_batch: int = 4096):
+        """
+        Args:
+            path: 日志文件路径
+            next_lsn: 下一条记录的 LSN
+            group_commit_ms: 组提交的等待窗口（毫秒），0 表示有记录就立即落盘
+            max_batch: 缓冲区攒满这么多条记录时不再等待窗口结束
+        """
+        if group_commit_ms < 0:
+            raise ValueError("group_commit_ms must not be negative")
+        if max_batch < 1:
+            raise ValueError("max_batch must be positive")
+        
+        self.path = path
+        self.group_commit_window = group_commit_ms / 1000.0
+        self.max_batch = max_batch
+        self.file = open(path, 'ab')
+        
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._buffer: List[bytes] = []
+        self._next_lsn = next_lsn
+        self._durable_lsn = next_lsn - 1
+        self._force = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self.fsyncs = 0
+        self.records_written = 0
+        
+        self._flusher = threading.Thread(target=self._flush_loop, name='wal-flusher', daemon=True)
+        self._flusher.start()
+    
+    @property
+    def last_lsn(self) -> int:
+        """最后一条已追加记录的 LSN"""
+        return self._next_lsn - 1
+    
+    def append(self, op: int, key: Any, value: Any = None) -> int:
+        """追加一条记录，返回它的 LSN（此时尚未落盘）"""
+        with self._cond:
+            if self._closed:
+                raise ValueError("write-ahead log is closed")
+            self._check_error()
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            payload = pickle.dumps((lsn, op, key, value), protocol=pickle.HIGHEST_PROTOCOL)
+            self._buffer.append(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            if len(self._buffer) == 1 or len(self._buffer) >= self.max_batch:
+                self._cond.notify_all()
+            return lsn
+    
+    def wait(self, lsn: int) -> None:
+        """阻塞直到 lsn 及之前的记录都已 fsync"""
+        with self._cond:
+            while self._durable_lsn < lsn:
+                self._check_error()
+                if self._closed:
+                    raise ValueError("write-ahead log closed before the record was made durable")
+                self._cond.wait()
+    
+    def sync(self) -> None:
+        """立即落盘当前缓冲区中的全部记录，不等组提交窗口结束"""
+        with self._cond:
+            lsn = self._next_lsn - 1
+            if self._durable_lsn >= lsn:
+                return
+            self._force = True
+            self._cond.notify_all()
+        self.wait(lsn)
+    
+    def truncate(self) -> None:
+        """清空日志文件（检查点完成之后调用），调用方需保证此时没有并发 append"""
+        self.sync()
+        with self._io_lock:
+            self.file.truncate(0)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+    
+    def close(self) -> None:
+        """落盘剩余记录并停止后台线程"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self.file.close()
+    
+    def stats(self) -> Dict[str, int]:
+        """组提交统计：平均每次 fsync 覆盖 records_written / fsyncs 条记录"""
+        return {'records': self.records_written, 'fsyncs': self.fsyncs,
+                'last_lsn': self.last_lsn, 'durable_lsn': self._durable_lsn}
+    
+    def _check_error(self) -> None:
+        """后台写盘失败过时抛出（调用方持有 _cond）"""
+        if self._error is not None:
+            raise OSError(f"write-ahead log flush failed: {self._error!r}") from self._error
+    
+    def _flush_loop(self) -> None:
+        """后台组提交循环"""
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+                # 第一条记录到达后等待一个窗口，让并发写入者搭上同一次 fsync
+                deadline = time.monotonic() + self.group_commit_window
+                while len(self._buffer) < self.max_batch and not self._force and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._buffer = self._buffer, []
+                last_lsn = self._next_lsn - 1
+                self._force = False
+            
+            # 在锁外写盘，写入期间新的 append 不会被阻塞
+            try:
+                with self._io_lock:
+                    self.file.write(b''.join(batch))
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+            except Exception as e:
+                # 这一批是否已部分落盘无法确定，不再继续写；唤醒所有等待者让它们抛出异常
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            
+            with self._cond:
+                self.fsyncs += 1
+                self.records_written += len(batch)
+                self._durable_lsn = last_lsn
+                self._cond.notify_all()
+
+
+class DurableBPlusTree:
+    """
+    可恢复的B+树存储
+    
+    directory 下保存 checkpoint.dat 和 wal.log。写操作修改内存树后追加 WAL，
+    sync=True 时在组提交完成后才返回；每 checkpoint_every 条写操作自动做一次检查点，
+    所以崩溃恢复最多需要回放 checkpoint_every 条日志。
+    """
+    
+    CHECKPOINT_FILE = 'checkpoint.dat'
+    LOG_FILE = 'wal.log'
+    
+    def __init__(self, directory: str, order: int = 64, group_commit_ms: float = 2.0,
+                 checkpoint_every: int = 100000, sync: bool = True, max_batch: int = 4096):
+        """
+        打开或创建存储
+        
+        Args:
+            directory: 数据目录，不存在时创建
+            order: 内存B+树的阶数
+            group_commit_ms: 组提交等待窗口（毫秒）
+            checkpoint_every: 每多少条写操作做一次检查点，0 表示只在手动调用时做
+            sync: True 时写操作等待落盘后返回；False 时最多丢失最后一个窗口内的写入
+            max_batch: 单次组提交最多包含的记录数
+        """
+        if checkpoint_every < 0:
+            raise ValueError("checkpoint_every must not be negative")
+        
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.checkpoint_path = os.path.join(directory, self.CHECKPOINT_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+        self.checkpoint_every = checkpoint_every
+        self.sync_writes = sync
+        self._lock = threading.RLock()
+        self._writes_since_checkpoint = 0
+        
+        start = time.perf_counter()
+        self.tree, last_lsn, replayed = self._recover(order)
+        self.recovery_seconds = time.perf_counter() - start
+        self.replayed_records = replayed
+        self._wal = WriteAheadLog(self.log_path, last_lsn + 1, group_commit_ms, max_batch)
+    
+    def insert(self, key: Any, value: Any) -> bool:
+        """
+        插入键值对
+        
+        先修改内存树、成功后再追加日志：树拒绝的键（如无法与已有键比较的类型）
+        直接抛出，不会留下一条让重新打开时恢复失败的记录；追加日志失败时撤销内存修改。
+        """
+        with self._lock:
+            existed = self.tree.count_range(key, key) > 0
+            old_value = self.tree.search(key) if existed else None
+            self.tree.insert(key, value)
+            try:
+                lsn = self._wal.append(OP_INSERT, key, value)
+            except BaseException:
+                if existed:
+                    self.tree.insert(key, old_value)
+                else:
+                    self.tree.delete(key)
+                raise
+            self._after_write()
+        if self.sync_writes:
+            self._wal.wait(lsn)
+        return True
+    
+    def delete(self, key: Any) -> bool:
+        """删除键值对，键不存在时不写日志；与 insert 一样先改内存树再追加日志"""
+        with self._lock:
+            # 值可能就是 None，用键数判断是否存在
+            if not self.tree.count_range(key, key):
+                return False
+            old_value = self.tree.search(key)
+            self.tree.delete(key)
+            try:
+                lsn = self._wal.append(OP_DELETE, key)
+            except BaseException:
+                self.tree.insert(key, old_value)
+                raise
+            self._after_write()
+        if self.sync_writes:
+            self._wal.wait(lsn)
+        return True
+    
+    def search(self, key: Any) -> Optional[Any]:
+        """搜索键对应的值"""
+        with self._lock:
+            return self.tree.search(key)
+    
+    def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
+        """范围查询"""
+        with self._lock:
+            return self.tree.range_query(start_key, end_key)
+    
+    def sync(self) -> None:
+        """等待此前的全部写操作落盘"""
+        self._wal.sync()
+    
+    def checkpoint(self) -> None:
+        """
+        写检查点并清空 WAL
+        
+        检查点先写入临时文件、fsync 后原子替换；其中记录了对应的 LSN，
+        即使在替换之后、清空日志之前崩溃，恢复时也会跳过已包含在检查点里的日志。
+        """
+        with self._lock:
+            lsn = self._wal.last_lsn
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(_CHECKPOINT_HEADER.pack(_CHECKPOINT_MAGIC, _CHECKPOINT_VERSION, lsn, len(self.tree)))
+                pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+                for item in self.tree.items():
+                    pickler.dump(item)
+                    pickler.clear_memo()
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+            self._fsync_directory()
+            self._wal.truncate()
+            self._writes_since_checkpoint = 0
+    
+    def close(self) -> None:
+        """落盘剩余日志并关闭"""
+        self._wal.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """WAL 与恢复统计"""
+        stats: Dict[str, Any] = dict(self._wal.stats())
+        stats.update(size=len(self.tree), replayed_records=self.replayed_records,
+                     recovery_seconds=self.recovery_seconds,
+                     writes_since_checkpoint=self._writes_since_checkpoint)
+        return stats
+    
+    def __enter__(self) -> 'DurableBPlusTree':
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def __len__(self) -> int:
+        return len(self.tree)
+    
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            return self.tree.count_range(key, key) > 0
+    
+    def __repr__(self) -> str:
+        return f"DurableBPlusTree(directory={self.directory!r}, size={len(self.tree)})"
+    
+    # ---- 内部实现 ----
+    
+    def _after_write(self) -> None:
+        self._writes_since_checkpoint += 1
+        if self.checkpoint_every and self._writes_since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+    
+    def _recover(self, order: int) -> Tuple[BPlusTree, int, int]:
+        """
+        从检查点和日志尾部恢复
+        
+        日志尾部先折叠成每个键的最终操作，排序后与检查点的有序流归并，
+        再用 from_sorted 一次性构建，时间复杂度 O(n + t log t)，t 为日志条数。
+        """
+        checkpoint_lsn, checkpoint_items = self._read_checkpoint()
+        records, valid_length = read_log(self.log_path)
+        
+        # 截掉崩溃时写了一半的尾部，避免后续追加的记录被它挡住
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > valid_length:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(valid_length)
+        
+        latest: Dict[Any, Tuple[int, Any]] = {}
+        last_lsn = checkpoint_lsn
+        replayed = 0
+        for lsn, op, key, value in records:
+            if lsn <= checkpoint_lsn:
+                continue
+            latest[key] = (op, value)
+            last_lsn = lsn
+            replayed += 1
+        
+        try:
+            tail = sorted(latest.items(), key=lambda item: item[0])
+            tree = BPlusTree.from_sorted(_apply_tail(checkpoint_items, tail), order=order)
+        except TypeError:
+            # 日志里先后出现过无法互相比较的键（如字符串键删除后改用整数键），无法整体排序；
+            # 按 LSN 顺序逐条回放，与当初内存树接受这些写入的顺序一致
+            tree = BPlusTree.from_sorted(self._read_checkpoint()[1], order=order)
+            for lsn, op, key, value in records:
+                if lsn <= checkpoint_lsn:
+                    continue
+                if op == OP_INSERT:
+                    tree.insert(key, value)
+                else:
+                    tree.delete(key)
+        return tree, last_lsn, replayed
+    
+    def _read_checkpoint(self) -> Tuple[int, Iterator[Tuple[Any, Any]]]:
+        """读取检查点头，返回 (LSN, 有序键值对迭代器)"""
+        if not os.path.exists(self.checkpoint_path):
+            return 0, iter(())
+        
+        f = open(self.checkpoint_path, 'rb')
+        header = f.read(_CHECKPOINT_HEADER.size)
+        if len(header) < _CHECKPOINT_HEADER.size:
+            f.close()
+            raise ValueError(f"{self.checkpoint_path} is truncated")
+        magic, version, lsn, count = _CHECKPOINT_HEADER.unpack(header)
+        if magic != _CHECKPOINT_MAGIC or version != _CHECKPOINT_VERSION:
+            f.close()
+            raise ValueError(f"{self.checkpoint_path} is not a B+ tree checkpoint")
+        
+        def items() -> Iterator[Tuple[Any, Any]]:
+            with f:
+                unpickler = pickle.Unpickler(f)
+                for _ in range(count):
+                    yield unpickler.load()
+        
+        return lsn, items()
+    
+    def _fsync_directory(self) -> None:
+        """fsync 目录使 rename 持久化（不支持的平台上忽略）"""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _apply_tail(base: Iterable[Tuple[Any, Any]],
+                tail: List[Tuple[Any, Tuple[int, Any]]]) -> Iterator[Tuple[Any, Any]]:
+    """把有序的日志尾部（键 -> 最终操作）归并到有序的检查点流中，日志优先"""
+    tail_iter = iter(tail)
+    pending = next(tail_iter, None)
+    for key, value in base:
+        while pending is not None and pending[0] < key:
+            if pending[1][0] == OP_INSERT:
+                yield pending[0], pending[1][1]
+            pending = next(tail_iter, None)
+        if pending is not None and pending[0] == key:
+            if pending[1][0] == OP_INSERT:
+                yield key, pending[1][1]
+            pending = next(tail_iter, None)
+        else:
+            yield key, value
+    while pending is not None:
+        if pending[1][0] == OP_INSERT:
+            yield pending[0], pending[1][1]
+        pending = next(tail_iter, None)
+
+
+if __name__ == "__main__":
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        store = DurableBPlusTree(workdir, checkpoint_every=5000)
+        writers = [threading.Thread(target=lambda base=base: [store.insert(base + i, i) for i in range(2000)])
+                   for base in range(0, 16000, 2000)]
+        start = time.perf_counter()
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - start
+        print(f"8 个线程同步写入 16000 条: {16000 / elapsed:,.0f} 次/秒, {store.stats()}")
+        store.close()
+        
+        store = DurableBPlusTree(workdir, checkpoint_every=50000, sync=False)
+        start = time.perf_counter()
+        for i in range(16000, 66000):
+            store.insert(i, i)
+        store.sync()
+        elapsed = time.perf_counter() - start
+        print(f"单线程异步写入 50000 条: {50000 / elapsed:,.0f} 次/秒, {store.stats()}")
+        store.close()
+        
+        reopened = DurableBPlusTree(workdir)
+        print(f"恢复: {reopened}, 回放 {reopened.replayed_records} 条日志, 用时 {reopened.recovery_seconds:.3f} 秒")
+        reopened.close()
@@ -0,0 +1,299 @@
+"""
+只读的冻结B+树
+构建完成后不再修改的索引用不着节点对象、父指针、子树计数和叶子链表。
+BPlusTree.freeze() 把全部键值按序平铺成两个连续数组：
+1. 键：普通键是一个 list，类型化键是一个 array（每个键只占 8 字节，不再是 Python 对象）
+2. 值：与键下标对齐的 list
+
+叶子本来就按键序排列，平铺后的键数组就是"所有叶子首尾相接"，隐式的静态索引
+就是二分本身：查找只做一次 C 层的 bisect，不再逐层下降、逐层调用。
+
+冻结树可以放进共享内存供多个进程使用：类型化键直接以原始字节存放，各进程通过
+memoryview 零拷贝访问；值每 VALUE_BLOCK 个 pickle 成一块，配一个块偏移数组，
+读到某块时才反序列化：点查只解码一小块，顺序扫描每块只解码一次。
+"""
+
+import pickle
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from multiprocessing import shared_memory
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from b_plus_tree import KEY_TYPES, _iter_leaves
+
+
+# 共享内存头：魔数, 版本, 键类型名（空表示普通键）, 阶数, 键数量, 键字节数, 值字节数, 每块值个数
+_SHM_HEADER = struct.Struct('<8sI8sIqqqI')
+_SHM_MAGIC = b'BPTFROZ1'
+_SHM_VERSION = 2
+
+# 共享内存中每个值块包含的值个数
+VALUE_BLOCK = 64
+
+# 范围迭代每次切出的条数：整段切片比逐个下标快，分段避免一次复制整个大区间
+_CHUNK = 1024
+
+
+class _PickledValues:
+    """
+    共享内存中分块 pickle 的值：offsets[b]:offsets[b+1] 是第 b 块（下标 b*block 起的 block 个值）
+    
+    最近解码的一块缓存为一个 (块号, 值列表) 元组，整体替换，多线程读取也不会读到不一致的缓存。
+    """
+    
+    __slots__ = ('_offsets', '_data', '_size', '_block', '_cached')
+    
+    def __init__(self, offsets: memoryview, data: memoryview, size: int, block: int):
+        self._offsets = offsets
+        self._data = data
+        self._size = size
+        self._block = block
+        self._cached: Tuple[int, List[Any]] = (-1, [])
+    
+    def _load(self, b: int) -> List[Any]:
+        cached = self._cached
+        if cached[0] == b:
+            return cached[1]
+        values = pickle.loads(self._data[self._offsets[b]:self._offsets[b + 1]])
+        self._cached = (b, values)
+        return values
+    
+    def __getitem__(self, idx: Any) -> Any:
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._size)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            result: List[Any] = []
+            block = self._block
+            while start < stop:
+                b, offset = divmod(start, block)
+                chunk = self._load(b)[offset:offset + stop - start]
+                result.extend(chunk)
+                start += len(chunk)
+            return result
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError("value index out of range")
+        b, offset = divmod(idx, self._block)
+        return self._load(b)[offset]
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def release(self) -> None:
+        self._cached = (-1, [])
+        self._offsets.release()
+        self._data.release()
+
+
+class FrozenBPlusTree:
+    """
+    不可修改的B+树，由 BPlusTree.freeze() 或 FrozenBPlusTree.attach() 创建
+    
+    search / range_query / iter_range / 迭代接口与 BPlusTree 相同；
+    rank、select 和 count_range 直接是数组下标运算，O(log n)。
+    """
+    
+    __slots__ = ('order', 'key_type', '_keys', '_values', '_shm')
+    
+    def __init__(self, keys: Sequence[Any], values: Sequence[Any], order: int = 4,
+                 key_type: Optional[str] = None):
+        """
+        Args:
+            keys: 严格递增的键序列
+            values: 与 keys 对齐的值序列
+            order: 来源树的阶数，只作记录
+            key_type: 键类型（见 KEY_TYPES），None 表示普通键
+        """
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        self.order = order
+        self.key_type = key_type
+        self._keys = keys
+        self._values = values
+        self._shm: Optional[shared_memory.SharedMemory] = None
+    
+    @classmethod
+    def from_tree(cls, tree: Any) -> 'FrozenBPlusTree':
+        """按叶子顺序把树（或快照）的键值整段复制到连续数组，O(n)"""
+        key_type = getattr(tree, 'key_type', None)
+        keys = array(KEY_TYPES[key_type]) if key_type else []
+        values: List[Any] = []
+        for leaf in _iter_leaves(tree.root):
+            keys.extend(leaf.keys)
+            values.extend(leaf.values)
+        return cls(keys, values, tree.order, key_type)
+    
+    def search(self, key: Any) -> Optional[Any]:
+        """搜索键对应的值"""
+        keys = self._keys
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            return self._values[idx]
+        return None
+    
+    def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
+        """范围查询，返回 [start_key, end_key] 内的全部键值对"""
+        return list(self.iter_range(start_key, end_key))
+    
+    def iter_range(self, start_key: Any = None, end_key: Any = None,
+                   inclusive: Tuple[bool, bool] = (True, True), limit: Optional[int] = None,
+                   reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """惰性范围迭代，参数含义与 BPlusTree.iter_range 相同；两次二分定位区间后按段切片输出"""
+        if limit is not None and limit <= 0:
+            return
+        low_inclusive, high_inclusive = inclusive
+        keys, values = self._keys, self._values
+        lo = 0 if start_key is None else (bisect_left if low_inclusive else bisect_right)(keys, start_key)
+        hi = len(keys) if end_key is None else (bisect_right if high_inclusive else bisect_left)(keys, end_key)
+        if hi <= lo:
+            return
+        if limit is not None:
+            if reverse:
+                lo = max(lo, hi - limit)
+            else:
+                hi = min(hi, lo + limit)
+        
+        if not reverse:
+            for start in range(lo, hi, _CHUNK):
+                stop = min(start + _CHUNK, hi)
+                yield from zip(keys[start:stop], values[start:stop])
+        else:
+            for stop in range(hi, lo, -_CHUNK):
+                start = max(stop - _CHUNK, lo)
+                yield from zip(reversed(keys[start:stop]), reversed(values[start:stop]))
+    
+    def items(self, reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """按键序惰性产出全部 (键, 值)"""
+        return self.iter_range(reverse=reverse)
+    
+    def keys(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部键"""
+        return reversed(self._keys) if reverse else iter(self._keys)
+    
+    def values(self, reverse: bool = False) -> Iterator[Any]:
+        """按键序惰性产出全部值"""
+        return (value for _, value in self.iter_range(reverse=reverse))
+    
+    def traverse(self) -> List[Any]:
+        """遍历所有键（有序）"""
+        return list(self._keys)
+    
+    def rank(self, key: Any, inclusive: bool = False) -> int:
+        """统计小于 key（inclusive=True 时为小于等于）的键的数量"""
+        return (bisect_right if inclusive else bisect_left)(self._keys, key)
+    
+    def select(self, index: int) -> Tuple[Any, Any]:
+        """返回第 index 小（从 0 开始，支持负数下标）的 (键, 值)"""
+        if not -len(self) <= index < len(self):
+            raise IndexError("FrozenBPlusTree index out of range")
+        return self._keys[index], self._values[index]
+    
+    def count_range(self, start_key: Any, end_key: Any) -> int:
+        """统计 [start_key, end_key] 内的键数量"""
+        if end_key < start_key:
+            return 0
+        return self.rank(end_key, inclusive=True) - self.rank(start_key)
+    
+    def to_shared_memory(self, name: Optional[str] = None) -> shared_memory.SharedMemory:
+        """
+        把冻结树写入一块新的共享内存，返回 SharedMemory 对象
+        
+        其他进程用 FrozenBPlusTree.attach(shm.name) 打开；创建者负责在所有进程用完后
+        close() 并 unlink()。普通键整体 pickle，attach 时每个进程各反序列化一份；
+        类型化键以原始字节存放，attach 后零拷贝访问。
+        """
+        if self.key_type:
+            key_bytes = array(KEY_TYPES[self.key_type], self._keys).tobytes()
+        else:
+            key_bytes = pickle.dumps(list(self._keys), protocol=pickle.HIGHEST_PROTOCOL)
+        values = self._values
+        blobs = [pickle.dumps(list(values[i:i + VALUE_BLOCK]), protocol=pickle.HIGHEST_PROTOCOL)
+                 for i in range(0, len(values), VALUE_BLOCK)]
+        offsets = array('Q', [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        value_size = offsets.itemsize * len(offsets) + offsets[-1]
+        
+        header = _SHM_HEADER.pack(_SHM_MAGIC, _SHM_VERSION, (self.key_type or '').encode(),
+                                  self.order, len(self), len(key_bytes), value_size, VALUE_BLOCK)
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=len(header) + len(key_bytes) + value_size)
+        buf = shm.buf
+        pos = len(header)
+        buf[:pos] = header
+        buf[pos:pos + len(key_bytes)] = key_bytes
+        pos += len(key_bytes)
+        offset_bytes = offsets.tobytes()
+        buf[pos:pos + len(offset_bytes)] = offset_bytes
+        pos += len(offset_bytes)
+        buf[pos:pos + offsets[-1]] = b''.join(blobs)
+        return shm
+    
+    @classmethod
+    def attach(cls, name: str) -> 'FrozenBPlusTree':
+        """
+        打开 to_shared_memory() 创建的共享内存，不再使用时调用 close()
+        
+        Python 3.13 起不把附加方登记到 resource_tracker，避免附加进程退出时误删共享内存；
+        更早的版本只应在创建者派生的子进程中附加（它们共用同一个 resource_tracker）。
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+        buf = shm.buf
+        magic, version, key_type, order, size, key_len, value_size, block = _SHM_HEADER.unpack_from(buf, 0)
+        if magic != _SHM_MAGIC or version != _SHM_VERSION:
+            shm.close()
+            raise ValueError(f"shared memory {name!r} does not hold a frozen B+ tree")
+        key_type = key_type.rstrip(b'\0').decode() or None
+        
+        pos = _SHM_HEADER.size
+        if key_type:
+            keys = buf[pos:pos + key_len].cast(KEY_TYPES[key_type])
+        else:
+            keys = pickle.loads(buf[pos:pos + key_len])
+        pos += key_len
+        offset_len = 8 * (-(-size // block) + 1)
+        offsets = buf[pos:pos + offset_len].cast('Q')
+        pos += offset_len
+        values = _PickledValues(offsets, buf[pos:pos + value_size - offset_len], size, block)
+        
+        tree = cls(keys, values, order, key_type)
+        tree._shm = shm
+        return tree
+    
+    def close(self) -> None:
+        """释放对共享内存的引用（非共享内存的冻结树无需调用）"""
+        if self._shm is None:
+            return
+        if isinstance(self._keys, memoryview):
+            self._keys.release()
+        self._values.release()
+        self._keys, self._values = [], []
+        self._shm.close()
+        self._shm = None
+    
+    def __enter__(self) -> 'FrozenBPlusTree':
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def __iter__(self) -> Iterator[Any]:
+        return self.keys()
+    
+    def __contains__(self, key: Any) -> bool:
+        keys = self._keys
+        idx = bisect_left(keys, key)
+        return idx < len(keys) and keys[idx] == key
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def __repr__(self) -> str:
+        shared = ", shared" if self._shm is not None else ""
+        return f"FrozenBPlusTree(order={self.order}, size={len(self)}{shared})"
@@ -9,6 +9,14 @@
 空间复杂度：O(n * capacity) 或 O(capacity)（优化后）
 """
 
+import numbers
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时空间优化版退回纯 Python 循环
+    np = None
+
+
 def knapsack_01_dp(weights, values, capacity):
     """
     0-1背包问题的动态规划解法（二维数组）
@@ -67,8 +75,15 @@ def knapsack_01_dp_optimized(weights, values, capacity):
     """
     0-1背包问题的动态规划解法（空间优化版）
     
-    使用一维数组优化空间复杂度：O(capacity)
-    注意：内层循环需要逆序遍历，确保每个物品只被考虑一次
+    使用一维数组优化空间复杂度：dp[w] 只保留容量 w 下的最大价值，
+    另用一个 n×(capacity+1) 的位矩阵记录"第 i 个物品在容量 w 处是否被放入"，
+    回溯时从 (n-1, capacity) 逐行查位即可还原选择，每个状态只占 1 位。
+    
+    有 NumPy 时每个物品只需一次向量运算：
+        dp[w:] = np.maximum(dp[w:], dp[:-w] + v)
+    并用 np.packbits 把这一行的选择压成位存储，n=2000、capacity=10^6 时
+    位矩阵约 250 MB，耗时为秒级。没有 NumPy、或价值不全是整数（如浮点数）时，
+    退回逆序遍历的纯 Python 循环。
     """
     n = len(weights)
     if n == 0 or capacity == 0:
@@ -77,26 +92,74 @@ def knapsack_01_dp_optimized(weights, values, capacity):
     # 检查输入有效性
     if len(values) != n:
         raise ValueError("weights和values长度必须相同")
+    if any(w <= 0 for w in weights):
+        raise ValueError("物品重量必须为正数")
+    if any(v < 0 for v in values):
+        raise ValueError("物品价值不能为负数")
     
+    # 价值不全是整数（例如浮点数）或总价值超出 int64 时无法用 int64 向量化，走纯 Python 循环
+    if np is not None and all(isinstance(v, numbers.Integral) for v in values) and sum(values) < 2 ** 63:
+        return _knapsack_01_numpy(weights, values, capacity)
+    return _knapsack_01_python(weights, values, capacity)
+
+
+def _knapsack_01_python(weights, values, capacity):
+    """knapsack_01_dp_optimized 的纯 Python 实现，输入已检查"""
+    n = len(weights)
     # 创建一维DP数组：dp[w]表示容量w下的最大价值
     dp = [0] * (capacity + 1)
-    # 用于记录选择的物品（可选，会稍微增加复杂度）
-    item_selection = [[] for _ in range(capacity + 1)]
+    # taken[i][w] 为 1 表示处理第 i 个物品时放入它使 dp[w] 变大
+    taken = [bytearray(capacity + 1) for _ in range(n)]
     
     for i in range(n):
         weight = weights[i]
         value = values[i]
+        row = taken[i]
         # 逆序遍历，确保每个物品只使用一次
         for w in range(capacity, weight - 1, -1):
             if dp[w - weight] + value > dp[w]:
                 dp[w] = dp[w - weight] + value
-                # 记录选择的物品（需要复制列表）
-                item_selection[w] = item_selection[w - weight] + [i]
+                row[w] = 1
+    
+    selected_items = []
+    w = capacity
+    for i in range(n - 1, -1, -1):
+        if taken[i][w]:
+            selected_items.append(i)
+            w -= weights[i]
+    selected_items.reverse()
     
-    max_value = dp[capacity]
-    selected_items = item_selection[capacity]
+    return dp[capacity], selected_items
+
+
+def _knapsack_01_numpy(weights, values, capacity):
+    """knapsack_01_dp_optimized 的 NumPy 实现，输入已检查"""
+    n = len(weights)
+    dp = np.zeros(capacity + 1, dtype=np.int64)
+    # 每行 capacity+1 位，packbits 按大端位序打包：第 w 位在 w >> 3 字节的 7 - (w & 7) 位
+    taken = np.zeros((n, (capacity + 8) // 8), dtype=np.uint8)
+    row = np.zeros(capacity + 1, dtype=bool)
     
-    return max_value, selected_items
+    for i in range(n):
+        weight = weights[i]
+        if weight > capacity:
+            continue
+        # 右侧先整体算出新数组，再写回 dp[weight:]，相当于逆序遍历：每个物品只使用一次
+        candidate = dp[:capacity + 1 - weight] + values[i]
+        row[:weight] = False
+        np.greater(candidate, dp[weight:], out=row[weight:])
+        np.maximum(dp[weight:], candidate, out=dp[weight:])
+        taken[i] = np.packbits(row)
+    
+    selected_items = []
+    w = capacity
+    for i in range(n - 1, -1, -1):
+        if (taken[i, w >> 3] >> (7 - (w & 7))) & 1:
+            selected_items.append(i)
+            w -= weights[i]
+    selected_items.reverse()
+    
+    return int(dp[capacity]), selected_items
 
 
 def knapsack_01_bruteforce(weights, values, capacity):
@@ -306,6 +369,40 @@ def test_knapsack():
         max_value, selected = func(weights4, values4, capacity4)
         elapsed = time.time() - start
         print(f"{name}: 最大价值={max_value}, 时间={elapsed:.4f}秒")
+    
+    # 测试用例5：随机实例与二维DP对照，NumPy 与纯 Python 两条路径都检查选择的物品
+    print("\n\n测试用例5: 随机实例对照")
+    engines = [_knapsack_01_python] + ([_knapsack_01_numpy] if np is not None else [])
+    mismatches = 0
+    for _ in range(200):
+        n = random.randint(1, 12)
+        weights5 = [random.randint(1, 15) for _ in range(n)]
+        values5 = [random.randint(0, 40) for _ in range(n)]
+        capacity5 = random.randint(1, 60)
+        expected, _ = knapsack_01_dp(weights5, values5, capacity5)
+        for engine in engines:
+            max_value, selected = engine(weights5, values5, capacity5)
+            if (max_value != expected or sum(values5[i] for i in selected) != expected
+                    or sum(weights5[i] for i in selected) > capacity5):
+                mismatches += 1
+    print(f"{'✓' if mismatches == 0 else '✗'} 200 个随机实例 × {len(engines)} 种实现, 不一致 {mismatches} 次")
+    
+    # 浮点数价值不能用 int64 向量化，应走纯 Python 循环且结果与二维DP一致
+    float_result = knapsack_01_dp_optimized([1, 2, 3], [1.5, 2.5, 3.5], 4)
+    expected = knapsack_01_dp([1, 2, 3], [1.5, 2.5, 3.5], 4)
+    print(f"{'✓' if float_result == expected == (5.0, [0, 2]) else '✗'} 浮点数价值: {float_result}")
+    
+    # 测试用例6：较大实例，只测试空间优化版
+    print("\n\n测试用例6: 较大实例（500个物品, 容量10^5）")
+    weights6 = [random.randint(1, 1000) for _ in range(500)]
+    values6 = [random.randint(1, 1000) for _ in range(500)]
+    capacity6 = 100000
+    start = time.time()
+    max_value, selected = knapsack_01_dp_optimized(weights6, values6, capacity6)
+    elapsed = time.time() - start
+    valid = sum(values6[i] for i in selected) == max_value and sum(weights6[i] for i in selected) <= capacity6
+    print(f"{'✓' if valid else '✗'} 最大价值={max_value}, 选择{len(selected)}个物品, "
+          f"{'NumPy' if np is not None else '纯 Python'} 时间={elapsed:.4f}秒")
 
 
 def main():
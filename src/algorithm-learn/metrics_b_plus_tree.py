@@ -0,0 +1,191 @@
+"""
+B+树的操作统计
+BPlusTree.enable_metrics() 开启，关闭时树上不留任何包装，热路径没有额外开销。
+开启后：
+1. 公开操作（search/insert/delete/批量操作/范围查询等）记录调用次数和延迟直方图，
+   直方图以 2 的幂纳秒为桶边界，记录一次只是一次 bit_length 和一次自增
+2. 每次从根下降记一次 descent，经过的节点数为当时的树高
+3. 叶子分裂、内部节点分裂、借键、合并各自计数
+4. 范围扫描（iter_range）的次数，以及扫描经过的叶子数（由 iter_range 逐叶子累加）
+5. 钩子：hook(名称, 数值) 在每次操作后以延迟秒数、每次结构事件后以 1 调用，
+   用于推送到外部的监控系统；只需定期拉取时用 TreeMetrics.snapshot()
+
+包装通过在树实例上设置同名属性完成，实例属性优先于类方法，树内部经 self 调用的
+方法（例如 range_query 内部的 iter_range、put_many 内部的分裂）同样会被统计。
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+
+# 记录次数与延迟的公开操作
+TIMED_OPERATIONS = (
+    'search', 'insert', 'delete', 'get_many', 'put_many', 'delete_many', 'delete_range',
+    'range_query', 'range_keys', 'rank', 'select', 'count_range', 'aggregate', 'split_at', 'concat',
+)
+
+# 从根下降的内部方法
+_DESCENTS = ('_find_leaf', '_find_path', '_find_bounded_path')
+
+# 结构事件：方法名 -> 事件名（_handle_split 按被分裂的节点类型区分）
+_EVENTS = {'_merge': 'merge', '_borrow_from_left': 'borrow', '_borrow_from_right': 'borrow'}
+
+Hook = Callable[[str, float], None]
+
+
+class LatencyHistogram:
+    """延迟直方图：第 b 个桶记录 [2^(b-1), 2^b) 纳秒内的样本"""
+    
+    __slots__ = ('buckets', 'count', 'total_ns', 'max_ns')
+    
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+    
+    def record(self, ns: int) -> None:
+        """记录一个样本，O(1)"""
+        self.buckets[min(ns.bit_length(), 63)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+    
+    def percentile(self, p: float) -> int:
+        """第 p 百分位的上界（纳秒），精度为所在桶的宽度；没有样本时为 0"""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * p // 100))
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(1 << b, self.max_ns)
+        return self.max_ns
+    
+    def reset(self) -> None:
+        self.buckets = [0] * 64
+        self.count = self.total_ns = self.max_ns = 0
+    
+    def summary(self) -> Dict[str, float]:
+        """次数与以微秒为单位的均值、p50、p99、最大值"""
+        return {
+            'count': self.count,
+            'mean_us': self.total_ns / self.count / 1000 if self.count else 0.0,
+            'p50_us': self.percentile(50) / 1000,
+            'p99_us': self.percentile(99) / 1000,
+            'max_us': self.max_ns / 1000,
+        }
+
+
+class TreeMetrics:
+    """一棵树的运行时统计，由 BPlusTree.enable_metrics() 创建"""
+    
+    def __init__(self, hooks: Iterable[Hook] = ()):
+        self.latency: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in TIMED_OPERATIONS}
+        self.events: Dict[str, int] = {'leaf_split': 0, 'internal_split': 0, 'borrow': 0, 'merge': 0}
+        self.descents = 0
+        self.nodes_visited = 0
+        self.range_scans = 0
+        self.leaves_scanned = 0
+        self.hooks: List[Hook] = list(hooks)
+    
+    def add_hook(self, hook: Hook) -> None:
+        """注册钩子：hook(操作名, 延迟秒数) 或 hook(事件名, 1)"""
+        self.hooks.append(hook)
+    
+    def event(self, name: str) -> None:
+        """记录一次结构事件"""
+        self.events[name] += 1
+        for hook in self.hooks:
+            hook(name, 1)
+    
+    def reset(self) -> None:
+        """清零全部计数（保留钩子）"""
+        for histogram in self.latency.values():
+            histogram.reset()
+        for name in self.events:
+            self.events[name] = 0
+        self.descents = self.nodes_visited = self.range_scans = self.leaves_scanned = 0
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前统计的字典副本，只包含调用过的操作"""
+        return {
+            'operations': {name: histogram.summary() for name, histogram in self.latency.items() if histogram.count},
+            **self.events,
+            'descents': self.descents,
+            'nodes_visited': self.nodes_visited,
+            'range_scans': self.range_scans,
+            'leaves_scanned': self.leaves_scanned,
+            'leaves_per_scan': self.leaves_scanned / self.range_scans if self.range_scans else 0.0,
+        }
+    
+    def __repr__(self) -> str:
+        calls = sum(histogram.count for histogram in self.latency.values())
+        return f"TreeMetrics(calls={calls}, descents={self.descents}, events={self.events})"
+
+
+def _timed(metrics: TreeMetrics, name: str, method: Callable) -> Callable:
+    histogram = metrics.latency[name]
+    hooks = metrics.hooks
+    clock = time.perf_counter_ns
+    
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = clock() - start
+            histogram.record(elapsed)
+            for hook in hooks:
+                hook(name, elapsed / 1e9)
+    return timed
+
+
+def _descent(metrics: TreeMetrics, tree: Any, method: Callable) -> Callable:
+    def descent(*args: Any, **kwargs: Any) -> Any:
+        metrics.descents += 1
+        metrics.nodes_visited += tree.height
+        return method(*args, **kwargs)
+    return descent
+
+
+def _split_event(metrics: TreeMetrics, method: Callable) -> Callable:
+    def handle_split(old_node: Any, new_node: Any, split_key: Any) -> None:
+        metrics.event('leaf_split' if old_node.is_leaf else 'internal_split')
+        method(old_node, new_node, split_key)
+    return handle_split
+
+
+def _structural_event(metrics: TreeMetrics, name: str, method: Callable) -> Callable:
+    def structural(*args: Any, **kwargs: Any) -> Any:
+        metrics.event(name)
+        return method(*args, **kwargs)
+    return structural
+
+
+def _range_scan(metrics: TreeMetrics, method: Callable) -> Callable:
+    def iter_range(*args: Any, **kwargs: Any) -> Any:
+        metrics.range_scans += 1
+        return method(*args, **kwargs)
+    return iter_range
+
+
+def instrument(tree: Any, metrics: TreeMetrics) -> TreeMetrics:
+    """在树实例上安装统计包装"""
+    for name in TIMED_OPERATIONS:
+        setattr(tree, name, _timed(metrics, name, getattr(tree, name)))
+    for name in _DESCENTS:
+        setattr(tree, name, _descent(metrics, tree, getattr(tree, name)))
+    for name, event in _EVENTS.items():
+        setattr(tree, name, _structural_event(metrics, event, getattr(tree, name)))
+    tree._handle_split = _split_event(metrics, tree._handle_split)
+    tree.iter_range = _range_scan(metrics, tree.iter_range)
+    return metrics
+
+
+def uninstrument(tree: Any) -> None:
+    """移除 instrument 安装的包装，恢复为类上的方法"""
+    for name in TIMED_OPERATIONS + _DESCENTS + tuple(_EVENTS) + ('_handle_split', 'iter_range'):
+        tree.__dict__.pop(name, None)
@@ -0,0 +1,321 @@
+"""
+二级索引用的多值B+树
+BPlusTree 的键是唯一的，重复插入会覆盖旧值；建非唯一列的二级索引时，
+每个键需要对应一组行号（posting list）。这里把行号组存成紧凑的 PostingList：
+1. 行号升序去重后按 BLOCK_SIZE 个一块切分，块内只存相邻行号的差值，
+   差值用变长整数（LEB128，每字节 7 位）编码，密集的行号每个只占 1 字节
+2. 每块单独记录首、尾行号，增删和成员判断先在块首上二分，只解码一块
+3. 行号递增追加（最常见的建索引顺序）直接在最后一块末尾追加编码，不解码
+
+多条件查询时对多个键的 posting list 求交集：从最短的列表出发，
+依次用其余列表过滤候选行号，过滤时按块首二分跳过不可能命中的块。
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, groupby
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from b_plus_tree import BPlusTree
+
+
+def _encode_deltas(values: List[int]) -> bytes:
+    """把升序行号（从第二个开始）编码为变长差值序列"""
+    out = bytearray()
+    prev = values[0]
+    for value in values[1:]:
+        delta = value - prev
+        prev = value
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def _decode_deltas(first: int, data: bytes) -> List[int]:
+    """_encode_deltas 的逆过程，返回包含 first 在内的完整行号列表"""
+    if data.isascii():
+        # 所有差值都小于 128（密集行号的常见情况）：每字节就是一个差值，交给 C 层累加
+        return list(accumulate(data, initial=first))
+    values = [first]
+    current = first
+    delta = shift = 0
+    for byte in data:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            current += delta
+            values.append(current)
+            delta = shift = 0
+    return values
+
+
+class PostingList:
+    """
+    分块差值编码的有序行号集合
+    
+    块内容是不可变的 bytes，修改时整块替换，因此 copy() 只需浅拷贝块列表，
+    快照和写时复制的代价与块数而不是行号数成正比。
+    """
+    
+    __slots__ = ('_firsts', '_lasts', '_counts', '_blocks', '_size')
+    
+    BLOCK_SIZE = 128
+    
+    def __init__(self, rowids: Iterable[int] = ()):
+        self._firsts = array('q')
+        self._lasts = array('q')
+        self._counts: List[int] = []
+        self._blocks: List[bytes] = []
+        self._size = 0
+        self._extend_sorted(sorted(set(rowids)))
+    
+    @classmethod
+    def from_sorted(cls, rowids: Iterable[int]) -> 'PostingList':
+        """从已升序去重的行号构建，跳过排序"""
+        postings = cls()
+        postings._extend_sorted(list(rowids))
+        return postings
+    
+    def _extend_sorted(self, rowids: List[int]) -> None:
+        """把升序去重、且都大于现有行号的 rowids 按整块追加到末尾"""
+        for start in range(0, len(rowids), self.BLOCK_SIZE):
+            self._insert_block(len(self._blocks), rowids[start:start + self.BLOCK_SIZE])
+    
+    def _insert_block(self, idx: int, values: List[int]) -> None:
+        self._firsts.insert(idx, values[0])
+        self._lasts.insert(idx, values[-1])
+        self._counts.insert(idx, len(values))
+        self._blocks.insert(idx, _encode_deltas(values))
+        self._size += len(values)
+    
+    def _store_block(self, idx: int, values: List[int]) -> None:
+        """用 values 整体替换第 idx 块"""
+        self._size += len(values) - self._counts[idx]
+        self._firsts[idx] = values[0]
+        self._lasts[idx] = values[-1]
+        self._counts[idx] = len(values)
+        self._blocks[idx] = _encode_deltas(values)
+    
+    def _drop_block(self, idx: int) -> None:
+        self._size -= self._counts[idx]
+        del self._firsts[idx], self._lasts[idx], self._counts[idx], self._blocks[idx]
+    
+    def _decode_block(self, idx: int) -> List[int]:
+        return _decode_deltas(self._firsts[idx], self._blocks[idx])
+    
+    def _block_of(self, rowid: int) -> int:
+        """可能包含 rowid 的块下标（首行号 <= rowid 的最后一块），没有时为 -1"""
+        return bisect_right(self._firsts, rowid) - 1
+    
+    def add(self, rowid: int) -> bool:
+        """加入行号，返回是否新增（已存在返回 False）"""
+        if not self._blocks:
+            self._insert_block(0, [rowid])
+            return True
+        
+        idx = max(self._block_of(rowid), 0)
+        last = self._lasts[idx]
+        if rowid > last:
+            # 快速路径：落在本块末尾与下一块开头之间，直接追加一个差值
+            if self._counts[idx] < self.BLOCK_SIZE:
+                self._blocks[idx] += _encode_deltas([last, rowid])
+                self._lasts[idx] = rowid
+                self._counts[idx] += 1
+                self._size += 1
+                return True
+            if idx == len(self._blocks) - 1:
+                self._insert_block(idx + 1, [rowid])
+                return True
+        
+        values = self._decode_block(idx)
+        pos = bisect_left(values, rowid)
+        if pos < len(values) and values[pos] == rowid:
+            return False
+        values.insert(pos, rowid)
+        if len(values) > self.BLOCK_SIZE:
+            half = len(values) // 2
+            self._store_block(idx, values[:half])
+            self._insert_block(idx + 1, values[half:])
+        else:
+            self._store_block(idx, values)
+        return True
+    
+    def remove(self, rowid: int) -> bool:
+        """删除行号，返回是否删除成功"""
+        idx = self._block_of(rowid)
+        if idx < 0 or rowid > self._lasts[idx]:
+            return False
+        values = self._decode_block(idx)
+        pos = bisect_left(values, rowid)
+        if pos == len(values) or values[pos] != rowid:
+            return False
+        del values[pos]
+        
+        if not values:
+            self._drop_block(idx)
+        elif (len(values) < self.BLOCK_SIZE // 4 and idx + 1 < len(self._blocks)
+              and len(values) + self._counts[idx + 1] <= self.BLOCK_SIZE):
+            # 块太稀疏时并入右邻块，避免反复删除后留下大量碎块
+            values.extend(self._decode_block(idx + 1))
+            self._drop_block(idx + 1)
+            self._store_block(idx, values)
+        else:
+            self._store_block(idx, values)
+        return True
+    
+    def filter(self, candidates: Iterable[int]) -> List[int]:
+        """
+        返回升序 candidates 中属于本集合的行号
+        
+        候选行号只会向右移动，块下标和块内位置都从上一次的位置继续二分；
+        每块最多解码一次，没有候选落入的块不解码。
+        """
+        result = []
+        firsts, lasts = self._firsts, self._lasts
+        current, values, pos = -1, [], 0
+        for rowid in candidates:
+            idx = bisect_right(firsts, rowid, max(current, 0)) - 1
+            if idx < 0 or rowid > lasts[idx]:
+                continue
+            if idx != current:
+                current, values, pos = idx, self._decode_block(idx), 0
+            pos = bisect_left(values, rowid, pos)
+            if pos < len(values) and values[pos] == rowid:
+                result.append(rowid)
+        return result
+    
+    def copy(self) -> 'PostingList':
+        """浅拷贝：块内容不可变，可以直接共享"""
+        clone = PostingList()
+        clone._firsts = array('q', self._firsts)
+        clone._lasts = array('q', self._lasts)
+        clone._counts = self._counts[:]
+        clone._blocks = self._blocks[:]
+        clone._size = self._size
+        return clone
+    
+    @property
+    def nbytes(self) -> int:
+        """编码后数据加块索引占用的字节数（不含 Python 对象头）"""
+        return sum(map(len, self._blocks)) + len(self._blocks) * 24
+    
+    def __contains__(self, rowid: int) -> bool:
+        idx = self._block_of(rowid)
+        if idx < 0 or rowid > self._lasts[idx]:
+            return False
+        values = self._decode_block(idx)
+        pos = bisect_left(values, rowid)
+        return pos < len(values) and values[pos] == rowid
+    
+    def __iter__(self) -> Iterator[int]:
+        for idx in range(len(self._blocks)):
+            yield from self._decode_block(idx)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, PostingList):
+            return NotImplemented
+        return self._size == other._size and list(self) == list(other)
+    
+    def __repr__(self) -> str:
+        return f"PostingList(rowids={self._size}, blocks={len(self._blocks)}, nbytes={self.nbytes})"
+
+
+def intersect_postings(lists: Iterable[PostingList]) -> List[int]:
+    """多个 posting list 的交集（升序），从最短的列表出发逐个过滤"""
+    lists = sorted(lists, key=len)
+    if not lists:
+        return []
+    result = list(lists[0])
+    for postings in lists[1:]:
+        if not result:
+            break
+        result = postings.filter(result)
+    return result
+
+
+class BPlusMultimap(BPlusTree):
+    """
+    一个键对应一组行号的B+树，用作非唯一列的二级索引
+    
+    值是 PostingList；没有活跃快照时增删行号直接原地修改，只需一次下降。
+    有快照时先复制 posting list（只复制块索引）再写回，快照看到的仍是旧集合。
+    """
+    
+    def __init__(self, order: int = 4, key_type: Optional[str] = None, aggregates: Any = None):
+        """
+        Args:
+            order: B+树的阶数
+            key_type: 数值键类型，同 BPlusTree
+            aggregates: 原地修改 posting list 不会刷新子树摘要，因此只接受 None；
+                保留这个参数是因为 from_sorted/load 以 cls(..., aggregates=...) 构造实例
+        """
+        if aggregates:
+            raise ValueError("BPlusMultimap does not support aggregates")
+        super().__init__(order, key_type)
+    
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[Any, int]], order: int = 64,
+                  key_type: Optional[str] = None, fill_factor: float = 1.0) -> 'BPlusMultimap':
+        """
+        从 (键, 行号) 对批量建索引：整体排序后按键分组，每组直接编码成 PostingList，
+        再用 from_sorted 自底向上建树，不经过逐条 add
+        """
+        rows = sorted(set(rows))
+        items = ((key, PostingList.from_sorted(rowid for _, rowid in group))
+                 for key, group in groupby(rows, key=lambda row: row[0]))
+        return cls.from_sorted(items, order=order, fill_factor=fill_factor, key_type=key_type)
+    
+    def add(self, key: Any, rowid: int) -> bool:
+        """为键加入行号，返回是否新增"""
+        postings = self.search(key)
+        if postings is None:
+            self.insert(key, PostingList([rowid]))
+            return True
+        if not self._snapshots:
+            return postings.add(rowid)
+        postings = postings.copy()
+        if not postings.add(rowid):
+            return False
+        self.insert(key, postings)
+        return True
+    
+    def remove(self, key: Any, rowid: int) -> bool:
+        """删除键下的行号，返回是否删除成功；键的最后一个行号删除后键也被删除"""
+        postings = self.search(key)
+        if postings is None or rowid not in postings:
+            return False
+        if len(postings) == 1:
+            self.delete(key)
+        elif not self._snapshots:
+            postings.remove(rowid)
+        else:
+            postings = postings.copy()
+            postings.remove(rowid)
+            self.insert(key, postings)
+        return True
+    
+    def count(self, key: Any) -> int:
+        """键下的行号数量"""
+        postings = self.search(key)
+        return len(postings) if postings is not None else 0
+    
+    def lookup(self, key: Any) -> List[int]:
+        """键下的全部行号（升序）"""
+        postings = self.search(key)
+        return list(postings) if postings is not None else []
+    
+    def intersect(self, keys: Iterable[Any]) -> List[int]:
+        """同时出现在所有给定键下的行号（升序），用于多条件等值查询"""
+        lists = self.get_many(keys)
+        if not lists or any(postings is None for postings in lists):
+            return []
+        return intersect_postings(lists)
+    
+    def __repr__(self) -> str:
+        return f"BPlusMultimap(order={self.order}, height={self.height}, size={len(self)})"
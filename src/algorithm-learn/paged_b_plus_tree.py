@@ -0,0 +1,730 @@
+"""
+磁盘分页B+树实现
+节点序列化到单个文件中的定长页，通过 mmap 访问，中间有一个有界的缓冲池。
+结构：
+1. Pager：管理文件和 mmap，负责页的分配、回收（空闲链表）和读写
+2. BufferPool：缓存已解码的节点，LRU 淘汰，记录脏页和 pin 计数
+3. PagedBPlusTree：与 BPlusTree 相同的 insert/search/delete/range_query 接口，
+   子节点和兄弟叶子用页号而不是对象引用表示
+
+页 0 是文件头，记录阶数、根页号、树高、键数量和空闲链表。
+其余每页存放一个节点：4 字节长度 + pickle 编码的节点内容。
+
+可选为每个叶子维护一个内存中的布隆过滤器：查找只下降内部节点得到叶子页号，
+过滤器判定键不存在时直接返回，不读取叶子页。
+"""
+
+import math
+import mmap
+import os
+import pickle
+import struct
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+NO_PAGE = -1
+
+_MAGIC = b'BPTPAGE1'
+_VERSION = 1
+# 魔数, 版本, 页大小, 阶数, 根页号, 树高, 键数量, 页数量, 空闲链表头
+_HEADER = struct.Struct('<8sIIIqIqqq')
+_LENGTH = struct.Struct('<I')
+_MASK64 = (1 << 64) - 1
+
+
+class PagedNode:
+    """缓冲池中解码后的节点，children/next_page/prev_page 都是页号"""
+    
+    __slots__ = ('page_id', 'is_leaf', 'keys', 'values', 'children', 'next_page', 'prev_page')
+    
+    def __init__(self, page_id: int, is_leaf: bool):
+        self.page_id = page_id
+        self.is_leaf = is_leaf
+        self.keys: List[Any] = []
+        self.values: List[Any] = []  # 仅叶子节点使用
+        self.children: List[int] = []  # 仅内部节点使用
+        self.next_page = NO_PAGE
+        self.prev_page = NO_PAGE
+    
+    def __repr__(self) -> str:
+        return f"{'Leaf' if self.is_leaf else 'Internal'}Page({self.page_id}, keys={self.keys})"
+
+
+class Pager:
+    """文件页管理器：定长页 + mmap，文件不够时按倍数扩容"""
+    
+    def __init__(self, path: str, page_size: int = 4096, order: int = 64):
+        if page_size < _HEADER.size:
+            raise ValueError(f"page_size must be at least {_HEADER.size}")
+        
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        
+        if exists:
+            if os.path.getsize(path) < _HEADER.size:
+                self.file.close()
+                raise ValueError(f"{path} is not a paged B+ tree file")
+            self.mmap = mmap.mmap(self.file.fileno(), 0)
+            (magic, version, self.page_size, self.order, self.root, self.height,
+             self.size, self.page_count, self.free_head) = _HEADER.unpack_from(self.mmap, 0)
+            if magic != _MAGIC or version != _VERSION:
+                self.close()
+                raise ValueError(f"{path} is not a paged B+ tree file")
+        else:
+            self.page_size = page_size
+            self.order = order
+            self.root = NO_PAGE
+            self.height = 1
+            self.size = 0
+            self.page_count = 1  # 页 0 为文件头
+            self.free_head = NO_PAGE
+            self.file.truncate(page_size * 16)
+            self.mmap = mmap.mmap(self.file.fileno(), 0)
+            self.write_header()
+    
+    def write_header(self) -> None:
+        """把元数据写回页 0"""
+        _HEADER.pack_into(self.mmap, 0, _MAGIC, _VERSION, self.page_size, self.order, self.root,
+                          self.height, self.size, self.page_count, self.free_head)
+    
+    def allocate(self) -> int:
+        """分配一个页：优先复用空闲链表，否则追加到文件末尾"""
+        if self.free_head != NO_PAGE:
+            page_id = self.free_head
+            self.free_head = pickle.loads(self._read_payload(page_id))
+            return page_id
+        
+        page_id = self.page_count
+        self.page_count += 1
+        if self.page_count * self.page_size > len(self.mmap):
+            self._grow(self.page_count * 2)
+        return page_id
+    
+    def free(self, page_id: int) -> None:
+        """回收页：页内容改写为空闲链表的下一项"""
+        self._write_payload(page_id, pickle.dumps(self.free_head))
+        self.free_head = page_id
+    
+    def read_node(self, page_id: int) -> PagedNode:
+        """从页中解码节点"""
+        is_leaf, keys, payload, next_page, prev_page = pickle.loads(self._read_payload(page_id))
+        node = PagedNode(page_id, is_leaf)
+        node.keys = keys
+        if is_leaf:
+            node.values = payload
+        else:
+            node.children = payload
+        node.next_page = next_page
+        node.prev_page = prev_page
+        return node
+    
+    def write_node(self, node: PagedNode) -> None:
+        """把节点编码写入它所在的页"""
+        payload = node.values if node.is_leaf else node.children
+        data = pickle.dumps((node.is_leaf, node.keys, payload, node.next_page, node.prev_page),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        self._write_payload(node.page_id, data)
+    
+    def flush(self) -> None:
+        """写回文件头并把 mmap 同步到磁盘"""
+        self.write_header()
+        self.mmap.flush()
+    
+    def close(self) -> None:
+        """关闭 mmap 和文件"""
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        self.file.close()
+    
+    def _read_payload(self, page_id: int) -> bytes:
+        offset = page_id * self.page_size
+        (length,) = _LENGTH.unpack_from(self.mmap, offset)
+        start = offset + _LENGTH.size
+        return self.mmap[start:start + length]
+    
+    def _write_payload(self, page_id: int, data: bytes) -> None:
+        if _LENGTH.size + len(data) > self.page_size:
+            raise ValueError(f"node of {len(data)} bytes does not fit in a {self.page_size}-byte page; "
+                             f"use a smaller order or a larger page_size")
+        offset = page_id * self.page_size
+        _LENGTH.pack_into(self.mmap, offset, len(data))
+        start = offset + _LENGTH.size
+        self.mmap[start:start + len(data)] = data
+    
+    def _grow(self, page_count: int) -> None:
+        """扩大文件并重新映射"""
+        self.mmap.close()
+        self.file.truncate(page_count * self.page_size)
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+
+
+class BloomFilter:
+    """
+    布隆过滤器：k 个哈希位全为 1 时键可能存在，否则一定不存在
+    
+    位数和哈希个数按容量和目标误判率取最优值：m = -n·ln(p) / ln²2，k = m/n·ln2。
+    哈希位置用双重哈希 h1 + i·h2 生成，hash() 先做一次乘法混合，避免连续整数键落在相邻的位上。
+    字符串的 hash() 带进程级随机化，因此过滤器只存在内存中，重新打开文件后按需重建。
+    """
+    
+    __slots__ = ('bits', 'num_bits', 'num_hashes', 'capacity', 'count')
+    
+    def __init__(self, capacity: int, fp_rate: float):
+        if not 0 < fp_rate < 1:
+            raise ValueError("fp_rate must be between 0 and 1")
+        self.capacity = max(capacity, 1)
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, key: Any) -> Iterator[int]:
+        h = (hash(key) * 0x9E3779B97F4A7C15) & _MASK64
+        h ^= h >> 29
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        m = self.num_bits
+        return ((h1 + i * h2) % m for i in range(self.num_hashes))
+    
+    def add(self, key: Any) -> None:
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def __contains__(self, key: Any) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class _Frame:
+    """缓冲池中的一帧"""
+    
+    __slots__ = ('node', 'dirty', 'pins')
+    
+    def __init__(self, node: PagedNode, dirty: bool):
+        self.node = node
+        self.dirty = dirty
+        self.pins = 0
+
+
+class BufferPool:
+    """
+    有界缓冲池
+    
+    frames 按最近使用顺序排列（OrderedDict），需要空间时淘汰最久未使用且未被 pin 的帧，
+    脏页在淘汰或 flush 时写回 Pager。
+    """
+    
+    def __init__(self, pager: Pager, capacity: int = 256):
+        if capacity < 8:
+            raise ValueError("buffer pool capacity must be at least 8 pages")
+        self.pager = pager
+        self.capacity = capacity
+        self.frames: 'OrderedDict[int, _Frame]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def fetch(self, page_id: int) -> PagedNode:
+        """取得页对应的节点并 pin 住，使用完后必须 unpin"""
+        frame = self.frames.get(page_id)
+        if frame is not None:
+            self.hits += 1
+            self.frames.move_to_end(page_id)
+        else:
+            self.misses += 1
+            self._make_room()
+            frame = _Frame(self.pager.read_node(page_id), dirty=False)
+            self.frames[page_id] = frame
+        frame.pins += 1
+        return frame.node
+    
+    def new_node(self, is_leaf: bool) -> PagedNode:
+        """分配新页并返回一个已 pin、已标脏的空节点"""
+        self._make_room()
+        node = PagedNode(self.pager.allocate(), is_leaf)
+        frame = _Frame(node, dirty=True)
+        frame.pins = 1
+        self.frames[node.page_id] = frame
+        return node
+    
+    def unpin(self, page_id: int) -> None:
+        """释放一次 pin"""
+        frame = self.frames[page_id]
+        if frame.pins <= 0:
+            raise RuntimeError(f"page {page_id} is not pinned")
+        frame.pins -= 1
+    
+    def mark_dirty(self, page_id: int) -> None:
+        """标记页已修改"""
+        self.frames[page_id].dirty = True
+    
+    def free(self, page_id: int) -> None:
+        """丢弃页的缓存并交还给 Pager，调用方持有的 pin 一并释放"""
+        self.frames.pop(page_id)
+        self.pager.free(page_id)
+    
+    def flush(self) -> None:
+        """写回全部脏页"""
+        for frame in self.frames.values():
+            if frame.dirty:
+                self.pager.write_node(frame.node)
+                frame.dirty = False
+        self.pager.flush()
+    
+    def stats(self) -> Dict[str, int]:
+        """缓冲池命中统计"""
+        return {
+            'capacity': self.capacity,
+            'cached': len(self.frames),
+            'dirty': sum(1 for frame in self.frames.values() if frame.dirty),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+    
+    def _make_room(self) -> None:
+        """缓冲池已满时淘汰最久未使用的未 pin 帧"""
+        if len(self.frames) < self.capacity:
+            return
+        for page_id, frame in self.frames.items():
+            if frame.pins == 0:
+                if frame.dirty:
+                    self.pager.write_node(frame.node)
+                del self.frames[page_id]
+                self.evictions += 1
+                return
+        raise RuntimeError("buffer pool exhausted: all pages are pinned")
+
+
+class PagedBPlusTree:
+    """
+    持久化的分页B+树
+    
+    用法与 BPlusTree 相同，另外需要在结束时 close()（或使用 with 语句）把脏页写回文件。
+    重新打开同一个文件即可直接使用，不需要重建。
+    """
+    
+    def __init__(self, path: str, order: int = 64, page_size: int = 4096, cache_pages: int = 256,
+                 bloom_fp_rate: Optional[float] = None):
+        """
+        打开或创建分页B+树
+        
+        Args:
+            path: 数据文件路径，已存在时沿用文件中记录的阶数和页大小
+            order: 阶数，order 个键的节点编码后必须能放进一页
+            page_size: 页大小（字节）
+            cache_pages: 缓冲池容量（页数）
+            bloom_fp_rate: 每个叶子布隆过滤器的目标误判率，None 表示不使用过滤器
+        """
+        if order < 3:
+            raise ValueError("Order must be at least 3")
+        if bloom_fp_rate is not None and not 0 < bloom_fp_rate < 1:
+            raise ValueError("bloom_fp_rate must be between 0 and 1")
+        
+        self.pager = Pager(path, page_size, order)
+        self.pool = BufferPool(self.pager, cache_pages)
+        self.order = self.pager.order
+        # 叶子页号 -> 布隆过滤器；没有过滤器的叶子在下一次读到时重建
+        self.bloom_fp_rate = bloom_fp_rate
+        self.filters: Optional[Dict[int, BloomFilter]] = {} if bloom_fp_rate is not None else None
+        self.filter_checks = 0
+        self.filter_negatives = 0
+        self.filter_false_positives = 0
+        if self.pager.root == NO_PAGE:
+            root = self.pool.new_node(is_leaf=True)
+            self.pager.root = root.page_id
+            self.pool.unpin(root.page_id)
+    
+    @property
+    def height(self) -> int:
+        return self.pager.height
+    
+    def search(self, key: Any) -> Optional[Any]:
+        """搜索键对应的值"""
+        pins: List[int] = []
+        try:
+            if self.filters is None:
+                leaf, _ = self._descend(key, pins)
+                bloom = None
+            else:
+                page_id = self._leaf_page(key, pins)
+                bloom = self.filters.get(page_id)
+                if bloom is not None:
+                    self.filter_checks += 1
+                    if key not in bloom:
+                        self.filter_negatives += 1
+                        return None
+                leaf = self._fetch(page_id, pins)
+                if bloom is None:
+                    self._rebuild_filter(leaf)
+            idx = bisect_left(leaf.keys, key)
+            if idx < len(leaf.keys) and leaf.keys[idx] == key:
+                return leaf.values[idx]
+            if bloom is not None:
+                self.filter_false_positives += 1
+            return None
+        finally:
+            self._release(pins)
+    
+    def insert(self, key: Any, value: Any) -> bool:
+        """插入键值对，键已存在时更新值"""
+        pins: List[int] = []
+        try:
+            leaf, path = self._descend(key, pins)
+            idx = bisect_left(leaf.keys, key)
+            self.pool.mark_dirty(leaf.page_id)
+            if idx < len(leaf.keys) and leaf.keys[idx] == key:
+                leaf.values[idx] = value
+                return True
+            
+            leaf.keys.insert(idx, key)
+            leaf.values.insert(idx, value)
+            self.pager.size += 1
+            if len(leaf.keys) >= self.order:
+                self._split(leaf, path, pins)
+            elif self.filters is not None:
+                bloom = self.filters.get(leaf.page_id)
+                # 删除不会清除位，累计插入次数超过容量后按当前键重建，误判率才有保证
+                if bloom is None or bloom.count >= bloom.capacity:
+                    self._rebuild_filter(leaf)
+                else:
+                    bloom.add(key)
+            return True
+        finally:
+            self._release(pins)
+    
+    def delete(self, key: Any) -> bool:
+        """删除键值对"""
+        pins: List[int] = []
+        try:
+            leaf, path = self._descend(key, pins)
+            idx = bisect_left(leaf.keys, key)
+            if idx == len(leaf.keys) or leaf.keys[idx] != key:
+                return False
+            
+            leaf.keys.pop(idx)
+            leaf.values.pop(idx)
+            self.pool.mark_dirty(leaf.page_id)
+            self.pager.size -= 1
+            self._rebalance(leaf, path, pins)
+            return True
+        finally:
+            self._release(pins)
+    
+    def range_query(self, start_key: Any, end_key: Any) -> List[Tuple[Any, Any]]:
+        """范围查询，返回 [start_key, end_key] 内的全部键值对"""
+        return list(self.iter_range(start_key, end_key))
+    
+    def iter_range(self, start_key: Any = None, end_key: Any = None,
+                   inclusive: Tuple[bool, bool] = (True, True), limit: Optional[int] = None,
+                   reverse: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """
+        惰性范围迭代，参数含义与 BPlusTree.iter_range 相同
+        
+        每次只 pin 一个叶子，复制出本叶子的结果后立即 unpin，迭代过程中不长期占用缓冲池。
+        """
+        if limit is not None and limit <= 0:
+            return
+        low_inclusive, high_inclusive = inclusive
+        remaining = limit
+        
+        if not reverse:
+            page_id, idx = self._locate(start_key, not low_inclusive, first=True)
+            while page_id != NO_PAGE:
+                leaf = self.pool.fetch(page_id)
+                try:
+                    keys = leaf.keys
+                    stop = len(keys)
+                    if end_key is not None:
+                        stop = (bisect_right if high_inclusive else bisect_left)(keys, end_key, idx)
+                    if remaining is not None:
+                        stop = min(stop, idx + remaining)
+                        remaining -= stop - idx
+                    chunk = list(zip(keys[idx:stop], leaf.values[idx:stop]))
+                    done = stop < len(keys) or remaining == 0
+                    page_id, idx = leaf.next_page, 0
+                finally:
+                    self.pool.unpin(leaf.page_id)
+                yield from chunk
+                if done:
+                    return
+        else:
+            page_id, idx = self._locate(end_key, not high_inclusive, first=False)
+            while page_id != NO_PAGE:
+                leaf = self.pool.fetch(page_id)
+                try:
+                    keys = leaf.keys
+                    if idx is None:
+                        idx = len(keys)
+                    stop = 0
+                    if start_key is not None:
+                        stop = (bisect_left if low_inclusive else bisect_right)(keys, start_key, 0, idx)
+                    if remaining is not None:
+                        stop = max(stop, idx - remaining)
+                        remaining -= idx - stop
+                    chunk = list(zip(keys[stop:idx], leaf.values[stop:idx]))
+                    chunk.reverse()
+                    done = stop > 0 or remaining == 0
+                    page_id, idx = leaf.prev_page, None
+                finally:
+                    self.pool.unpin(leaf.page_id)
+                yield from chunk
+                if done:
+                    return
+    
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """按键序惰性产出全部 (键, 值)"""
+        return self.iter_range()
+    
+    def keys(self) -> Iterator[Any]:
+        """按键序惰性产出全部键"""
+        return (key for key, _ in self.iter_range())
+    
+    def traverse(self) -> List[Any]:
+        """遍历所有键（有序）"""
+        return list(self.keys())
+    
+    def flush(self) -> None:
+        """把脏页和文件头写回磁盘"""
+        self.pool.flush()
+    
+    def close(self) -> None:
+        """写回并关闭文件"""
+        if self.pager.mmap is not None:
+            self.flush()
+            self.pager.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """页数量、缓冲池统计，以及启用过滤器时的过滤命中情况"""
+        stats: Dict[str, Any] = self.pool.stats()
+        stats.update(pages=self.pager.page_count, height=self.pager.height, size=self.pager.size)
+        if self.filters is not None:
+            stats.update(
+                filters=len(self.filters),
+                filter_bytes=sum(len(bloom.bits) for bloom in self.filters.values()),
+                filter_checks=self.filter_checks,
+                filter_negatives=self.filter_negatives,
+                filter_false_positives=self.filter_false_positives,
+                # 过滤器直接拦下的查找占全部经过过滤器的查找的比例
+                filter_hit_ratio=self.filter_negatives / self.filter_checks if self.filter_checks else 0.0,
+            )
+        return stats
+    
+    def __enter__(self) -> 'PagedBPlusTree':
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def __iter__(self) -> Iterator[Any]:
+        return self.keys()
+    
+    def __len__(self) -> int:
+        return self.pager.size
+    
+    def __contains__(self, key: Any) -> bool:
+        return self.search(key) is not None
+    
+    def __repr__(self) -> str:
+        return f"PagedBPlusTree(path={self.pager.path!r}, order={self.order}, height={self.height}, size={len(self)})"
+    
+    # ---- 内部实现 ----
+    
+    def _fetch(self, page_id: int, pins: List[int]) -> PagedNode:
+        """pin 住页并记入本次操作的 pin 列表，操作结束时统一释放"""
+        node = self.pool.fetch(page_id)
+        pins.append(page_id)
+        return node
+    
+    def _new_node(self, is_leaf: bool, pins: List[int]) -> PagedNode:
+        node = self.pool.new_node(is_leaf)
+        pins.append(node.page_id)
+        return node
+    
+    def _release(self, pins: List[int]) -> None:
+        for page_id in pins:
+            if page_id in self.pool.frames:  # 已被 free 的页不再需要 unpin
+                self.pool.unpin(page_id)
+    
+    def _descend(self, key: Any, pins: List[int]) -> Tuple[PagedNode, List[Tuple[PagedNode, int]]]:
+        """从根下降到叶子，返回叶子和经过的 (内部节点, 子节点下标)"""
+        node = self._fetch(self.pager.root, pins)
+        path = []
+        while not node.is_leaf:
+            idx = bisect_right(node.keys, key)
+            path.append((node, idx))
+            node = self._fetch(node.children[idx], pins)
+        return node, path
+    
+    def _leaf_page(self, key: Any, pins: List[int]) -> int:
+        """只下降内部节点，返回键所在叶子的页号，不读取叶子页"""
+        page_id = self.pager.root
+        for _ in range(self.pager.height - 1):
+            node = self._fetch(page_id, pins)
+            page_id = node.children[bisect_right(node.keys, key)]
+        return page_id
+    
+    def _rebuild_filter(self, leaf: PagedNode) -> None:
+        """按叶子当前的键重建它的过滤器"""
+        if self.filters is None:
+            return
+        bloom = BloomFilter(self.order, self.bloom_fp_rate)
+        for key in leaf.keys:
+            bloom.add(key)
+        self.filters[leaf.page_id] = bloom
+    
+    def _locate(self, key: Any, after_equal: bool, first: bool) -> Tuple[int, Optional[int]]:
+        """
+        返回扫描起点 (叶子页号, 下标)
+        
+        first=True 用于正向扫描：定位第一个 >= key（after_equal 时 > key）的位置；
+        first=False 用于逆向扫描：定位最后一个 <= key（after_equal 时 < key）之后的位置。
+        key 为 None 表示从最左/最右端开始。
+        """
+        pins: List[int] = []
+        try:
+            node = self._fetch(self.pager.root, pins)
+            while not node.is_leaf:
+                if key is None:
+                    child = node.children[0] if first else node.children[-1]
+                else:
+                    child = node.children[bisect_right(node.keys, key)]
+                node = self._fetch(child, pins)
+            if key is None:
+                return node.page_id, 0 if first else None
+            find = bisect_right if (after_equal == first) else bisect_left
+            return node.page_id, find(node.keys, key)
+        finally:
+            self._release(pins)
+    
+    def _split(self, leaf: PagedNode, path: List[Tuple[PagedNode, int]], pins: List[int]) -> None:
+        """分裂已满的叶子，必要时沿路径向上分裂内部节点"""
+        mid = self.order // 2
+        right = self._new_node(True, pins)
+        right.keys, leaf.keys = leaf.keys[mid:], leaf.keys[:mid]
+        right.values, leaf.values = leaf.values[mid:], leaf.values[:mid]
+        right.next_page, right.prev_page = leaf.next_page, leaf.page_id
+        if leaf.next_page != NO_PAGE:
+            following = self._fetch(leaf.next_page, pins)
+            following.prev_page = right.page_id
+            self.pool.mark_dirty(following.page_id)
+        leaf.next_page = right.page_id
+        self._rebuild_filter(leaf)
+        self._rebuild_filter(right)
+        
+        separator, new_child, old_child = right.keys[0], right.page_id, leaf.page_id
+        while path:
+            parent, idx = path.pop()
+            parent.keys.insert(idx, separator)
+            parent.children.insert(idx + 1, new_child)
+            self.pool.mark_dirty(parent.page_id)
+            if len(parent.keys) < self.order:
+                return
+            # 内部节点分裂，中间键上推
+            sibling = self._new_node(False, pins)
+            separator = parent.keys[mid]
+            sibling.keys, parent.keys = parent.keys[mid + 1:], parent.keys[:mid]
+            sibling.children, parent.children = parent.children[mid + 1:], parent.children[:mid + 1]
+            new_child, old_child = sibling.page_id, parent.page_id
+        
+        # 根节点分裂，树高加一
+        root = self._new_node(False, pins)
+        root.keys = [separator]
+        root.children = [old_child, new_child]
+        self.pager.root = root.page_id
+        self.pager.height += 1
+    
+    def _min_keys(self, node: PagedNode) -> int:
+        """非根节点的最少键数，与 BPlusTree 相同"""
+        return self.order // 2 if node.is_leaf else (self.order - 1) // 2
+    
+    def _rebalance(self, node: PagedNode, path: List[Tuple[PagedNode, int]], pins: List[int]) -> None:
+        """删除后沿路径向上处理下溢：借键、合并、根节点收缩"""
+        while path and len(node.keys) < self._min_keys(node):
+            parent, idx = path.pop()
+            left = self._fetch(parent.children[idx - 1], pins) if idx > 0 else None
+            right = self._fetch(parent.children[idx + 1], pins) if idx + 1 < len(parent.children) else None
+            minimum = self._min_keys(node)
+            self.pool.mark_dirty(parent.page_id)
+            self.pool.mark_dirty(node.page_id)
+            
+            if left is not None and len(left.keys) > minimum:
+                self.pool.mark_dirty(left.page_id)
+                if node.is_leaf:
+                    node.keys.insert(0, left.keys.pop())
+                    node.values.insert(0, left.values.pop())
+                    parent.keys[idx - 1] = node.keys[0]
+                    self._rebuild_filter(node)
+                else:
+                    node.keys.insert(0, parent.keys[idx - 1])
+                    parent.keys[idx - 1] = left.keys.pop()
+                    node.children.insert(0, left.children.pop())
+                return
+            if right is not None and len(right.keys) > minimum:
+                self.pool.mark_dirty(right.page_id)
+                if node.is_leaf:
+                    node.keys.append(right.keys.pop(0))
+                    node.values.append(right.values.pop(0))
+                    parent.keys[idx] = right.keys[0]
+                    self._rebuild_filter(node)
+                else:
+                    node.keys.append(parent.keys[idx])
+                    parent.keys[idx] = right.keys.pop(0)
+                    node.children.append(right.children.pop(0))
+                return
+            
+            if left is not None:
+                self._merge(left, node, parent, idx - 1, pins)
+            else:
+                self._merge(node, right, parent, idx, pins)
+            node = parent
+        
+        # 内部根只剩一个子节点时收缩
+        if not path and not node.is_leaf and not node.keys and node.page_id == self.pager.root:
+            self.pager.root = node.children[0]
+            self.pager.height -= 1
+            self.pool.free(node.page_id)
+    
+    def _merge(self, left: PagedNode, right: PagedNode, parent: PagedNode, sep_idx: int,
+               pins: List[int]) -> None:
+        """把 right 合并进 left 并回收 right 所在的页"""
+        separator = parent.keys.pop(sep_idx)
+        parent.children.pop(sep_idx + 1)
+        self.pool.mark_dirty(left.page_id)
+        if left.is_leaf:
+            left.keys.extend(right.keys)
+            left.values.extend(right.values)
+            left.next_page = right.next_page
+            if right.next_page != NO_PAGE:
+                following = self._fetch(right.next_page, pins)
+                following.prev_page = left.page_id
+                self.pool.mark_dirty(following.page_id)
+            self._rebuild_filter(left)
+            if self.filters is not None:
+                self.filters.pop(right.page_id, None)
+        else:
+            left.keys.append(separator)
+            left.keys.extend(right.keys)
+            left.children.extend(right.children)
+        self.pool.free(right.page_id)
+
+
+if __name__ == "__main__":
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'index.db')
+        with PagedBPlusTree(path, order=32, cache_pages=16) as tree:
+            for i in range(10000):
+                tree.insert(i, f"value_{i}")
+            print(f"写入后: {tree}")
+            print(f"缓冲池: {tree.stats()}")
+        
+        with PagedBPlusTree(path) as tree:
+            print(f"重新打开: {tree}")
+            print(f"范围查询 [100, 105]: {tree.range_query(100, 105)}")
@@ -0,0 +1,398 @@
+"""
+字节键B+树：保序编码、叶子前缀压缩与截断分隔键
+以 (租户, 用户, 时间戳) 这类元组或长 URL 为键时，每次比较都是逐元素的 Python 富比较，
+内部节点还各自保存一份完整的长键。这里分三层处理：
+1. encode_key 把元组、字符串、整数等编码成保序的 bytes：编码后的字节序与原键的比较结果一致，
+   比较只是一次 memcmp；decode_key 还原为元组
+2. 叶子的键存成 PrefixKeys：叶内公共前缀只存一份，每个键只存去掉前缀后的后缀
+3. 叶子分裂时提升到父节点的不是右叶子的完整首键，而是能区分左右两个叶子的最短前缀
+
+编码规则（与 FoundationDB 的 tuple 层相同的思路），每个元素以一个类型字节开头：
+- None: 0x00
+- bytes / str: 0x01 / 0x02，内容中的 0x00 转义为 0x00 0xFF，以 0x00 结尾；str 用 UTF-8
+  （UTF-8 的字节序就是码点序）
+- 嵌套元组: 0x05，元素依次编码，以 0x00 结尾（其中的 None 编码为 0x00 0xFF）
+- int: 0x14 为零；正数 0x14 + n 后接 n 字节大端，负数 0x14 - n 后接反码，字节数越多的类型字节越靠外；
+  超过 8 字节的整数用 0x1D / 0x0B 加一个长度字节
+- float: 0x21 后接 8 字节：非负数翻转符号位，负数按位取反
+较短的元组是较长元组的前缀，编码后也是前缀，因此 (a,) < (a, b) 同样成立。
+"""
+
+import struct
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from b_plus_tree import Aggregate, BPlusTree, BPlusTreeLeafNode
+
+
+_NONE = 0x00
+_BYTES = 0x01
+_STR = 0x02
+_NESTED = 0x05
+_NEG_BIG = 0x0B
+_INT_ZERO = 0x14
+_POS_BIG = 0x1D
+_FLOAT = 0x21
+
+_DOUBLE = struct.Struct('>d')
+_SIGN = 1 << 63
+_MASK64 = (1 << 64) - 1
+
+
+def _encode_item(value: Any, out: bytearray, nested: bool) -> None:
+    if value is None:
+        out += b'\x00\xff' if nested else b'\x00'
+    elif isinstance(value, bytes):
+        out.append(_BYTES)
+        out += value.replace(b'\x00', b'\x00\xff')
+        out.append(0)
+    elif isinstance(value, str):
+        out.append(_STR)
+        out += value.encode('utf-8', 'surrogatepass').replace(b'\x00', b'\x00\xff')
+        out.append(0)
+    elif isinstance(value, tuple):
+        out.append(_NESTED)
+        for item in value:
+            _encode_item(item, out, True)
+        out.append(0)
+    elif isinstance(value, int):
+        if value == 0:
+            out.append(_INT_ZERO)
+            return
+        n = (abs(value).bit_length() + 7) // 8
+        if n > 255:
+            raise ValueError("integer key is too large to encode")
+        if value > 0:
+            data = value.to_bytes(n, 'big')
+            if n <= 8:
+                out.append(_INT_ZERO + n)
+            else:
+                out += bytes((_POS_BIG, n))
+        else:
+            data = ((1 << (8 * n)) - 1 + value).to_bytes(n, 'big')
+            if n <= 8:
+                out.append(_INT_ZERO - n)
+            else:
+                out += bytes((_NEG_BIG, n ^ 0xFF))
+        out += data
+    elif isinstance(value, float):
+        # -0.0 与 0.0 相等，统一编码
+        bits = int.from_bytes(_DOUBLE.pack(value if value != 0 else 0.0), 'big')
+        bits = bits ^ _MASK64 if bits & _SIGN else bits | _SIGN
+        out.append(_FLOAT)
+        out += bits.to_bytes(8, 'big')
+    else:
+        raise TypeError(f"cannot encode key element of type {type(value).__name__}")
+
+
+def encode_key(key: Any) -> bytes:
+    """
+    把键编码为保序的 bytes：a < b 当且仅当 encode_key(a) < encode_key(b)
+    
+    元组的各元素依次拼接；非元组的键等同于单元素元组。元组同一位置上的数值须统一为
+    int 或 float（两者分开编码，不交错排序）；bool 按 int 编码。
+    """
+    out = bytearray()
+    for item in key if isinstance(key, tuple) else (key,):
+        _encode_item(item, out, False)
+    return bytes(out)
+
+
+def _terminated(data: bytes, pos: int) -> Tuple[bytes, int]:
+    """从 pos 起读取一段转义内容直到未转义的 0x00，返回 (还原后的内容, 结尾之后的位置)"""
+    end = data.find(b'\x00', pos)
+    while 0 <= end and end + 1 < len(data) and data[end + 1] == 0xFF:
+        end = data.find(b'\x00', end + 2)
+    if end < 0:
+        raise ValueError("truncated key encoding")
+    return data[pos:end].replace(b'\x00\xff', b'\x00'), end + 1
+
+
+def _decode_item(data: bytes, pos: int, nested: bool) -> Tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos + 1 if nested else pos
+    if tag == _BYTES:
+        return _terminated(data, pos)
+    if tag == _STR:
+        raw, pos = _terminated(data, pos)
+        return raw.decode('utf-8', 'surrogatepass'), pos
+    if tag == _NESTED:
+        items = []
+        while True:
+            if pos >= len(data):
+                raise ValueError("truncated key encoding")
+            if data[pos] == 0 and not (pos + 1 < len(data) and data[pos + 1] == 0xFF):
+                return tuple(items), pos + 1
+            item, pos = _decode_item(data, pos, True)
+            items.append(item)
+    if _NEG_BIG <= tag <= _POS_BIG:
+        if tag == _POS_BIG:
+            n, pos = data[pos], pos + 1
+        elif tag == _NEG_BIG:
+            n, pos = data[pos] ^ 0xFF, pos + 1
+        else:
+            n = abs(tag - _INT_ZERO)
+        if pos + n > len(data):
+            raise ValueError("truncated key encoding")
+        value = int.from_bytes(data[pos:pos + n], 'big')
+        if tag < _INT_ZERO:
+            value -= (1 << (8 * n)) - 1
+        return value, pos + n
+    if tag == _FLOAT:
+        if pos + 8 > len(data):
+            raise ValueError("truncated key encoding")
+        bits = int.from_bytes(data[pos:pos + 8], 'big')
+        bits = bits ^ _SIGN if bits & _SIGN else bits ^ _MASK64
+        return _DOUBLE.unpack(bits.to_bytes(8, 'big'))[0], pos + 8
+    raise ValueError(f"unknown key element tag 0x{tag:02x}")
+
+
+def decode_key(data: bytes) -> Tuple[Any, ...]:
+    """encode_key 的逆过程，总是返回元组（标量键解码为单元素元组）"""
+    items = []
+    pos = 0
+    while pos < len(data):
+        item, pos = _decode_item(data, pos, False)
+        items.append(item)
+    return tuple(items)
+
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    """a 与 b 的最长公共前缀长度；在切片相等上二分，比较都在 C 层完成"""
+    lo, hi = 0, min(len(a), len(b))
+    if a[:hi] == b[:hi]:
+        return hi
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def shortest_separator(left: bytes, right: bytes) -> bytes:
+    """left < right 时返回满足 left < s <= right 的最短 s：right 比公共前缀多一个字节的前缀"""
+    return right[:_common_prefix_len(left, right) + 1]
+
+
+def _check_key(key: Any) -> None:
+    if not isinstance(key, bytes):
+        raise TypeError(f"PrefixBPlusTree keys must be bytes, got {type(key).__name__}; use encode_key()")
+
+
+class PrefixKeys:
+    """
+    前缀压缩的有序 bytes 键序列，供叶子存放键
+    
+    对外表现为完整键的序列：支持下标、切片、insert/pop/append/extend、切片赋值和删除，
+    bisect 可以直接作用在它上面，BPlusTree 中操作叶子键的代码不需要改动。
+    内部只存一份公共前缀和各键的后缀：插入不带该前缀的键时前缀缩短；
+    删除键不会让前缀变长，切片（分裂、复制）时按首尾两个键重新计算。
+    """
+    
+    __slots__ = ('prefix', '_suffixes')
+    
+    def __init__(self, keys: Iterable[bytes] = ()):
+        self.prefix = b''
+        self._suffixes: List[bytes] = []
+        self.extend(keys)
+    
+    @classmethod
+    def _from_suffixes(cls, prefix: bytes, suffixes: List[bytes]) -> 'PrefixKeys':
+        """由前缀和有序后缀构建，并把首尾后缀的公共部分并入前缀"""
+        keys = cls()
+        if suffixes:
+            extra = _common_prefix_len(suffixes[0], suffixes[-1])
+            if extra:
+                prefix += suffixes[0][:extra]
+                suffixes = [suffix[extra:] for suffix in suffixes]
+        keys.prefix, keys._suffixes = prefix, suffixes
+        return keys
+    
+    def _shrink_prefix(self, length: int) -> None:
+        """把前缀缩短到 length 字节，多出的部分补回每个后缀"""
+        head = self.prefix[length:]
+        self._suffixes = [head + suffix for suffix in self._suffixes]
+        self.prefix = self.prefix[:length]
+    
+    def _fit(self, keys: List[bytes]) -> None:
+        """缩短前缀，使 keys 都以它开头"""
+        prefix = self.prefix if self._suffixes else (keys[0] if keys else b'')
+        length = len(prefix)
+        for key in keys:
+            _check_key(key)
+            if not key.startswith(prefix[:length]):
+                length = _common_prefix_len(prefix[:length], key)
+        if not self._suffixes:
+            self.prefix = prefix[:length]
+        elif length < len(self.prefix):
+            self._shrink_prefix(length)
+    
+    def bisect_left(self, key: bytes, lo: int = 0) -> int:
+        """与 bisect.bisect_left 相同，键带有公共前缀时只在后缀上二分，不拼接完整键"""
+        prefix = self.prefix
+        if key.startswith(prefix):
+            return bisect_left(self._suffixes, key[len(prefix):], lo)
+        return lo if key < prefix else len(self._suffixes)
+    
+    def bisect_right(self, key: bytes, lo: int = 0) -> int:
+        """与 bisect.bisect_right 相同"""
+        prefix = self.prefix
+        if key.startswith(prefix):
+            return bisect_right(self._suffixes, key[len(prefix):], lo)
+        return lo if key < prefix else len(self._suffixes)
+    
+    def insert(self, idx: int, key: bytes) -> None:
+        self._fit([key])
+        self._suffixes.insert(idx, key[len(self.prefix):])
+    
+    def append(self, key: bytes) -> None:
+        self._fit([key])
+        self._suffixes.append(key[len(self.prefix):])
+    
+    def extend(self, keys: Iterable[bytes]) -> None:
+        keys = list(keys)
+        self._fit(keys)
+        start = len(self.prefix)
+        self._suffixes.extend(key[start:] for key in keys)
+    
+    def pop(self, idx: int = -1) -> bytes:
+        return self.prefix + self._suffixes.pop(idx)
+    
+    @property
+    def nbytes(self) -> int:
+        """前缀与全部后缀的字节数之和"""
+        return len(self.prefix) + sum(map(len, self._suffixes))
+    
+    def __getitem__(self, idx: Union[int, slice]) -> Any:
+        if isinstance(idx, slice):
+            return self._from_suffixes(self.prefix, self._suffixes[idx])
+        return self.prefix + self._suffixes[idx]
+    
+    def __setitem__(self, idx: Union[int, slice], value: Any) -> None:
+        # 只在借键这类低频操作中用到：还原成完整键修改后重新压缩
+        keys = list(self)
+        keys[idx] = value
+        rebuilt = PrefixKeys(keys)
+        self.prefix, self._suffixes = rebuilt.prefix, rebuilt._suffixes
+    
+    def __delitem__(self, idx: Union[int, slice]) -> None:
+        del self._suffixes[idx]
+    
+    def __add__(self, other: Iterable[bytes]) -> 'PrefixKeys':
+        result = self[:]
+        result.extend(other)
+        return result
+    
+    def __len__(self) -> int:
+        return len(self._suffixes)
+    
+    def __iter__(self) -> Iterator[bytes]:
+        prefix = self.prefix
+        return (prefix + suffix for suffix in self._suffixes)
+    
+    def __reversed__(self) -> Iterator[bytes]:
+        prefix = self.prefix
+        return (prefix + suffix for suffix in reversed(self._suffixes))
+    
+    def __contains__(self, key: Any) -> bool:
+        if not isinstance(key, bytes):
+            return False
+        idx = self.bisect_left(key)
+        return idx < len(self) and self[idx] == key
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (PrefixKeys, list, tuple)):
+            return NotImplemented
+        return list(self) == list(other)
+    
+    def __repr__(self) -> str:
+        return f"PrefixKeys(prefix={self.prefix!r}, keys={len(self)})"
+
+
+class PrefixLeafNode(BPlusTreeLeafNode):
+    """键存放在 PrefixKeys 中的叶子，查找走后缀二分的快速路径"""
+    
+    __slots__ = ()
+    
+    def __init__(self):
+        super().__init__()
+        self.keys = PrefixKeys()
+    
+    def search(self, key: Any) -> Optional[Any]:
+        keys = self.keys
+        idx = keys.bisect_left(key)
+        if idx < len(keys) and keys[idx] == key:
+            return self.values[idx]
+        return None
+
+
+class PrefixBPlusTree(BPlusTree):
+    """
+    以 bytes 为键的B+树：叶子前缀压缩，内部节点存截断后的最短分隔键
+    
+    键必须是 bytes（插入其他类型抛出 TypeError），元组和字符串键先用 encode_key 编码，
+    读出的键用 decode_key 还原。接口与 BPlusTree 相同；快照、批量操作、split/concat、
+    dump/load 和 freeze 都照常可用。
+    """
+    
+    leaf_class = PrefixLeafNode
+    
+    def __init__(self, order: int = 4, key_type: Optional[str] = None,
+                 aggregates: Union[None, Iterable[str], Dict[str, Aggregate]] = None):
+        """
+        Args:
+            order: B+树的阶数
+            key_type: 键固定为 bytes，只接受 None（保留参数以兼容 from_sorted/load 等构造路径）
+            aggregates: 子树聚合，同 BPlusTree
+        """
+        if key_type is not None:
+            raise ValueError("PrefixBPlusTree keys are bytes; key_type is not supported")
+        super().__init__(order, aggregates=aggregates)
+    
+    @staticmethod
+    def _leaf_separator(left: BPlusTreeLeafNode, right: BPlusTreeLeafNode) -> bytes:
+        """左叶子最大键与右叶子最小键之间的最短分隔键"""
+        if not left.keys:
+            return right.keys[0]
+        return shortest_separator(left.keys[-1], right.keys[0])
+    
+    def _build_levels(self, leaves: List[BPlusTreeLeafNode], fill_factor: float = 1.0) -> None:
+        # load() 按切片还原出的叶子键是 list，先换成前缀压缩的形式
+        for leaf in leaves:
+            if not isinstance(leaf.keys, PrefixKeys):
+                leaf.keys = PrefixKeys(leaf.keys)
+        super()._build_levels(leaves, fill_factor)
+    
+    def insert(self, key: bytes, value: Any) -> bool:
+        _check_key(key)
+        return super().insert(key, value)
+    
+    def range_keys(self, start_key: Optional[bytes] = None, end_key: Optional[bytes] = None) -> List[bytes]:
+        """返回 [start_key, end_key] 内的全部键（list）"""
+        return list(super().range_keys(start_key, end_key))
+    
+    def key_bytes(self) -> Dict[str, int]:
+        """
+        键占用的字节数（不含 Python 对象头）
+        
+        leaf_raw 是叶子键不压缩时的总字节数，leaf_stored 是前缀压缩后实际存放的字节数，
+        internal 是全部内部节点分隔键的字节数。
+        """
+        leaf_raw = leaf_stored = internal = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                leaf_raw += sum(map(len, node.keys))
+                leaf_stored += node.keys.nbytes
+            else:
+                internal += sum(map(len, node.keys))
+                stack.extend(node.children)
+        return {'leaf_raw': leaf_raw, 'leaf_stored': leaf_stored, 'internal': internal}
+    
+    def __repr__(self) -> str:
+        return f"PrefixBPlusTree(order={self.order}, height={self.height}, size={len(self)})"
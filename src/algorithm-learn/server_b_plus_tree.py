@@ -0,0 +1,471 @@
+"""
+B+树的 asyncio 键值服务
+多个工作进程各自嵌入一棵 BPlusTree 时内存成倍增长；TreeServer 让一棵树通过 TCP 或 Unix socket
+同时服务多个客户端，TreeClient 是与之配套的异步客户端。
+
+协议：每帧为 4 字节小端长度加 pickle 编码的元组
+- 请求 (请求号, 操作, 参数...)，操作为 get / get_many / put / delete / range / size
+- 响应 (请求号, 状态, 结果)，状态为 OK / ERROR / CHUNK / END；range 的结果分多个 CHUNK 帧流式返回，以 END 结束
+- range 按信用做流量控制：请求中带初始窗口（块数），服务端每发一块消耗一个信用，用完即暂停；
+  客户端每消费一块发送 (0, 'credit', 请求号, 1) 补充信用，提前停止时发送 (0, 'cancel', 请求号)。
+  这两种消息没有响应
+pickle 可以构造任意对象，服务只应监听本机或可信网络。
+
+服务端：
+1. 流水线：一个连接上可以连续发送多个请求而不等待响应，响应带请求号，由客户端按号分发
+2. 合并点查：同一轮事件循环中到达的 get（可能来自不同连接）先排队，在本轮末尾合并成一次
+   get_many——排序后同一叶子内的键共用一次下降；队列达到 max_batch 时立即执行
+3. 写操作执行前先执行排队中的点查，所有操作按到达顺序生效，同一连接上先写后读一定能读到
+4. range 在请求到达时创建快照（BPlusTree 为 O(1)，ConcurrentBPlusTree 复制全部键值），之后分块发送，每块之后等待发送缓冲排空；客户端未消费的块
+   最多为窗口大小，慢消费者不会让结果堆积在客户端内存里，也不会阻塞同一连接上的其他请求；
+   扫描期间的写入不影响已经开始的扫描
+树只在事件循环线程中访问，满足 BPlusTree 单线程写的要求。
+
+客户端维护一个连接池，每个请求选择未完成请求最少的连接发送；单个连接本身支持流水线，
+并发的 await client.get(...) 会自然地在服务端被合并。
+"""
+
+import asyncio
+import pickle
+import struct
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from b_plus_tree import BPlusTree
+
+
+_FRAME_HEADER = struct.Struct('<I')
+MAX_FRAME = 64 * 1024 * 1024
+
+OK, ERROR, CHUNK, END = range(4)
+
+# 客户端 range 的默认窗口：最多有这么多块已发出但未被消费
+RANGE_WINDOW = 4
+
+
+def _encode(message: Tuple[Any, ...]) -> bytes:
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(payload) > MAX_FRAME:
+        raise ValueError(f"frame of {len(payload)} bytes exceeds MAX_FRAME")
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[Tuple[Any, ...]]:
+    """读取一帧，连接正常关闭时返回 None"""
+    try:
+        header = await reader.readexactly(_FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ConnectionError("connection closed in the middle of a frame") from e
+        return None
+    (length,) = _FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ConnectionError(f"frame of {length} bytes exceeds MAX_FRAME")
+    return pickle.loads(await reader.readexactly(length))
+
+
+class _RangeStream:
+    """服务端一个进行中的 range：客户端授予的剩余信用（块数）"""
+    
+    __slots__ = ('credits', 'cancelled', 'wakeup')
+    
+    def __init__(self, credits: int):
+        self.credits = credits
+        self.cancelled = False
+        self.wakeup = asyncio.Event()
+    
+    def grant(self, count: int) -> None:
+        self.credits += count
+        self.wakeup.set()
+    
+    def cancel(self) -> None:
+        self.cancelled = True
+        self.wakeup.set()
+
+
+class TreeServer:
+    """
+    通过 TCP 或 Unix socket 提供一棵B+树的读写
+    
+    示例：
+        async with TreeServer(BPlusTree(order=64), port=0) as server:
+            host, port = server.address
+            ...
+    """
+    
+    def __init__(self, tree: Optional[BPlusTree] = None, host: str = '127.0.0.1', port: int = 0,
+                 path: Optional[str] = None, max_batch: int = 1024, range_chunk: int = 256):
+        """
+        Args:
+            tree: 要提供服务的树，默认新建 BPlusTree(order=64)
+            host: TCP 监听地址
+            port: TCP 端口，0 表示由系统分配（实际端口见 address）
+            path: Unix socket 路径；给出时忽略 host/port
+            max_batch: 一次合并的点查上限
+            range_chunk: range 每帧的条数
+        """
+        if max_batch < 1 or range_chunk < 1:
+            raise ValueError("max_batch and range_chunk must be positive")
+        self.tree = tree if tree is not None else BPlusTree(order=64)
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_batch = max_batch
+        self.range_chunk = range_chunk
+        self.stats: Dict[str, int] = {'connections': 0, 'requests': 0, 'batches': 0, 'batched_keys': 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._pending: List[Tuple[asyncio.StreamWriter, int, Any]] = []
+        self._flush_scheduled = False
+        self._tasks: set = set()
+        self._streams: Dict[Tuple[asyncio.StreamWriter, int], _RangeStream] = {}
+    
+    async def start(self) -> None:
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        else:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+    
+    @property
+    def address(self) -> Any:
+        """实际监听的地址：TCP 为 (host, port)，Unix socket 为路径"""
+        if self._server is None:
+            raise RuntimeError("server is not started")
+        if self.path is not None:
+            return self.path
+        return self._server.sockets[0].getsockname()[:2]
+    
+    async def close(self) -> None:
+        """停止接受连接，取消进行中的 range 并等待其发送任务结束"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self._flush_gets()
+        for stream in self._streams.values():
+            stream.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def __aenter__(self) -> 'TreeServer':
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+    
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats['connections'] += 1
+        try:
+            while True:
+                message = await _read_frame(reader)
+                if message is None:
+                    break
+                self._dispatch(writer, message)
+                # 发送缓冲未超过高水位时 drain 立即返回；读缓冲中已有的请求会在同一轮事件循环里处理完
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._flush_gets()
+            for (owner, _), stream in self._streams.items():
+                if owner is writer:
+                    stream.cancel()
+            writer.close()
+    
+    def _dispatch(self, writer: asyncio.StreamWriter, message: Tuple[Any, ...]) -> None:
+        self.stats['requests'] += 1
+        request_id, op, *args = message
+        if op == 'credit' or op == 'cancel':
+            stream = self._streams.get((writer, args[0]))
+            if stream is not None and op == 'credit':
+                stream.grant(args[1])
+            elif stream is not None:
+                stream.cancel()
+            return
+        if op == 'get':
+            self._pending.append((writer, request_id, args[0]))
+            if len(self._pending) >= self.max_batch:
+                self._flush_gets()
+            elif not self._flush_scheduled:
+                # 本轮事件循环中其余连接的读回调先执行，它们的点查会进入同一批
+                self._flush_scheduled = True
+                asyncio.get_running_loop().call_soon(self._flush_gets)
+            return
+        
+        self._flush_gets()
+        try:
+            if op == 'get_many':
+                keys = list(args[0])
+                self.stats['batches'] += 1
+                self.stats['batched_keys'] += len(keys)
+                result = self.tree.get_many(keys)
+            elif op == 'put':
+                self.tree.insert(args[0], args[1])
+                result = None
+            elif op == 'delete':
+                result = self.tree.delete(args[0])
+            elif op == 'size':
+                result = len(self.tree)
+            elif op == 'range':
+                self._start_range(writer, request_id, *args)
+                return
+            else:
+                raise ValueError(f"unknown operation {op!r}")
+        except Exception as e:
+            writer.write(_encode((request_id, ERROR, f"{type(e).__name__}: {e}")))
+            return
+        writer.write(_encode((request_id, OK, result)))
+    
+    def _flush_gets(self) -> None:
+        """执行排队的点查：合并成一次 get_many，再把结果按请求号写回各自的连接"""
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self.stats['batches'] += 1
+        self.stats['batched_keys'] += len(pending)
+        try:
+            results = [(OK, value) for value in self.tree.get_many([key for _, _, key in pending])]
+        except Exception:
+            # 某个键无法比较时整批失败，逐个执行以便只有出错的请求收到错误
+            results = []
+            for _, _, key in pending:
+                try:
+                    results.append((OK, self.tree.search(key)))
+                except Exception as e:
+                    results.append((ERROR, f"{type(e).__name__}: {e}"))
+        for (writer, request_id, _), (status, result) in zip(pending, results):
+            if not writer.is_closing():
+                writer.write(_encode((request_id, status, result)))
+    
+    def _start_range(self, writer: asyncio.StreamWriter, request_id: int, start_key: Any = None,
+                     end_key: Any = None, limit: Optional[int] = None, reverse: bool = False,
+                     window: Optional[int] = None) -> None:
+        """window 为客户端给出的初始信用，None 表示不做流量控制"""
+        items = self.tree.snapshot().iter_range(start_key, end_key, limit=limit, reverse=reverse)
+        stream = _RangeStream(window if window is not None else float('inf'))
+        self._streams[(writer, request_id)] = stream
+        task = asyncio.get_running_loop().create_task(self._stream_range(writer, request_id, items, stream))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _stream_range(self, writer: asyncio.StreamWriter, request_id: int, items: Any,
+                            stream: _RangeStream) -> None:
+        chunk_size = self.range_chunk
+        try:
+            while True:
+                # 信用用完时等待客户端消费；客户端取消或连接关闭时结束
+                while stream.credits <= 0 and not stream.cancelled:
+                    stream.wakeup.clear()
+                    await stream.wakeup.wait()
+                if stream.cancelled or writer.is_closing():
+                    return
+                stream.credits -= 1
+                chunk = []
+                for item in items:
+                    chunk.append(item)
+                    if len(chunk) == chunk_size:
+                        break
+                if len(chunk) < chunk_size:
+                    writer.write(_encode((request_id, END, chunk)))
+                    return
+                writer.write(_encode((request_id, CHUNK, chunk)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        except Exception as e:
+            if not writer.is_closing():
+                writer.write(_encode((request_id, ERROR, f"{type(e).__name__}: {e}")))
+        finally:
+            self._streams.pop((writer, request_id), None)
+
+
+class _Connection:
+    """客户端的一条连接：发送请求并按请求号把响应分发给等待者"""
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.waiters: Dict[int, Any] = {}
+        self.next_id = 0
+        self.task = asyncio.get_running_loop().create_task(self._receive())
+    
+    @property
+    def load(self) -> int:
+        return len(self.waiters)
+    
+    def send(self, op: str, *args: Any, stream: bool = False) -> Any:
+        """发送请求，返回 Future（stream=True 时返回接收分块的 Queue）"""
+        if self.task.done():
+            raise ConnectionError("connection is closed")
+        self.next_id += 1
+        waiter = asyncio.Queue() if stream else asyncio.get_running_loop().create_future()
+        self.waiters[self.next_id] = waiter
+        self.writer.write(_encode((self.next_id, op) + args))
+        return waiter
+    
+    def notify(self, op: str, *args: Any) -> None:
+        """发送没有响应的控制消息（range 的 credit / cancel）"""
+        if not self.task.done() and not self.writer.is_closing():
+            self.writer.write(_encode((0, op) + args))
+    
+    async def _receive(self) -> None:
+        error: BaseException = ConnectionError("connection closed by server")
+        try:
+            while True:
+                message = await _read_frame(self.reader)
+                if message is None:
+                    break
+                request_id, status, result = message
+                waiter = self.waiters.get(request_id)
+                if waiter is None:
+                    continue
+                if isinstance(waiter, asyncio.Queue):
+                    waiter.put_nowait((status, result))
+                    if status != CHUNK:
+                        del self.waiters[request_id]
+                    continue
+                del self.waiters[request_id]
+                if waiter.done():
+                    continue
+                if status == ERROR:
+                    waiter.set_exception(RuntimeError(f"server error: {result}"))
+                else:
+                    waiter.set_result(result)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            error = e
+        finally:
+            for waiter in self.waiters.values():
+                if isinstance(waiter, asyncio.Queue):
+                    waiter.put_nowait((ERROR, str(error)))
+                elif not waiter.done():
+                    waiter.set_exception(ConnectionError(str(error)))
+            self.waiters.clear()
+    
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+
+class TreeClient:
+    """
+    TreeServer 的异步客户端
+    
+    示例：
+        async with TreeClient(port=port, pool_size=4) as client:
+            await client.put(1, 'a')
+            values = await asyncio.gather(*(client.get(k) for k in keys))
+            async for key, value in client.range(0, 100):
+                ...
+    """
+    
+    def __init__(self, host: str = '127.0.0.1', port: Optional[int] = None, path: Optional[str] = None,
+                 pool_size: int = 4, range_window: int = RANGE_WINDOW):
+        """range_window: 每个 range 最多预取的块数，客户端缓存的结果不超过 range_window 块"""
+        if path is None and port is None:
+            raise ValueError("either port or path is required")
+        if pool_size < 1 or range_window < 1:
+            raise ValueError("pool_size and range_window must be positive")
+        self.range_window = range_window
+        self.host = host
+        self.port = port
+        self.path = path
+        self.pool_size = pool_size
+        self._pool: List[_Connection] = []
+    
+    async def connect(self) -> None:
+        """建立连接池中的全部连接"""
+        while len(self._pool) < self.pool_size:
+            if self.path is not None:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            self._pool.append(_Connection(reader, writer))
+    
+    async def close(self) -> None:
+        pool, self._pool = self._pool, []
+        for connection in pool:
+            await connection.close()
+    
+    async def __aenter__(self) -> 'TreeClient':
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+    
+    def _connection(self) -> _Connection:
+        """未完成请求最少的连接；断开的连接从池中移除"""
+        self._pool = [connection for connection in self._pool if not connection.task.done()]
+        if not self._pool:
+            raise ConnectionError("no open connections; call connect()")
+        return min(self._pool, key=lambda connection: connection.load)
+    
+    async def _call(self, op: str, *args: Any) -> Any:
+        connection = self._connection()
+        future = connection.send(op, *args)
+        try:
+            await connection.writer.drain()
+        except ConnectionError:
+            future.cancel()
+            raise
+        return await future
+    
+    async def get(self, key: Any) -> Optional[Any]:
+        return await self._call('get', key)
+    
+    async def get_many(self, keys: Iterable[Any]) -> List[Optional[Any]]:
+        return await self._call('get_many', list(keys))
+    
+    async def put(self, key: Any, value: Any) -> None:
+        """插入或更新"""
+        await self._call('put', key, value)
+    
+    async def delete(self, key: Any) -> bool:
+        return await self._call('delete', key)
+    
+    async def size(self) -> int:
+        return await self._call('size')
+    
+    async def range(self, start_key: Any = None, end_key: Any = None, limit: Optional[int] = None,
+                    reverse: bool = False) -> AsyncIterator[Tuple[Any, Any]]:
+        """
+        流式范围查询（两端包含），服务端在请求到达时的快照上扫描
+        
+        每取走一块才向服务端补充一个信用，未消费的块最多 range_window 块；
+        提前停止迭代（break 或生成器被关闭）时注销等待者并通知服务端取消。
+        """
+        connection = self._connection()
+        queue = connection.send('range', start_key, end_key, limit, reverse, self.range_window, stream=True)
+        request_id = connection.next_id
+        finished = False
+        try:
+            await connection.writer.drain()
+            while True:
+                status, result = await queue.get()
+                if status == ERROR:
+                    finished = True
+                    raise RuntimeError(f"server error: {result}")
+                if status == END:
+                    finished = True
+                else:
+                    connection.notify('credit', request_id, 1)
+                for item in result:
+                    yield item
+                if finished:
+                    return
+        finally:
+            if not finished:
+                connection.waiters.pop(request_id, None)
+                connection.notify('cancel', request_id)
+    
+    async def range_query(self, start_key: Any = None, end_key: Any = None, limit: Optional[int] = None,
+                          reverse: bool = False) -> List[Tuple[Any, Any]]:
+        return [item async for item in self.range(start_key, end_key, limit, reverse)]
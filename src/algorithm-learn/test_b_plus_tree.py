@@ -10,6 +10,46 @@ from typing import List, Tuple
 from b_plus_tree import BPlusTree
 
 
+def check_tree_invariants(tree: BPlusTree, check_counts: bool = True) -> None:
+    """
+    校验树结构：键有序、分隔键正确、父指针正确、所有叶子同层、叶子链表完整
+    
+    check_counts=False 时跳过子树计数检查（并发版本不维护计数）。
+    顺序追加时最右叶子偏右分裂，允许它少于最少键数。
+    """
+    leaves = []
+    
+    def visit(node, low, high, depth):
+        assert list(node.keys) == sorted(node.keys), f"节点键无序: {node}"
+        if tree._aggregate_specs:
+            assert node.summary == tree._summarize(node), f"子树聚合错误: {node}"
+        if node is not tree.root and not (node.is_leaf and node.next_leaf is None):
+            assert len(node.keys) >= node.min_keys(tree.order), f"节点下溢: {node}"
+        assert len(node.keys) < tree.order, f"节点溢出: {node}"
+        for key in node.keys:
+            assert (low is None or key >= low) and (high is None or key < high), f"键 {key} 越界: {node}"
+        if node.is_leaf:
+            assert depth == tree.height, f"叶子深度 {depth} 与树高 {tree.height} 不一致"
+            leaves.append(node)
+            return
+        assert len(node.children) == len(node.keys) + 1, f"子节点数量错误: {node}"
+        bounds = [low] + node.keys + [high]
+        for i, child in enumerate(node.children):
+            assert child.parent is node, f"父指针错误: {child}"
+            if check_counts:
+                assert node.counts[i] == child.subtree_size(), f"子树计数错误: {node}"
+            visit(child, bounds[i], bounds[i + 1], depth + 1)
+    
+    assert tree.root.parent is None, "根节点不应有父节点"
+    visit(tree.root, None, None, 1)
+    for left, right in zip(leaves, leaves[1:]):
+        assert left.next_leaf is right, "叶子链表断开"
+        assert right.prev_leaf is left, "叶子反向链表断开"
+    assert leaves[-1].next_leaf is None, "最后一个叶子不应有后继"
+    assert leaves[0].prev_leaf is None, "第一个叶子不应有前驱"
+    assert len(tree) == sum(len(leaf.keys) for leaf in leaves), "键数量统计错误"
+
+
 def test_basic_operations() -> None:
     """测试基本操作：插入、查找、删除"""
     print("=== 测试基本操作 ===")
@@ -167,6 +207,7 @@ def test_node_splitting() -> None:
     
     # 验证键有序
     assert tree.traverse() == list(range(1, 10)), "分裂后键顺序错误"
+    check_tree_invariants(tree)
     
     print("✅ 节点分裂测试通过！")
 
@@ -187,6 +228,7 @@ def test_random_operations() -> None:
         reference_dict[key] = value
     
     print(f"  插入后树状态: {tree}")
+    check_tree_invariants(tree)
     
     # 验证所有插入的键都存在
     for key, expected_value in reference_dict.items():
@@ -204,6 +246,7 @@ def test_random_operations() -> None:
             assert tree.search(key) is None, f"删除后键 {key} 不应存在"
     
     print(f"  删除后树状态: {tree}")
+    check_tree_invariants(tree)
     
     # 验证剩余键
     for key, expected_value in reference_dict.items():
@@ -218,6 +261,769 @@ def test_random_operations() -> None:
     print("✅ 随机操作测试通过！")
 
 
+def test_underflow_handling() -> None:
+    """测试删除时的借键、合并与根节点收缩"""
+    print("\n=== 测试下溢处理 ===")
+    
+    # 删除全部键后树高应回到 1
+    print("1. 删除全部键...")
+    for order in (3, 4, 5, 8):
+        tree = BPlusTree(order=order)
+        keys = list(range(200))
+        for key in keys:
+            tree.insert(key, key)
+        random.shuffle(keys)
+        for i, key in enumerate(keys):
+            assert tree.delete(key), f"删除键 {key} 失败"
+            if i % 17 == 0:
+                check_tree_invariants(tree)
+        assert tree.traverse() == [], "删除全部键后树应为空"
+        assert tree.height == 1, f"order={order} 删除全部键后树高应为 1，实际 {tree.height}"
+    
+    # 滑动窗口：一边插入新键一边删除旧键，树高和叶子数保持稳定
+    print("2. 滑动窗口负载...")
+    tree = BPlusTree(order=4)
+    window = 100
+    for key in range(window):
+        tree.insert(key, key)
+    for key in range(window, 3000):
+        tree.insert(key, key)
+        assert tree.delete(key - window), f"删除键 {key - window} 失败"
+    check_tree_invariants(tree)
+    assert tree.traverse() == list(range(3000 - window, 3000)), "滑动窗口后键错误"
+    assert tree.height <= 5, f"滑动窗口后树高异常: {tree.height}"
+    
+    # 随机插删与字典对照
+    print("3. 随机插删对照...")
+    tree = BPlusTree(order=5)
+    reference = {}
+    for step in range(3000):
+        key = random.randint(0, 300)
+        if random.random() < 0.5:
+            tree.insert(key, step)
+            reference[key] = step
+        else:
+            assert tree.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+            reference.pop(key, None)
+    check_tree_invariants(tree)
+    assert tree.traverse() == sorted(reference), "随机插删后键错误"
+    for key, value in reference.items():
+        assert tree.search(key) == value, f"键 {key} 值错误"
+    
+    print("✅ 下溢处理测试通过！")
+
+
+def test_iteration() -> None:
+    """测试惰性范围迭代与游标"""
+    print("\n=== 测试范围迭代与游标 ===")
+    
+    tree = BPlusTree(order=4)
+    keys = list(range(0, 200, 2))
+    random.shuffle(keys)
+    for key in keys:
+        tree.insert(key, f"value_{key}")
+    keys.sort()
+    
+    # iter_range 与暴力过滤对照
+    print("1. iter_range 对照...")
+    bounds = [None, -5, 0, 1, 50, 51, 120, 198, 199, 300]
+    for start in bounds:
+        for end in bounds:
+            for inclusive in ((True, True), (False, True), (True, False), (False, False)):
+                expected = [k for k in keys
+                            if (start is None or (k >= start if inclusive[0] else k > start))
+                            and (end is None or (k <= end if inclusive[1] else k < end))]
+                for reverse in (False, True):
+                    want = expected[::-1] if reverse else expected
+                    for limit in (None, 0, 1, 7):
+                        got = [k for k, _ in tree.iter_range(start, end, inclusive, limit, reverse)]
+                        assert got == (want if limit is None else want[:limit]), \
+                            f"iter_range({start}, {end}, {inclusive}, {limit}, {reverse}) 错误: {got}"
+    
+    assert list(tree.keys()) == keys, "keys() 错误"
+    assert list(tree.values(reverse=True)) == [f"value_{k}" for k in reversed(keys)], "values() 错误"
+    assert list(tree.items())[:2] == [(0, "value_0"), (2, "value_2")], "items() 错误"
+    assert list(tree) == keys, "__iter__ 错误"
+    
+    # 游标分页
+    print("2. 游标分页...")
+    cursor = tree.cursor()
+    assert not cursor.valid, "新游标不应有效"
+    assert cursor.seek(51), "seek 失败"
+    assert cursor.key == 52, f"seek(51) 应停在 52，实际 {cursor.key}"
+    pages = []
+    while cursor.valid:
+        pages.append([k for k, _ in cursor.fetch(10)])
+    assert [k for page in pages for k in page] == keys[26:], "分页结果错误"
+    assert all(len(page) == 10 for page in pages[:-1]), "分页大小错误"
+    
+    # 游标前后移动
+    print("3. 游标前后移动...")
+    assert cursor.seek_last() and cursor.key == 198, "seek_last 错误"
+    backward = []
+    while cursor.valid:
+        backward.append(cursor.key)
+        cursor.prev()
+    assert backward == keys[::-1], "逆序移动错误"
+    assert cursor.seek(100, inclusive=False) and cursor.key == 102, "seek 排除边界错误"
+    assert cursor.prev() and cursor.key == 100, "prev 错误"
+    assert not cursor.seek(1000), "越界 seek 应失败"
+    assert not BPlusTree().cursor().seek_first(), "空树游标应无效"
+    
+    print("✅ 范围迭代与游标测试通过！")
+
+
+def test_order_statistics() -> None:
+    """测试 O(1) 计数与 rank/select/percentile"""
+    print("\n=== 测试顺序统计 ===")
+    
+    tree = BPlusTree(order=4)
+    assert len(tree) == 0, "空树长度应为 0"
+    reference = set()
+    for _ in range(2000):
+        key = random.randint(0, 500)
+        if random.random() < 0.6:
+            tree.insert(key, -key)
+            reference.add(key)
+        else:
+            tree.delete(key)
+            reference.discard(key)
+    check_tree_invariants(tree)
+    
+    # 与排序列表对照
+    print("1. rank/select 对照...")
+    keys = sorted(reference)
+    assert len(tree) == len(keys), f"长度错误: {len(tree)} != {len(keys)}"
+    for i, key in enumerate(keys):
+        assert tree.select(i) == (key, -key), f"select({i}) 错误"
+        assert tree.rank(key) == i, f"rank({key}) 错误"
+        assert tree.rank(key, inclusive=True) == i + 1, f"rank({key}, inclusive) 错误"
+    assert tree.select(-1)[0] == keys[-1], "负数下标错误"
+    for bad in (len(keys), -len(keys) - 1):
+        try:
+            tree.select(bad)
+            assert False, f"select({bad}) 应抛出 IndexError"
+        except IndexError:
+            pass
+    
+    print("2. count_range 对照...")
+    for _ in range(200):
+        lo, hi = random.randint(-10, 510), random.randint(-10, 510)
+        expected = sum(1 for k in keys if lo <= k <= hi)
+        assert tree.count_range(lo, hi) == expected, f"count_range({lo}, {hi}) 错误"
+    
+    print("3. 百分位...")
+    samples = BPlusTree.bulk_load(((i, None) for i in range(1, 101)), order=8)
+    assert samples.percentile(50) == 50, "p50 错误"
+    assert samples.percentile(99) == 99, "p99 错误"
+    assert samples.percentile(0) == 1 and samples.percentile(100) == 100, "边界百分位错误"
+    assert len(samples) == 100, "批量构建后长度错误"
+    
+    # 覆盖写入不改变长度
+    samples.insert(50, "again")
+    assert len(samples) == 100, "覆盖写入不应改变长度"
+    
+    print("✅ 顺序统计测试通过！")
+
+
+def test_batch_operations() -> None:
+    """测试批量 get_many / put_many / delete_many"""
+    print("\n=== 测试批量操作 ===")
+    
+    import time
+    
+    for order in (3, 4, 7, 64):
+        tree = BPlusTree(order=order)
+        reference = {}
+        for _ in range(30):
+            batch = [(random.randint(0, 2000), random.random()) for _ in range(random.randint(0, 300))]
+            expected_added = len({k for k, _ in batch} - reference.keys())
+            assert tree.put_many(batch) == expected_added, "put_many 返回的新增数量错误"
+            reference.update(batch)
+            
+            doomed = random.sample(range(2000), random.randint(0, 200))
+            expected_deleted = len(set(doomed) & reference.keys())
+            assert tree.delete_many(doomed) == expected_deleted, "delete_many 返回的删除数量错误"
+            for key in doomed:
+                reference.pop(key, None)
+            check_tree_invariants(tree)
+        
+        probe = [random.randint(-10, 2010) for _ in range(500)]
+        assert tree.get_many(probe) == [reference.get(k) for k in probe], f"order={order} get_many 错误"
+        assert tree.traverse() == sorted(reference), f"order={order} 批量操作后键错误"
+    
+    # 大批量写入空树与逐个插入结果一致
+    tree = BPlusTree(order=5)
+    assert tree.put_many((i, i) for i in range(1000)) == 1000, "大批量写入数量错误"
+    check_tree_invariants(tree)
+    assert tree.delete_many(range(0, 1000, 3)) == 334, "批量删除数量错误"
+    check_tree_invariants(tree)
+    assert tree.delete_many(range(1000)) == 666 and len(tree) == 0, "批量删除全部键失败"
+    check_tree_invariants(tree)
+    
+    # 批次中有键无法转换时抛出异常，已写入的叶子内容与键数量统计保持一致
+    for batch in ([(5, 'a'), (2 ** 70, 'b')], [(k, 'a') for k in range(1, 600, 10)] + [(2 ** 70, 'b')]):
+        tree = BPlusTree.from_sorted(((i * 10, i) for i in range(60)), order=64, key_type='int64')
+        try:
+            tree.put_many(batch)
+            assert False, "int64 树写入越界键应抛出异常"
+        except ValueError:
+            pass
+        check_tree_invariants(tree)
+        assert len(tree) == len(list(tree.items())) == 60, "失败的批量写入不应改变键数量"
+    
+    # 与逐个操作的吞吐量对比
+    base = BPlusTree.from_sorted(((i, i) for i in range(0, 200000, 2)), order=64)
+    keys = sorted(random.sample(range(200000), 5000))
+    start_time = time.perf_counter()
+    single = [base.search(k) for k in keys]
+    single_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    batched = base.get_many(keys)
+    batch_time = time.perf_counter() - start_time
+    assert single == batched, "get_many 与逐个 search 结果不一致"
+    print(f"  5000 个键: 逐个查找 {single_time * 1000:.1f} 毫秒, get_many {batch_time * 1000:.1f} 毫秒")
+    
+    print("✅ 批量操作测试通过！")
+
+
+def test_snapshots() -> None:
+    """测试写时复制快照：快照内容固定不变，树照常修改，快照释放后旧版本被回收"""
+    print("\n=== 测试快照 ===")
+    
+    import gc
+    import threading
+    
+    print("1. 随机修改中穿插快照...")
+    for order in (3, 4, 8):
+        tree = BPlusTree(order=order)
+        reference = {}
+        snapshots = []
+        for step in range(3000):
+            key = random.randint(0, 500)
+            action = random.random()
+            if action < 0.5:
+                tree.insert(key, step)
+                reference[key] = step
+            elif action < 0.9:
+                assert tree.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+                reference.pop(key, None)
+            elif action < 0.95:
+                batch = [(random.randint(0, 500), step) for _ in range(20)]
+                tree.put_many(batch)
+                reference.update(batch)
+            else:
+                doomed = random.sample(range(500), 20)
+                tree.delete_many(doomed)
+                for k in doomed:
+                    reference.pop(k, None)
+            if step % 300 == 0:
+                snapshots.append((tree.snapshot(), sorted(reference.items())))
+        check_tree_invariants(tree)
+        assert list(tree.items()) == sorted(reference.items()), f"order={order} 树内容错误"
+        
+        for snap, expected in snapshots:
+            assert list(snap.items()) == expected, f"order={order} 快照内容被修改"
+            assert list(snap.items(reverse=True)) == expected[::-1], f"order={order} 快照逆序错误"
+            assert len(snap) == len(expected), "快照大小错误"
+            for _ in range(20):
+                lo, hi = sorted(random.sample(range(-5, 505), 2))
+                window = [(k, v) for k, v in expected if lo < k <= hi]
+                assert list(snap.iter_range(lo, hi, (False, True))) == window, f"快照范围 ({lo}, {hi}] 错误"
+                assert list(snap.iter_range(lo, hi, (False, True), limit=3, reverse=True)) == window[::-1][:3], "快照逆序 limit 错误"
+            probe = random.randint(0, 500)
+            assert snap.search(probe) == dict(expected).get(probe), f"快照查找 {probe} 错误"
+    
+    print("2. 快照释放后不再复制...")
+    tree = BPlusTree.from_sorted(((i, i) for i in range(1000)), order=8)
+    snap = tree.snapshot()
+    old_root = tree.root
+    tree.insert(1000, 1000)
+    assert tree.root is not old_root and snap.root is old_root, "存在快照时应复制路径"
+    del snap
+    gc.collect()
+    assert len(tree._snapshots) == 0, "快照释放后应被回收"
+    root = tree.root
+    tree.insert(1001, 1001)
+    assert tree.root is root, "没有快照时应原地修改"
+    check_tree_invariants(tree)
+    
+    print("3. 快照扫描与写入并发...")
+    snap = tree.snapshot()
+    expected = list(tree.items())
+    results = []
+    scanner = threading.Thread(target=lambda: results.extend(list(snap.items()) == expected for _ in range(20)))
+    scanner.start()
+    for i in range(2000):
+        tree.insert(random.randint(-1000, 3000), i)
+        tree.delete(random.randint(-1000, 3000))
+    scanner.join()
+    assert all(results), "写入过程中快照扫描结果变化"
+    check_tree_invariants(tree)
+    
+    print("✅ 快照测试通过！")
+
+
+def test_typed_keys() -> None:
+    """测试类型化键模式：叶子键存放在 array 中，行为与普通模式一致"""
+    print("\n=== 测试类型化键 ===")
+    
+    import tracemalloc
+    from array import array
+    
+    print("1. 随机操作与字典对照...")
+    for key_type, make_key in (("int64", lambda: random.randint(-10**12, 10**12)),
+                               ("float64", lambda: random.uniform(-1, 1))):
+        tree = BPlusTree(order=6, key_type=key_type)
+        reference = {}
+        keys = [make_key() for _ in range(600)]
+        for step in range(4000):
+            key = random.choice(keys)
+            action = random.random()
+            if action < 0.55:
+                tree.insert(key, step)
+                reference[key] = step
+            elif action < 0.9:
+                assert tree.delete(key) == (key in reference), f"{key_type} 删除键 {key} 返回值错误"
+                reference.pop(key, None)
+            elif action < 0.95:
+                batch = [(random.choice(keys), step) for _ in range(30)]
+                tree.put_many(batch)
+                reference.update(batch)
+            else:
+                doomed = random.sample(keys, 30)
+                tree.delete_many(doomed)
+                for k in doomed:
+                    reference.pop(k, None)
+        check_tree_invariants(tree)
+        assert isinstance(tree._first_leaf().keys, array), "叶子键应为 array"
+        assert list(tree.items()) == sorted(reference.items()), f"{key_type} 内容错误"
+        ordered = sorted(reference)
+        lo, hi = ordered[len(ordered) // 4], ordered[len(ordered) // 2]
+        result = tree.range_keys(lo, hi)
+        assert isinstance(result, array) and list(result) == [k for k in ordered if lo <= k <= hi], "range_keys 错误"
+    
+    print("2. 键类型检查...")
+    tree = BPlusTree(order=4, key_type="int64")
+    try:
+        tree.insert("not a number", 1)
+        assert False, "int64 树插入字符串应抛出 TypeError"
+    except TypeError:
+        pass
+    try:
+        BPlusTree(key_type="decimal")
+        assert False, "不支持的键类型应抛出 ValueError"
+    except ValueError:
+        pass
+    
+    # 超出取值范围的键：各条写入路径都抛出 ValueError，树保持不变
+    from concurrent_b_plus_tree import ConcurrentBPlusTree
+    for key_type, bad_key in (("uint32", -1), ("uint32", 2 ** 32), ("int64", 2 ** 63), ("int32", -2 ** 31 - 1)):
+        for cls in (BPlusTree, ConcurrentBPlusTree):
+            tree = cls.from_sorted(((i, i) for i in range(1, 40)), order=8, key_type=key_type)
+            # ConcurrentBPlusTree 的 put_many 逐个插入，不保证整批原子，只写入越界键
+            batch = [(5, 'a'), (bad_key, 'b')] if cls is BPlusTree else [(bad_key, 'b')]
+            writes = [lambda: tree.insert(bad_key, 0), lambda: tree.put_many(batch),
+                      lambda: cls.from_sorted([(1, 1), (bad_key, 2)] if bad_key > 0 else [(bad_key, 1), (1, 2)],
+                                              order=8, key_type=key_type)]
+            for write in writes:
+                try:
+                    write()
+                    assert False, f"{key_type} 写入越界键 {bad_key} 应抛出 ValueError"
+                except ValueError:
+                    pass
+            check_tree_invariants(tree if cls is BPlusTree else tree.tree, check_counts=cls is BPlusTree)
+            assert list(tree.items()) == [(i, i) for i in range(1, 40)] and len(tree) == 39, \
+                f"{key_type} 越界写入失败后内容不应改变"
+            tree.insert(100, 100)
+            assert tree.search(100) == 100 and tree.search(bad_key) is None, "越界写入失败后树应继续可用"
+    
+    print("3. 内存占用对比...")
+    n = 200000
+    sizes = {}
+    for key_type in (None, "int64"):
+        tracemalloc.start()
+        tree = BPlusTree.from_sorted(((10**12 + i, None) for i in range(n)), order=64, key_type=key_type)
+        sizes[key_type] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert tree.range_keys(10**12, 10**12 + 4) == (array("q", range(10**12, 10**12 + 5)) if key_type else list(range(10**12, 10**12 + 5)))
+        del tree
+    print(f"  {n} 个键: list 叶子 {sizes[None] / 2**20:.1f} MB, int64 叶子 {sizes['int64'] / 2**20:.1f} MB")
+    assert sizes["int64"] < sizes[None], "int64 叶子应更省内存"
+    
+    print("✅ 类型化键测试通过！")
+
+
+def test_sequential_inserts() -> None:
+    """测试顺序追加的快速路径与偏右分裂"""
+    print("\n=== 测试顺序追加 ===")
+    
+    import time
+    
+    def leaf_fill(tree: BPlusTree) -> float:
+        leaves = []
+        leaf = tree._first_leaf()
+        while leaf is not None:
+            leaves.append(len(leaf.keys))
+            leaf = leaf.next_leaf
+        return sum(leaves) / (len(leaves) * (tree.order - 1))
+    
+    print("1. 追加写入的叶子填充率...")
+    n = 20000
+    appended = BPlusTree(order=32)
+    start_time = time.perf_counter()
+    for i in range(n):
+        appended.insert(i, i)
+    append_time = time.perf_counter() - start_time
+    check_tree_invariants(appended)
+    
+    shuffled = BPlusTree(order=32)
+    keys = list(range(n))
+    random.shuffle(keys)
+    start_time = time.perf_counter()
+    for key in keys:
+        shuffled.insert(key, key)
+    random_time = time.perf_counter() - start_time
+    print(f"  顺序追加 {append_time * 1000:.1f} 毫秒, 填充率 {leaf_fill(appended):.0%}; "
+          f"随机插入 {random_time * 1000:.1f} 毫秒, 填充率 {leaf_fill(shuffled):.0%}")
+    assert leaf_fill(appended) > 0.85, "顺序追加的叶子应接近装满"
+    assert list(appended.items()) == list(shuffled.items()), "两种插入顺序的结果应相同"
+    
+    print("2. 追加与随机修改交替...")
+    for order in (3, 4, 7):
+        tree = BPlusTree(order=order)
+        reference = {}
+        next_key = 0
+        for step in range(3000):
+            action = random.random()
+            if action < 0.6:
+                next_key += random.randint(1, 3)
+                tree.insert(next_key, step)
+                reference[next_key] = step
+            elif action < 0.8:
+                key = random.randint(0, next_key + 1)
+                tree.insert(key, step)
+                reference[key] = step
+            elif action < 0.95:
+                key = random.randint(0, next_key)
+                assert tree.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+                reference.pop(key, None)
+            else:
+                doomed = random.sample(range(next_key + 1), min(10, next_key + 1))
+                tree.delete_many(doomed)
+                for key in doomed:
+                    reference.pop(key, None)
+            if step % 500 == 0:
+                check_tree_invariants(tree)
+        check_tree_invariants(tree)
+        assert list(tree.items()) == sorted(reference.items()), f"order={order} 交替操作后内容错误"
+        assert all(tree.select(i)[0] == k for i, k in enumerate(sorted(reference)[:50])), "追加后子树计数错误"
+    
+    print("✅ 顺序追加测试通过！")
+
+
+def test_aggregates() -> None:
+    """测试子树聚合与区间聚合查询"""
+    print("\n=== 测试区间聚合 ===")
+    
+    import time
+    from b_plus_tree import Aggregate
+    
+    def expected(reference, lo, hi):
+        window = [v for k, v in sorted(reference.items()) if (lo is None or k >= lo) and (hi is None or k <= hi)]
+        return {"sum": sum(window), "count": len(window),
+                "min": min(window, default=None), "max": max(window, default=None)}
+    
+    print("1. 随机修改后与逐项计算对照...")
+    for order in (3, 4, 9):
+        tree = BPlusTree(order=order, aggregates=["sum", "count", "min", "max"])
+        reference = {}
+        for step in range(3000):
+            key = random.randint(0, 600)
+            action = random.random()
+            if action < 0.5:
+                value = random.randint(-100, 100)
+                tree.insert(key, value)
+                reference[key] = value
+            elif action < 0.85:
+                tree.delete(key)
+                reference.pop(key, None)
+            elif action < 0.9:
+                key = max(reference, default=0) + 1
+                tree.insert(key, step)
+                reference[key] = step
+            elif action < 0.95:
+                batch = [(random.randint(0, 600), random.randint(-100, 100)) for _ in range(20)]
+                tree.put_many(batch)
+                reference.update(batch)
+            else:
+                doomed = random.sample(range(600), 20)
+                tree.delete_many(doomed)
+                for k in doomed:
+                    reference.pop(k, None)
+            if step % 300 == 0:
+                snap = tree.snapshot()  # 快照触发写时复制，聚合随副本一起维护
+        check_tree_invariants(tree)
+        del snap
+        for _ in range(100):
+            lo, hi = sorted(random.sample(range(-10, 2000), 2))
+            bounds = random.choice([(lo, hi), (None, hi), (lo, None), (None, None)])
+            for name, value in expected(reference, *bounds).items():
+                assert tree.aggregate(*bounds, name) == value, f"order={order} {name}{bounds} 错误"
+        assert tree.aggregate(10, 5, "sum") == 0 and tree.aggregate(10, 5, "max") is None, "空区间应返回单位元"
+    
+    print("2. 自定义聚合与批量构建...")
+    first_key = Aggregate(None, lambda a, b: b if a is None else a, lambda key, value: key)
+    tree = BPlusTree.bulk_load(((i, i * i) for i in range(1000)), order=16,
+                               aggregates={"sum": Aggregate(0, lambda a, b: a + b, lambda k, v: v), "first": first_key})
+    check_tree_invariants(tree)
+    assert tree.aggregate(100, 199, "sum") == sum(i * i for i in range(100, 200)), "批量构建后区间求和错误"
+    assert tree.aggregate(250.5, None, "first") == 251, "自定义聚合错误"
+    try:
+        tree.aggregate(0, 1, "max")
+        assert False, "未启用的聚合应抛出 ValueError"
+    except ValueError:
+        pass
+    
+    print("3. 长区间求和耗时...")
+    tree = BPlusTree.from_sorted(((i, i) for i in range(200000)), order=64, aggregates=["sum"])
+    windows = [random.randint(0, 100000) for _ in range(1000)]
+    start_time = time.perf_counter()
+    totals = [tree.aggregate(lo, lo + 99999) for lo in windows]
+    aggregate_time = time.perf_counter() - start_time
+    assert totals == [(2 * lo + 99999) * 100000 // 2 for lo in windows], "长区间求和错误"
+    start_time = time.perf_counter()
+    for _ in range(10):
+        lo = random.randint(0, 100000)
+        sum(v for _, v in tree.range_query(lo, lo + 99999))
+    scan_time = (time.perf_counter() - start_time) * 100
+    print(f"  1000 次 10 万键区间求和: aggregate {aggregate_time * 1000:.1f} 毫秒, 扫描估计 {scan_time * 1000:.0f} 毫秒")
+    
+    print("✅ 区间聚合测试通过！")
+
+
+def test_range_split_concat() -> None:
+    """测试结构化的区间删除、按键拆分与拼接"""
+    print("\n=== 测试区间删除、拆分与拼接 ===")
+    
+    import time
+    
+    print("1. 随机区间删除与参照字典对照...")
+    for order in (3, 4, 7):
+        for options in ({}, {"key_type": "int64"}, {"aggregates": ["sum", "count"]}):
+            tree = BPlusTree(order=order, **options)
+            reference = {}
+            for step in range(400):
+                key = random.randint(0, 3000)
+                tree.insert(key, step)
+                reference[key] = step
+                if step % 40 == 39:
+                    lo, hi = sorted(random.sample(range(-10, 3010), 2))
+                    bounds = random.choice([(lo, hi), (None, hi), (lo, None), (lo, lo)])
+                    snap = tree.snapshot()
+                    before = list(snap.items())
+                    doomed = [k for k in reference if (bounds[0] is None or k >= bounds[0]) and (bounds[1] is None or k <= bounds[1])]
+                    assert tree.delete_range(*bounds) == len(doomed), f"order={order} {bounds} 删除数量错误"
+                    for k in doomed:
+                        del reference[k]
+                    check_tree_invariants(tree)
+                    assert list(tree.items()) == sorted(reference.items()), f"order={order} {bounds} 删除后内容错误"
+                    assert list(snap.items()) == before, "区间删除不应影响已有快照"
+                    if "aggregates" in options:
+                        assert tree.aggregate(None, None, "sum") == sum(reference.values()), "删除后聚合错误"
+            assert tree.delete_range(5, 1) == 0, "空区间应删除 0 个键"
+    
+    print("2. 拆分后再拼接...")
+    for order in (3, 4, 7):
+        for _ in range(30):
+            keys = random.sample(range(2000), random.randint(0, 300))
+            tree = BPlusTree(order=order, aggregates=["count"])
+            for k in keys:
+                tree.insert(k, -k)
+            pivot = random.randint(-5, 2005)
+            right = tree.split_at(pivot)
+            check_tree_invariants(tree)
+            check_tree_invariants(right)
+            assert tree.traverse() == sorted(k for k in keys if k < pivot), f"order={order} 拆分左半错误"
+            assert right.traverse() == sorted(k for k in keys if k >= pivot), f"order={order} 拆分右半错误"
+            assert tree.aggregate(None, None, "count") == len(tree), "拆分后聚合错误"
+            tree.concat(right)
+            check_tree_invariants(tree)
+            assert tree.traverse() == sorted(keys) and len(right) == 0, "拼接后内容错误"
+    
+    print("3. 高度不同的树拼接...")
+    small = BPlusTree.bulk_load(((i, i) for i in range(5)), order=4)
+    big = BPlusTree.bulk_load(((i, i) for i in range(10, 5000)), order=4)
+    small.concat(big)
+    check_tree_invariants(small)
+    assert small.traverse() == list(range(5)) + list(range(10, 5000)), "矮树接高树错误"
+    big = BPlusTree.bulk_load(((i, i) for i in range(5000)), order=4)
+    big.concat(BPlusTree.bulk_load([(6000, 0)], order=4))
+    check_tree_invariants(big)
+    assert big.select(len(big) - 1) == (6000, 0), "高树接矮树错误"
+    for other in (BPlusTree.bulk_load([(100, 0)], order=4), BPlusTree(order=5), big):
+        try:
+            big.concat(other)
+            assert False, "键区间重叠、阶数不同或拼接自身应抛出 ValueError"
+        except ValueError:
+            pass
+    
+    print("4. 大区间删除耗时...")
+    tree = BPlusTree.from_sorted(((i, i) for i in range(200000)), order=64)
+    start_time = time.perf_counter()
+    removed = tree.delete_range(1000, 198999)
+    range_time = time.perf_counter() - start_time
+    check_tree_invariants(tree)
+    assert removed == 198000 and len(tree) == 2000, "大区间删除数量错误"
+    print(f"  删除 19.8 万个键: {range_time * 1000:.2f} 毫秒")
+    
+    print("✅ 区间删除、拆分与拼接测试通过！")
+
+
+def test_dump_load() -> None:
+    """测试二进制 dump/load 的往返、快照导出与坏文件"""
+    print("\n=== 测试二进制导出与加载 ===")
+    
+    import os
+    import pickle
+    import tempfile
+    import time
+    from b_plus_tree import _iter_leaves
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "index.bpt")
+        
+        print("1. 随机增删后往返，叶子划分保持不变...")
+        for options in ({}, {"key_type": "int64"}, {"key_type": "float64"}):
+            for order in (3, 8):
+                tree = BPlusTree(order=order, **options)
+                reference = {}
+                for step in range(3000):
+                    key = random.randint(0, 1500)
+                    if options.get("key_type") == "float64":
+                        key /= 4
+                    if random.random() < 0.7:
+                        tree.insert(key, (step, str(key)))
+                        reference[key] = (step, str(key))
+                    else:
+                        tree.delete(key)
+                        reference.pop(key, None)
+                tree.dump(path, chunk_keys=100)
+                loaded = BPlusTree.load(path)
+                check_tree_invariants(loaded)
+                assert loaded.key_type == tree.key_type and loaded.order == order, "加载后元数据错误"
+                assert list(loaded.items()) == sorted(reference.items()), f"{options} order={order} 加载后内容错误"
+                leaf_sizes = lambda t: [len(leaf.keys) for leaf in _iter_leaves(t.root)]
+                assert leaf_sizes(loaded) == leaf_sizes(tree), "加载后叶子划分应与导出时相同"
+                loaded.insert(-1, "new")
+                check_tree_invariants(loaded)
+        
+        print("2. 空树、非默认值、加载时指定聚合...")
+        BPlusTree(order=5).dump(path)
+        assert len(BPlusTree.load(path)) == 0, "空树往返错误"
+        tree = BPlusTree.bulk_load(((("k", i), {"v": i}) for i in range(1000)), order=16)
+        tree.dump(path)
+        assert list(BPlusTree.load(path).items()) == list(tree.items()), "元组键往返错误"
+        tree = BPlusTree.from_sorted(((i, i) for i in range(1000)), order=16, key_type="int64")
+        tree.dump(path)
+        loaded = BPlusTree.load(path, aggregates=["sum"])
+        check_tree_invariants(loaded)
+        assert loaded.aggregate(10, 19, "sum") == sum(range(10, 20)), "加载时指定的聚合错误"
+        
+        print("3. 快照导出不受之后写入影响...")
+        snap = tree.snapshot()
+        for i in range(0, 1000, 3):
+            tree.delete(i)
+        snap.dump(path)
+        assert BPlusTree.load(path).traverse() == list(range(1000)), "快照导出内容错误"
+        
+        print("4. 坏文件...")
+        for content in (b"", b"not a dump" * 10):
+            with open(path, "wb") as f:
+                f.write(content)
+            try:
+                BPlusTree.load(path)
+                assert False, "非 dump 文件应抛出 ValueError"
+            except ValueError:
+                pass
+        
+        print("5. 与 pickle 整树对比...")
+        tree = BPlusTree.from_sorted(((i, i * 2) for i in range(200000)), order=64, key_type="int64")
+        start_time = time.perf_counter()
+        tree.dump(path)
+        dump_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        loaded = BPlusTree.load(path)
+        load_time = time.perf_counter() - start_time
+        assert len(loaded) == 200000 and loaded.search(123456) == 246912, "大树往返错误"
+        print(f"  20 万键: dump {dump_time * 1000:.0f} 毫秒, load {load_time * 1000:.0f} 毫秒, "
+              f"文件 {os.path.getsize(path) // 1024} KB")
+        plain = BPlusTree.from_sorted(((i, i * 2) for i in range(200000)), order=64)
+        try:
+            start_time = time.perf_counter()
+            blob = pickle.dumps(plain, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.loads(blob)
+            print(f"  普通键整树 pickle 往返 {(time.perf_counter() - start_time) * 1000:.0f} 毫秒, {len(blob) // 1024} KB")
+        except RecursionError:
+            print("  普通键整树 pickle 沿叶子链表递归过深，失败")
+    
+    print("✅ 二进制导出与加载测试通过！")
+
+
+def test_bulk_load() -> None:
+    """测试批量构建"""
+    print("\n=== 测试批量构建 ===")
+    
+    # 有序输入
+    print("1. 有序输入构建...")
+    for order in (3, 4, 5, 100):
+        for n in (0, 1, 2, 7, 50, 1000):
+            data = [(i, f"value_{i}") for i in range(n)]
+            tree = BPlusTree.from_sorted(data, order=order)
+            check_tree_invariants(tree)
+            assert tree.traverse() == list(range(n)), f"order={order}, n={n} 构建后键错误"
+            for key, value in data:
+                assert tree.search(key) == value, f"键 {key} 查找失败"
+    
+    # 无序输入 + 外部归并，重复键保留最后的值
+    print("2. 无序输入与外部归并...")
+    keys = list(range(500)) * 2
+    random.shuffle(keys)
+    data = [(key, f"{key}_{i}") for i, key in enumerate(keys)]
+    expected = dict(data)
+    for run_size in (None, 1, 64, 10000):
+        tree = BPlusTree.bulk_load(data, order=5, run_size=run_size)
+        check_tree_invariants(tree)
+        assert tree.traverse() == sorted(expected), f"run_size={run_size} 键错误"
+        for key, value in expected.items():
+            assert tree.search(key) == value, f"run_size={run_size} 键 {key} 应为最后写入的值"
+    
+    # 填充率影响叶子数量，构建后仍可正常插入
+    print("3. 填充率...")
+    full = BPlusTree.from_sorted(((i, i) for i in range(1000)), order=10)
+    half = BPlusTree.from_sorted(((i, i) for i in range(1000)), order=10, fill_factor=0.5)
+    assert full.height <= half.height, "满填充的树不应更高"
+    for i in range(1000, 1200):
+        half.insert(i, i)
+        full.insert(-i, -i)
+    check_tree_invariants(half)
+    check_tree_invariants(full)
+    assert half.traverse() == list(range(1200)), "构建后插入错误"
+    
+    # 非法参数
+    print("4. 非法参数...")
+    for bad in (lambda: BPlusTree.from_sorted([(2, "a"), (1, "b")]),
+                lambda: BPlusTree.from_sorted([], fill_factor=0),
+                lambda: BPlusTree.bulk_load([], run_size=0)):
+        try:
+            bad()
+            assert False, "应抛出 ValueError"
+        except ValueError:
+            pass
+    
+    print("✅ 批量构建测试通过！")
+
+
 def test_performance() -> None:
     """测试性能"""
     print("\n=== 测试性能 ===")
@@ -266,6 +1072,27 @@ def test_performance() -> None:
     print("✅ 性能测试完成！")
 
 
+def test_lookup_throughput() -> None:
+    """不同阶数下的点查询吞吐量（节点内二分查找）"""
+    print("\n=== 测试点查询吞吐量 ===")
+    
+    import time
+    
+    num_elements = 20000
+    keys = list(range(num_elements))
+    random.shuffle(keys)
+    
+    for order in (4, 64, 256, 1024):
+        tree = BPlusTree.from_sorted(((i, i) for i in range(num_elements)), order=order)
+        start_time = time.perf_counter()
+        for key in keys:
+            assert tree.search(key) == key, f"搜索失败: {key}"
+        elapsed = time.perf_counter() - start_time
+        print(f"  order={order:<5} 树高={tree.height}  {num_elements / elapsed:,.0f} 次查询/秒")
+    
+    print("✅ 点查询吞吐量测试完成！")
+
+
 def main() -> None:
     """运行所有测试"""
     print("开始B+树测试...\n")
@@ -276,7 +1103,19 @@ def main() -> None:
         test_edge_cases()
         test_node_splitting()
         test_random_operations()
+        test_underflow_handling()
+        test_iteration()
+        test_order_statistics()
+        test_batch_operations()
+        test_snapshots()
+        test_typed_keys()
+        test_sequential_inserts()
+        test_aggregates()
+        test_range_split_concat()
+        test_dump_load()
+        test_bulk_load()
         test_performance()
+        test_lookup_throughput()
         
         print("\n" + "="*50)
         print("🎉 所有测试通过！")
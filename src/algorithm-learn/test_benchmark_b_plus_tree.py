@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+B+树基准测试的测试文件
+用很小的配置跑通全部负载，检查请求分布、各结构执行后的内容一致、结果格式和回归对比
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from benchmark_b_plus_tree import (INSERT, READ, SCAN, STRUCTURES, WORKLOADS, ZipfianGenerator, compare,
+                                   generate_operations, main as benchmark_main, run_operations, run_suite)
+
+
+def test_operation_generation() -> None:
+    """测试负载比例与请求分布"""
+    print("=== 测试操作序列生成 ===")
+    
+    print("1. 负载比例...")
+    for workload, mix in WORKLOADS.items():
+        ops = generate_operations(workload, 'uniform', 1000, 5000, seed=1)
+        counts = Counter(op for op, _, _ in ops)
+        for op, share in enumerate(mix):
+            assert abs(counts[op] / len(ops) - share) < 0.03, f"负载 {workload} 的操作 {op} 比例错误"
+    assert generate_operations('A', 'zipfian', 1000, 100, seed=3) == generate_operations('A', 'zipfian', 1000, 100, seed=3), \
+        "同一种子应生成相同序列"
+    
+    print("2. 分布...")
+    zipf = ZipfianGenerator(1000)
+    ranks = Counter(zipf.next() for _ in range(20000))
+    assert ranks[0] > ranks[10] > ranks[500], "zipfian 名次越小应越热"
+    assert sum(count for _, count in ranks.most_common(10)) > 20000 * 0.3, "zipfian 前 10 名应占约四成请求"
+    keys = Counter(key for op, key, _ in generate_operations('C', 'zipfian', 1000, 20000, seed=2))
+    hottest = [key for key, _ in keys.most_common(5)]
+    assert sum(keys[key] for key in hottest) > 20000 * 0.1, "zipfian 请求应集中在少数键上"
+    assert max(hottest) - min(hottest) > 200, "scrambled zipfian 的热点应分散在键空间中"
+    sequential = [key for _, key, _ in generate_operations('C', 'sequential', 100, 250)]
+    assert sequential[:100] == list(range(0, 200, 2)) and sequential[100] == 0, "sequential 应按键序循环"
+    latest = generate_operations('D', 'uniform', 1000, 5000, seed=4)
+    inserted = [key for op, key, _ in latest if op == INSERT]
+    assert inserted == list(range(2000, 2000 + 2 * len(inserted), 2)), "D 负载应追加新键"
+    reads = [key for op, key, _ in latest if op == READ]
+    assert sum(key >= 1800 for key in reads) > len(reads) * 0.5, "D 负载应偏向最近的键"
+    assert all(key % 2 == 1 for op, key, _ in generate_operations('E', 'uniform', 1000, 2000) if op == INSERT), \
+        "随机插入应落在已有键之间"
+    assert all(1 <= n <= 100 for op, _, n in generate_operations('E', 'zipfian', 1000, 2000) if op == SCAN), "扫描长度错误"
+    
+    print("✅ 操作序列生成测试通过！")
+
+
+def test_structures_agree() -> None:
+    """测试各结构执行同一操作序列后的内容和扫描结果一致"""
+    print("=== 测试各结构结果一致 ===")
+    
+    items = [(2 * i, i) for i in range(3000)]
+    for workload in WORKLOADS:
+        ops = generate_operations(workload, 'uniform', 3000, 3000, seed=5)
+        contents = []
+        for name, factory in STRUCTURES.items():
+            for order in ((4, 64) if name == 'bplustree' else (None,)):
+                store = factory(items, order)
+                run_operations(store, ops)
+                contents.append(store.items())
+                if workload == 'E':
+                    assert store.scan(1001, 7) == [(key, value) for key, value in contents[0] if key >= 1001][:7], \
+                        f"{name} 扫描结果错误"
+        assert all(content == contents[0] for content in contents), f"负载 {workload} 下各结构内容不一致"
+    
+    print("✅ 各结构结果一致测试通过！")
+
+
+def test_suite_report() -> None:
+    """测试结果格式、JSON 输出与回归对比"""
+    print("=== 测试结果格式与回归对比 ===")
+    
+    print("1. 结果格式...")
+    report = run_suite(['A', 'D', 'E'], ['uniform', 'zipfian'], [2000], [4, 64], 1000, seed=7)
+    results = report['results']
+    # A、E 各 2 种分布，D 固定为 latest；每组 2 个阶数加 2 个基线
+    assert len(results) == (2 + 1 + 2) * 4, "配置组合数错误"
+    assert {result['distribution'] for result in results if result['workload'] == 'D'} == {'latest'}, "D 负载分布错误"
+    for result in results:
+        assert result['throughput_ops_s'] > 0 and result['peak_memory_bytes'] > 0, "吞吐量或内存缺失"
+        overall = result['overall_latency']
+        assert overall['count'] == 1000 and overall['p50_us'] <= overall['p99_us'] <= overall['max_us'], "延迟统计错误"
+    assert set(next(r for r in results if r['workload'] == 'E')['latency']) == {'insert', 'scan'}, "E 负载操作类型错误"
+    assert report['meta']['seed'] == 7 and report['meta']['python'], "环境信息缺失"
+    tree_memory = {r['order']: r['peak_memory_bytes'] for r in results if r['structure'] == 'bplustree'}
+    print(f"  构建峰值内存: order=4 {tree_memory[4] // 1024} KB, order=64 {tree_memory[64] // 1024} KB")
+    
+    slower = json.loads(json.dumps(report))
+    for result in slower['results']:
+        if result['structure'] == 'sorted_list':
+            result['throughput_ops_s'] /= 2
+    rows = compare(report, slower, threshold=0.1)
+    assert len(rows) == len(results), "应对比全部配置"
+    assert {row['structure'] for row in rows if row['regression']} == {'sorted_list'}, "回归检测错误"
+    
+    print("2. 命令行...")
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = os.path.join(tmp, "baseline.json")
+        args = ['--workloads', 'C', '--distributions', 'uniform', '--records', '1000', '--orders', '8',
+                '--operations', '500', '--baselines', 'dict_bisect', '--no-memory']
+        assert benchmark_main(args + ['--output', baseline]) == 0, "命令行运行失败"
+        with open(baseline) as f:
+            saved = json.load(f)
+        assert [r['structure'] for r in saved['results']] == ['bplustree', 'dict_bisect'], "JSON 输出错误"
+        for result in saved['results']:
+            result['throughput_ops_s'] *= 100
+        with open(baseline, 'w') as f:
+            json.dump(saved, f)
+        assert benchmark_main(args + ['--output', os.path.join(tmp, "new.json"), '--compare', baseline]) == 1, \
+            "吞吐量明显下降时应返回 1"
+        
+        # 不指定 --output 时标准输出只有 JSON，进度与对比报告写到标准错误
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            benchmark_main(args + ['--compare', baseline])
+        assert len(json.loads(stdout.getvalue())['results']) == 2, "标准输出应能直接解析为 JSON"
+    
+    print("✅ 结果格式与回归对比测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始B+树基准测试的测试...\n")
+    
+    try:
+        test_operation_generation()
+        test_structures_agree()
+        test_suite_report()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+写缓冲B+树测试文件
+测试缓冲与树合并读取、墓碑、同步/后台刷写，以及突发写入的尾延迟
+"""
+
+import random
+import sys
+import time
+from b_plus_tree import BPlusTree
+from buffered_b_plus_tree import BufferedBPlusTree
+from test_b_plus_tree import check_tree_invariants
+
+
+def test_buffered_operations() -> None:
+    """测试随机增删后读取结果与参照字典一致"""
+    print("=== 测试写缓冲读写 ===")
+    
+    for background in (False, True):
+        print(f"1. {'后台' if background else '同步'}刷写...")
+        base = BPlusTree.from_sorted(((k, -k) for k in range(0, 2000, 5)), order=8)
+        reference = {k: -k for k in range(0, 2000, 5)}
+        with BufferedBPlusTree(base, buffer_size=64, background=background) as store:
+            for step in range(6000):
+                key = random.randint(0, 2000)
+                action = random.random()
+                if action < 0.55:
+                    store.insert(key, step)
+                    reference[key] = step
+                elif action < 0.9:
+                    assert store.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+                    reference.pop(key, None)
+                else:
+                    assert store.search(key) == reference.get(key), f"键 {key} 查找错误"
+                    assert (key in store) == (key in reference), f"键 {key} 成员判断错误"
+                if step % 500 == 0:
+                    lo, hi = sorted(random.sample(range(-10, 2010), 2))
+                    inclusive = random.choice([(True, True), (False, False)])
+                    limit = random.choice([None, 10])
+                    reverse = random.random() < 0.5
+                    expected = sorted((k, v) for k, v in reference.items()
+                                      if (lo < k < hi) or (inclusive[0] and k == lo) or (inclusive[1] and k == hi))
+                    if reverse:
+                        expected.reverse()
+                    got = list(store.iter_range(lo, hi, inclusive, limit, reverse))
+                    assert got == expected[:limit], f"范围 [{lo}, {hi}] {inclusive} limit={limit} reverse={reverse} 错误"
+                    assert len(store) == len(reference), "键数量错误"
+            
+            assert list(store.items()) == sorted(reference.items()), "全量遍历错误"
+            stats = store.stats()
+            print(f"  {stats}")
+            assert stats["flushes"] > 0 and stats["tombstones"] <= stats["buffered"] < 2 * 64, "缓冲占用应有上界"
+            store.flush()
+            assert store.stats()["buffered"] == 0, "flush 后缓冲应为空"
+            assert list(base.items()) == sorted(reference.items()), "flush 后树内容错误"
+            check_tree_invariants(base)
+        
+        try:
+            store.insert(1, 1)
+            assert False, "关闭后写入应抛出 ValueError"
+        except ValueError:
+            pass
+    
+    print("2. 坏键与 None 值...")
+    for background in (False, True):
+        with BufferedBPlusTree(buffer_size=10, background=background, key_type="int64") as store:
+            for key in range(9):
+                store.insert(key, key)
+            for bad_key, error in ((2 ** 70, ValueError), ("x", TypeError)):
+                try:
+                    store.insert(bad_key, 0)
+                    assert False, f"越界或类型不符的键 {bad_key!r} 应在写入缓冲时抛出 {error.__name__}"
+                except error:
+                    pass
+            store.insert(9, 9)
+            store.flush()
+            assert len(store) == 10 and list(store.items()) == [(k, k) for k in range(10)], "坏键不应丢失同批写入"
+        with BufferedBPlusTree(BPlusTree.from_sorted([(0, 0)], order=8), buffer_size=4,
+                               background=background) as store:
+            try:
+                store.insert("x", 0)
+                assert False, "无法与已有键比较的键应抛出 TypeError"
+            except TypeError:
+                pass
+            store.insert(1, None)
+            for key in range(2, 6):
+                store.insert(key, key)
+            store.flush()
+            assert 1 in store and store.search(1) is None, "刷写后值为 None 的键应存在"
+            assert len(store) == len(list(store.items())) == 6, "值为 None 的键应计入键数"
+            assert store.delete(1) is True and 1 not in store and len(store) == 5, "值为 None 的键应能删除"
+    
+    print("✅ 写缓冲读写测试通过！")
+
+
+def test_buffered_latency() -> None:
+    """对比突发随机写入时直接写树与经过写缓冲的单次插入延迟"""
+    print("\n=== 测试突发写入延迟 ===")
+    
+    keys = random.sample(range(10 ** 7), 200000)
+    
+    def measure(target) -> list:
+        latencies = []
+        clock = time.perf_counter_ns
+        for key in keys:
+            start = clock()
+            target.insert(key, key)
+            latencies.append(clock() - start)
+        latencies.sort()
+        return latencies
+    
+    plain = measure(BPlusTree(order=64))
+    results = {}
+    for background in (False, True):
+        store = BufferedBPlusTree(order=64, buffer_size=4096, background=background)
+        results[background] = measure(store)
+        store.close()
+        assert len(store.tree) == len(keys), "刷写后键数量错误"
+    
+    def describe(latencies: list) -> str:
+        pick = lambda q: latencies[int(len(latencies) * q)] / 1000
+        return f"p50 {pick(0.5):.1f}µs, p99 {pick(0.99):.1f}µs, p99.9 {pick(0.999):.1f}µs, 最大 {latencies[-1] / 1000:.0f}µs"
+    
+    print(f"  直接写树: {describe(plain)}")
+    print(f"  同步刷写: {describe(results[False])}")
+    print(f"  后台刷写: {describe(results[True])}")
+    p99 = int(len(keys) * 0.99)
+    assert results[False][p99] < plain[p99], "写缓冲应降低 p99 插入延迟"
+    
+    print("✅ 突发写入延迟测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始写缓冲B+树测试...\n")
+    
+    try:
+        test_buffered_operations()
+        test_buffered_latency()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
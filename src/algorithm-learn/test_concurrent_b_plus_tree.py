@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+并发B+树测试文件
+多线程混合读写压力测试，结束后与各线程的参照字典对照并校验树结构
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+from typing import Dict, List
+from b_plus_tree import BPlusTree
+from concurrent_b_plus_tree import ConcurrentBPlusTree
+from test_b_plus_tree import check_tree_invariants
+
+
+def run_stress(tree: ConcurrentBPlusTree, writers: int, readers: int, ops: int, key_space: int) -> Dict[int, int]:
+    """
+    压力测试：每个写线程只改自己的键分区（键 % writers == 线程号），读线程做查找和范围扫描
+    
+    预先插入的负数键从不修改，读线程在任何时刻都必须能查到它们。
+    返回所有写线程参照字典的合并结果。
+    """
+    stable = {-k: k for k in range(1, 201)}
+    tree.put_many(stable.items())
+    references: List[Dict[int, int]] = [{} for _ in range(writers)]
+    errors: List[str] = []
+    done = threading.Event()
+    
+    def writer(slot: int) -> None:
+        rng = random.Random(slot)
+        reference = references[slot]
+        try:
+            for step in range(ops):
+                key = rng.randrange(key_space // writers) * writers + slot
+                if rng.random() < 0.6:
+                    tree.insert(key, step)
+                    reference[key] = step
+                elif tree.delete(key) != (key in reference):
+                    errors.append(f"写线程 {slot} 删除键 {key} 返回值错误")
+                else:
+                    reference.pop(key, None)
+                if rng.random() < 0.05 and tree.search(key) != reference.get(key):
+                    errors.append(f"写线程 {slot} 读不到自己写入的键 {key}")
+        except Exception as e:  # 线程中的异常不会自动传播
+            errors.append(f"写线程 {slot} 异常: {e!r}")
+    
+    def reader(slot: int) -> None:
+        rng = random.Random(1000 + slot)
+        try:
+            while not done.is_set():
+                key = -rng.randint(1, 200)
+                if tree.search(key) != -key:
+                    errors.append(f"读线程 {slot} 查不到稳定键 {key}")
+                lo = rng.randrange(-100, key_space)
+                keys = [k for k, _ in tree.iter_range(lo, lo + 200, reverse=rng.random() < 0.5)]
+                if keys != sorted(keys) and keys != sorted(keys, reverse=True):
+                    errors.append(f"读线程 {slot} 范围扫描结果无序")
+                stable_keys = [k for k, _ in tree.iter_range(-200, -1)]
+                if stable_keys != list(range(-200, 0)):
+                    errors.append(f"读线程 {slot} 范围扫描漏掉了稳定键")
+                # 整树读取与写线程并发：结果有序且包含全部稳定键
+                if slot == 0:
+                    whole = tree.range_keys() if rng.random() < 0.5 else list(tree.freeze().keys())
+                    if whole != sorted(set(whole)) or whole[:200] != list(range(-200, 0)):
+                        errors.append(f"读线程 {slot} 并发整树读取结果错误")
+                elif slot == 1 and rng.random() < 0.2:
+                    stats = tree.stats()
+                    if sum(stats['leaf_occupancy']) != stats['leaves'] or stats['height'] < 1:
+                        errors.append(f"读线程 {slot} 并发结构统计错误")
+        except Exception as e:
+            errors.append(f"读线程 {slot} 异常: {e!r}")
+    
+    write_threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    read_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in write_threads + read_threads:
+        thread.start()
+    for thread in write_threads:
+        thread.join()
+    done.set()
+    for thread in read_threads:
+        thread.join()
+    
+    assert not errors, f"并发错误: {errors[:5]}"
+    expected = dict(stable)
+    for reference in references:
+        expected.update(reference)
+    return expected
+
+
+def test_concurrent_stress() -> None:
+    """测试多线程混合读写后数据与结构都正确"""
+    print("=== 测试并发读写 ===")
+    
+    for order in (4, 7, 32):
+        print(f"1. 阶数 {order}...")
+        tree = ConcurrentBPlusTree(order=order)
+        expected = run_stress(tree, writers=4, readers=3, ops=3000, key_space=2000)
+        check_tree_invariants(tree.tree, check_counts=False)
+        assert len(tree) == len(expected), f"键数量错误: {len(tree)} != {len(expected)}"
+        assert list(tree.items()) == sorted(expected.items()), "并发写入后内容与参照不一致"
+        print(f"  {tree}: 乐观读 {tree.optimistic_reads}, 加锁读 {tree.locked_reads}, "
+              f"乐观写 {tree.optimistic_writes}, 加锁写 {tree.locked_writes}, 重试 {tree.restarts}")
+    
+    print("✅ 并发读写测试通过！")
+
+
+def test_concurrent_interface() -> None:
+    """测试单线程下与 BPlusTree 一致的接口，以及经由锁存器的整树读取"""
+    print("\n=== 测试并发树接口 ===")
+    
+    tree = ConcurrentBPlusTree.bulk_load(((i, str(i)) for i in range(0, 1000, 2)), order=8)
+    assert isinstance(tree, ConcurrentBPlusTree), "bulk_load 应返回 ConcurrentBPlusTree"
+    assert tree.put_many([(1, "1"), (2, "two"), (3, "3")]) == 2, "put_many 新增数量错误"
+    assert tree.get_many([2, 3, 5]) == ["two", "3", None], "get_many 结果错误"
+    assert tree.delete_many([1, 3, 5]) == 2, "delete_many 删除数量错误"
+    assert tree.range_query(10, 20) == [(k, str(k)) for k in range(10, 21, 2)], "范围查询错误"
+    assert [k for k, _ in tree.iter_range(10, 20, (False, False), reverse=True)] == [18, 16, 14, 12], "逆序范围错误"
+    assert [k for k, _ in tree.iter_range(limit=3)] == [0, 2, 4], "limit 错误"
+    assert list(tree.keys(reverse=True))[:2] == [998, 996], "逆序键错误"
+    check_tree_invariants(tree.tree, check_counts=False)
+    
+    assert tree.range_keys(10, 20) == list(range(10, 21, 2)), "range_keys 错误"
+    assert tree.count_range(10, 20) == 6 and tree.count_range(21, 10) == 0, "count_range 错误"
+    tree.insert(1001, None)
+    assert 1001 in tree and 1003 not in tree and len(tree) == 501, "值为 None 的键应存在"
+    assert tree.delete(1001) and 1001 not in tree, "删除错误"
+    assert list(tree.freeze().items()) == list(tree.items()), "freeze 错误"
+    snap = tree.snapshot()
+    tree.insert(5, "5")
+    assert snap.search(5) is None and tree.search(5) == "5", "快照不应看到之后的写入"
+    assert list(snap.items()) == [(k, v) for k, v in tree.items() if k != 5], "快照内容错误"
+    tree.delete(5)
+    
+    stats = tree.stats()
+    reference = BPlusTree.from_sorted(tree.items(), order=8).stats()
+    assert stats['size'] == 500 and stats['height'] == tree.tree.height, "stats 键数或树高错误"
+    assert sum(stats['leaf_occupancy']) == stats['leaves'] == stats['nodes_per_level'][-1], "stats 叶子统计错误"
+    assert stats['leaves'] >= reference['leaves'], "stats 叶子数不应少于装满的重建树"
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "concurrent.bpt")
+        tree.dump(path)
+        loaded = BPlusTree.load(path)
+        reloaded = ConcurrentBPlusTree.load(path)
+    check_tree_invariants(loaded)
+    assert list(loaded.items()) == list(tree.items()), "dump/load 错误"
+    assert isinstance(reloaded, ConcurrentBPlusTree) and list(reloaded.items()) == list(tree.items()), \
+        "ConcurrentBPlusTree.load 错误"
+    
+    # 依赖子树计数、聚合或写时复制的接口不提供
+    for name in ("rank", "select", "cursor", "split_at", "concat", "delete_range", "aggregate", "enable_metrics"):
+        assert not hasattr(tree, name), f"并发树不应提供 {name}"
+    
+    print("✅ 并发树接口测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始并发B+树测试...\n")
+    
+    try:
+        test_concurrent_stress()
+        test_concurrent_interface()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
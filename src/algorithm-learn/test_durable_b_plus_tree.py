@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+WAL 持久化B+树测试文件
+测试日志回放、检查点、崩溃时的残缺记录以及组提交
+"""
+
+import errno
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import threading
+from durable_b_plus_tree import DurableBPlusTree, read_log
+
+
+def test_recovery() -> None:
+    """测试关闭后重新打开、检查点与日志尾部合并"""
+    print("=== 测试日志回放与检查点 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        reference = {}
+        print("1. 随机写入并自动做检查点...")
+        with DurableBPlusTree(workdir, order=8, checkpoint_every=500, group_commit_ms=0) as store:
+            for step in range(2000):
+                key = random.randint(0, 400)
+                if random.random() < 0.7:
+                    store.insert(key, step)
+                    reference[key] = step
+                else:
+                    assert store.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+                    reference.pop(key, None)
+            assert os.path.exists(store.checkpoint_path), "应已生成检查点"
+        
+        print("2. 重新打开...")
+        with DurableBPlusTree(workdir, order=8) as store:
+            assert store.replayed_records <= 500, f"回放条数应受检查点间隔约束: {store.replayed_records}"
+            assert store.tree.traverse() == sorted(reference), "恢复后键错误"
+            for key, value in reference.items():
+                assert store.search(key) == value, f"恢复后键 {key} 值错误"
+            
+            print("3. 手动检查点后日志为空...")
+            store.checkpoint()
+            assert os.path.getsize(store.log_path) == 0, "检查点后日志应被清空"
+            store.insert(-1, "after checkpoint")
+        
+        with DurableBPlusTree(workdir) as store:
+            assert store.replayed_records == 1, "只应回放检查点之后的一条记录"
+            assert store.search(-1) == "after checkpoint", "检查点之后的写入丢失"
+    
+    print("✅ 日志回放与检查点测试通过！")
+
+
+def test_crash_cases() -> None:
+    """测试残缺日志尾部，以及检查点替换后、清空日志前崩溃"""
+    print("\n=== 测试崩溃场景 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        print("1. 残缺的日志尾部...")
+        with DurableBPlusTree(workdir, checkpoint_every=0, group_commit_ms=0) as store:
+            for i in range(100):
+                store.insert(i, i)
+        with open(os.path.join(workdir, DurableBPlusTree.LOG_FILE), "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x12\x34")  # 只写了一半的记录头
+        
+        with DurableBPlusTree(workdir, group_commit_ms=0) as store:
+            assert len(store) == 100, "残缺记录之前的数据应完整恢复"
+            store.insert(100, 100)  # 残缺尾部已被截掉，新记录可以正常追加
+        records, _ = read_log(os.path.join(workdir, DurableBPlusTree.LOG_FILE))
+        assert len(records) == 101, f"日志记录数错误: {len(records)}"
+        
+        print("2. 检查点已替换但日志未清空...")
+        log_path = os.path.join(workdir, DurableBPlusTree.LOG_FILE)
+        saved_log = os.path.join(workdir, "saved.log")
+        shutil.copy(log_path, saved_log)
+        with DurableBPlusTree(workdir) as store:
+            store.checkpoint()
+        shutil.copy(saved_log, log_path)  # 模拟清空日志之前崩溃
+        
+        with DurableBPlusTree(workdir) as store:
+            assert store.replayed_records == 0, "检查点已包含的日志不应重复回放"
+            assert store.tree.traverse() == list(range(101)), "恢复后键错误"
+    
+    print("✅ 崩溃场景测试通过！")
+
+
+def test_group_commit() -> None:
+    """测试多个写线程共享 fsync"""
+    print("\n=== 测试组提交 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        with DurableBPlusTree(workdir, group_commit_ms=5, checkpoint_every=0) as store:
+            def writer(base: int) -> None:
+                for i in range(200):
+                    store.insert(base + i, i)
+            
+            threads = [threading.Thread(target=writer, args=(base,)) for base in range(0, 1600, 200)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            stats = store.stats()
+            print(f"  {stats['records']} 条记录, {stats['fsyncs']} 次 fsync")
+            assert stats["records"] == 1600 and stats["durable_lsn"] == 1600, "记录未全部落盘"
+            assert stats["fsyncs"] < stats["records"], "并发写入应合并 fsync"
+        
+        with DurableBPlusTree(workdir) as store:
+            assert len(store) == 1600, "组提交的写入应全部可恢复"
+    
+    print("✅ 组提交测试通过！")
+
+
+def test_failures() -> None:
+    """测试值为 None 的键可以删除，以及写盘失败时写入者收到异常而不是永远阻塞"""
+    print("\n=== 测试 None 值与写盘失败 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        print("1. 值为 None 的键...")
+        with DurableBPlusTree(workdir, group_commit_ms=0) as store:
+            store.insert('k', None)
+            assert 'k' in store and len(store) == 1, "值为 None 的键应存在"
+            assert store.delete('k') is True and len(store) == 0, "值为 None 的键应能删除"
+            assert store.delete('k') is False, "重复删除应返回 False"
+        with DurableBPlusTree(workdir) as store:
+            assert len(store) == 0, "删除应写入日志并可恢复"
+        
+        # 树拒绝的键和无法序列化的值都不应留下日志记录，重新打开仍能恢复
+        with DurableBPlusTree(workdir, group_commit_ms=0, checkpoint_every=0) as store:
+            store.insert(1, 'a')
+            store.insert(2, 'b')
+            for bad in (lambda: store.insert('x', 'c'), lambda: store.delete('x')):
+                try:
+                    bad()
+                    assert False, "无法与已有键比较的键应抛出 TypeError"
+                except TypeError:
+                    pass
+            for key in (1, 3):
+                try:
+                    store.insert(key, lambda: None)
+                    assert False, "无法序列化的值应抛出异常"
+                except (pickle.PicklingError, AttributeError, TypeError):
+                    pass
+            assert store.range_query(0, 10) == [(1, 'a'), (2, 'b')], "写日志失败时应撤销内存修改"
+        with DurableBPlusTree(workdir) as store:
+            assert store.range_query(0, 10) == [(1, 'a'), (2, 'b')] and len(store) == 2, \
+                "被拒绝的写入之后应能重新打开并恢复"
+            store.delete(1)
+            store.delete(2)
+        
+        print("2. 写盘失败...")
+        class FailingFile:
+            def __init__(self, file):
+                self.file = file
+            
+            def write(self, data):
+                raise OSError(errno.ENOSPC, "No space left on device")
+            
+            def __getattr__(self, name):
+                return getattr(self.file, name)
+        
+        store = DurableBPlusTree(workdir, group_commit_ms=0, checkpoint_every=0)
+        store._wal.file = FailingFile(store._wal.file)
+        errors = []
+        
+        def writer() -> None:
+            try:
+                store.insert(1, 1)
+            except OSError as e:
+                errors.append(e)
+        
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive(), "写盘失败时等待落盘的写入者不应永远阻塞"
+        assert len(errors) == 1 and isinstance(errors[0].__cause__, OSError), "写入者应收到写盘异常"
+        try:
+            store.insert(2, 2)
+            assert False, "写盘失败后继续写入应抛出异常"
+        except OSError:
+            pass
+        assert 2 not in store, "追加日志失败的写入不应留在内存树中"
+        store._wal.file = store._wal.file.file
+        store.close()
+    
+    print("✅ None 值与写盘失败测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始WAL持久化B+树测试...\n")
+    
+    try:
+        test_recovery()
+        test_crash_cases()
+        test_group_commit()
+        test_failures()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
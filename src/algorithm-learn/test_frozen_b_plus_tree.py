@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+冻结B+树测试文件
+测试与可变树一致的查询接口、共享内存跨进程访问，以及查找速度与内存占用
+"""
+
+import multiprocessing
+import random
+import sys
+import time
+import tracemalloc
+from b_plus_tree import BPlusTree
+from frozen_b_plus_tree import FrozenBPlusTree
+
+
+def test_frozen_queries() -> None:
+    """测试冻结树的查找、范围迭代与顺序统计与原树一致"""
+    print("=== 测试冻结树查询 ===")
+    
+    for options in ({}, {"key_type": "int64"}):
+        print(f"1. {options or '普通键'}...")
+        tree = BPlusTree(order=5, **options)
+        for _ in range(3000):
+            key = random.randint(0, 5000)
+            tree.insert(key, f"v{key}")
+        for key in random.sample(range(5000), 1000):
+            tree.delete(key)
+        frozen = tree.freeze()
+        tree.insert(-1, "after freeze")
+        tree.delete(-1)
+        
+        assert len(frozen) == len(tree) and frozen.traverse() == tree.traverse(), "冻结后键错误"
+        for key in range(-5, 5005):
+            assert frozen.search(key) == tree.search(key), f"键 {key} 查找错误"
+            assert (key in frozen) == (key in tree), f"键 {key} 成员判断错误"
+        for _ in range(200):
+            lo, hi = sorted(random.sample(range(-10, 5010), 2))
+            for inclusive in ((True, True), (False, True), (True, False)):
+                limit = random.choice([None, 1, 7, 3000])
+                reverse = random.random() < 0.5
+                args = (lo, hi, inclusive, limit, reverse)
+                assert list(frozen.iter_range(*args)) == list(tree.iter_range(*args)), f"iter_range{args} 错误"
+            assert frozen.rank(lo) == tree.rank(lo) and frozen.count_range(lo, hi) == tree.count_range(lo, hi), "顺序统计错误"
+        assert list(frozen.items(reverse=True)) == list(tree.items(reverse=True)), "逆序遍历错误"
+        assert frozen.select(-1) == tree.select(-1) and frozen.select(10) == tree.select(10), "select 错误"
+        assert list(tree.snapshot().freeze().items()) == list(frozen.items()), "快照冻结错误"
+    
+    assert len(BPlusTree().freeze()) == 0 and BPlusTree().freeze().search(1) is None, "空树冻结错误"
+    
+    print("✅ 冻结树查询测试通过！")
+
+
+def _worker(name: str, keys: list, results) -> None:
+    """子进程：附加共享内存中的冻结树并查找"""
+    with FrozenBPlusTree.attach(name) as frozen:
+        results.put([frozen.search(key) for key in keys] + [len(frozen), frozen.range_query(10, 14)])
+
+
+def test_frozen_shared_memory() -> None:
+    """测试通过共享内存在子进程中访问冻结树"""
+    print("\n=== 测试冻结树共享内存 ===")
+    
+    for key_type in (None, "int64"):
+        print(f"1. {key_type or '普通键'}...")
+        tree = BPlusTree.from_sorted(((i, {"row": i}) for i in range(0, 2000, 2)), order=16, key_type=key_type)
+        shm = tree.freeze().to_shared_memory()
+        try:
+            with FrozenBPlusTree.attach(shm.name) as local:
+                assert list(local.items()) == list(tree.items()), "本进程附加后内容错误"
+                assert list(local.items(reverse=True))[:2] == [(1998, {"row": 1998}), (1996, {"row": 1996})], "逆序错误"
+            
+            keys = [0, 1, 1000, 1998, 5000]
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_worker, args=(shm.name, keys, results))
+            process.start()
+            got = results.get(timeout=60)
+            process.join()
+            assert process.exitcode == 0, "子进程异常退出"
+            assert got == [tree.search(k) for k in keys] + [1000, [(10, {"row": 10}), (12, {"row": 12}), (14, {"row": 14})]], "子进程查找结果错误"
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    print("✅ 冻结树共享内存测试通过！")
+
+
+def test_frozen_performance() -> None:
+    """对比冻结树与可变树的点查速度和内存占用"""
+    print("\n=== 测试冻结树性能 ===")
+    
+    n = 200000
+    tracemalloc.start()
+    tree = BPlusTree.from_sorted(((i, i) for i in range(n)), order=64)
+    tree_memory = tracemalloc.get_traced_memory()[0]
+    frozen = tree.freeze()
+    frozen_memory = tracemalloc.get_traced_memory()[0] - tree_memory
+    tracemalloc.stop()
+    
+    probes = [random.randrange(n) for _ in range(200000)]
+    start_time = time.perf_counter()
+    for key in probes:
+        tree.search(key)
+    tree_time = time.perf_counter() - start_time
+    search = frozen.search
+    start_time = time.perf_counter()
+    for key in probes:
+        search(key)
+    frozen_time = time.perf_counter() - start_time
+    
+    print(f"  20 万次点查: 可变树 {tree_time * 1000:.0f} 毫秒, 冻结树 {frozen_time * 1000:.0f} 毫秒 ({tree_time / frozen_time:.1f}x)")
+    print(f"  结构内存（不含共享的键值对象）: 可变树 {tree_memory // 1024} KB, 冻结树 {frozen_memory // 1024} KB")
+    assert frozen_time < tree_time, "冻结树点查应快于可变树"
+    assert frozen_memory < tree_memory, "冻结树应占用更少内存"
+    
+    print("✅ 冻结树性能测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始冻结B+树测试...\n")
+    
+    try:
+        test_frozen_queries()
+        test_frozen_shared_memory()
+        test_frozen_performance()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
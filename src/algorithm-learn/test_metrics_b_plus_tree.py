@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+B+树操作统计测试文件
+测试结构统计、操作计数与延迟直方图、结构事件钩子，以及开关统计的开销
+"""
+
+import random
+import sys
+import time
+from b_plus_tree import BPlusTree
+from metrics_b_plus_tree import LatencyHistogram, TIMED_OPERATIONS
+
+
+def test_structure_stats() -> None:
+    """测试树高、各层节点数与叶子占用率"""
+    print("=== 测试结构统计 ===")
+    
+    tree = BPlusTree(order=8)
+    for key in random.sample(range(100000), 5000):
+        tree.insert(key, key)
+    stats = tree.stats()
+    
+    leaves = 0
+    leaf = tree._first_leaf()
+    while leaf is not None:
+        leaves += 1
+        leaf = leaf.next_leaf
+    assert stats['size'] == 5000 and stats['height'] == tree.height, "键数或树高错误"
+    assert len(stats['nodes_per_level']) == tree.height and stats['nodes_per_level'][0] == 1, "各层节点数错误"
+    assert stats['leaves'] == leaves == sum(stats['leaf_occupancy']), "叶子数错误"
+    assert stats['internal_nodes'] == sum(stats['nodes_per_level'][:-1]), "内部节点数错误"
+    assert 0.5 <= stats['leaf_fill'] <= 1.0 and 0 < stats['internal_fill'] <= 1.0, "填充率错误"
+    assert stats['memory_bytes'] > 0 and 'operations' not in stats, "未开启统计时不应有操作统计"
+    print(f"  各层节点数 {stats['nodes_per_level']}, 叶子填充率 {stats['leaf_fill']:.2f}, "
+          f"占用率分布 {stats['leaf_occupancy']}")
+    
+    packed = BPlusTree.from_sorted(((key, key) for key in range(5000)), order=8)
+    assert packed.stats()['leaf_fill'] > stats['leaf_fill'], "装满的批量构建应比随机插入更满"
+    assert packed.stats()['leaf_occupancy'][-1] >= packed.stats()['leaves'] - 2, "装满的叶子应计入最后一格"
+    empty = BPlusTree().stats()
+    assert empty['nodes_per_level'] == [1] and empty['leaf_fill'] == 0, "空树统计错误"
+    
+    print("✅ 结构统计测试通过！")
+
+
+def test_operation_metrics() -> None:
+    """测试操作计数、结构事件、钩子和关闭统计"""
+    print("=== 测试操作统计 ===")
+    
+    print("1. 直方图...")
+    histogram = LatencyHistogram()
+    for ns in [100] * 98 + [5000, 1000000]:
+        histogram.record(ns)
+    assert histogram.count == 100 and histogram.max_ns == 1000000, "直方图计数错误"
+    assert 100 <= histogram.percentile(50) < 200 and histogram.percentile(100) == 1000000, "直方图分位数错误"
+    
+    print("2. 操作计数...")
+    events = []
+    tree = BPlusTree(order=5)
+    metrics = tree.enable_metrics(hooks=[lambda name, value: events.append((name, value))])
+    for key in range(2000):
+        tree.insert(key * 7 % 2000, key)
+    for key in range(1000):
+        assert tree.search(key) is not None, "开启统计后查找结果错误"
+    for key in range(0, 2000, 2):
+        tree.delete(key)
+    assert tree.range_query(100, 400) == [(key, tree.search(key)) for key in range(101, 400, 2)], "开启统计后范围查询错误"
+    
+    stats = tree.stats()
+    operations = stats['operations']
+    assert operations['insert']['count'] == 2000 and operations['delete']['count'] == 1000, "插入/删除次数错误"
+    assert operations['search']['count'] == 1000 + 150, "查找次数错误"
+    assert operations['range_query']['count'] == 1 and stats['range_scans'] == 1, "范围扫描次数错误"
+    assert stats['leaves_scanned'] >= 150 // (tree.order - 1), "扫描叶子数错误"
+    assert stats['leaf_split'] > 0 and stats['internal_split'] > 0, "分裂次数错误"
+    assert stats['merge'] > 0 and stats['borrow'] > 0, "合并/借键次数错误"
+    assert stats['descents'] > 0 and stats['nodes_visited'] >= stats['descents'], "下降统计错误"
+    assert all(summary['p50_us'] <= summary['p99_us'] <= summary['max_us'] for summary in operations.values()), "分位数顺序错误"
+    assert sum(1 for name, _ in events if name == 'insert') == 2000, "钩子未收到全部插入"
+    assert sum(1 for name, _ in events if name == 'leaf_split') == stats['leaf_split'], "钩子未收到分裂事件"
+    print(f"  insert: {operations['insert']}")
+    print(f"  分裂 {stats['leaf_split']}/{stats['internal_split']}, 借键 {stats['borrow']}, 合并 {stats['merge']}, "
+          f"每次扫描 {stats['leaves_per_scan']:.0f} 个叶子")
+    
+    print("3. 重置与关闭...")
+    assert tree.enable_metrics() is metrics, "重复开启应返回同一个 TreeMetrics"
+    metrics.reset()
+    assert tree.stats()['operations'] == {} and tree.stats()['leaf_split'] == 0, "重置后计数应清零"
+    tree.disable_metrics()
+    assert not any(name in vars(tree) for name in TIMED_OPERATIONS), "关闭后应移除全部包装"
+    tree.insert(5000, 1)
+    assert 'operations' not in tree.stats() and metrics.latency['insert'].count == 0, "关闭后不应继续统计"
+    
+    print("✅ 操作统计测试通过！")
+
+
+def test_metrics_overhead() -> None:
+    """对比开启统计前后的点查耗时"""
+    print("=== 测试统计开销 ===")
+    
+    tree = BPlusTree.from_sorted(((key, key) for key in range(200000)), order=64)
+    probes = [random.randrange(200000) for _ in range(100000)]
+    
+    def run() -> float:
+        start = time.perf_counter()
+        for key in probes:
+            tree.search(key)
+        return time.perf_counter() - start
+    
+    off = min(run() for _ in range(3))
+    tree.enable_metrics()
+    on = min(run() for _ in range(3))
+    tree.disable_metrics()
+    after = min(run() for _ in range(3))
+    print(f"  10 万次点查: 关闭 {off * 1000:.0f} 毫秒, 开启 {on * 1000:.0f} 毫秒, 再关闭 {after * 1000:.0f} 毫秒")
+    assert after < on, "关闭统计后应恢复原来的速度"
+    
+    print("✅ 统计开销测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始B+树操作统计测试...\n")
+    
+    try:
+        test_structure_stats()
+        test_operation_metrics()
+        test_metrics_overhead()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+多值B+树测试文件
+测试 PostingList 的编码与增删、多值索引的增删查、快照隔离以及多键求交
+"""
+
+import random
+import sys
+import time
+from multimap_b_plus_tree import BPlusMultimap, PostingList, intersect_postings
+from test_b_plus_tree import check_tree_invariants
+
+
+def check_posting_list(postings: PostingList, expected: set) -> None:
+    """校验 PostingList 的内容与块索引（首尾行号、块内计数、块大小上限）"""
+    assert list(postings) == sorted(expected), "行号内容或顺序错误"
+    assert len(postings) == len(expected), f"行号数量错误: {len(postings)} != {len(expected)}"
+    for idx in range(len(postings._blocks)):
+        values = postings._decode_block(idx)
+        assert 0 < len(values) <= PostingList.BLOCK_SIZE, f"块 {idx} 大小越界: {len(values)}"
+        assert values[0] == postings._firsts[idx] and values[-1] == postings._lasts[idx], f"块 {idx} 首尾行号错误"
+        assert len(values) == postings._counts[idx], f"块 {idx} 计数错误"
+
+
+def test_posting_list() -> None:
+    """测试 PostingList 随机增删、成员判断与过滤"""
+    print("=== 测试 PostingList ===")
+    
+    print("1. 随机增删与集合对照...")
+    postings, reference = PostingList(), set()
+    for step in range(20000):
+        rowid = random.randint(0, 5000) if step % 3 else random.randint(0, 10 ** 12)
+        if random.random() < 0.65:
+            assert postings.add(rowid) == (rowid not in reference), f"add({rowid}) 返回值错误"
+            reference.add(rowid)
+        else:
+            assert postings.remove(rowid) == (rowid in reference), f"remove({rowid}) 返回值错误"
+            reference.discard(rowid)
+    check_posting_list(postings, reference)
+    for rowid in random.sample(range(6000), 500):
+        assert (rowid in postings) == (rowid in reference), f"成员判断 {rowid} 错误"
+    
+    print("2. 递增追加走快速路径，密集行号每个约 1 字节...")
+    dense = PostingList()
+    for rowid in range(0, 300000, 3):
+        dense.add(rowid)
+    check_posting_list(dense, set(range(0, 300000, 3)))
+    assert dense == PostingList.from_sorted(range(0, 300000, 3)), "逐个追加与批量构建结果不一致"
+    assert dense.nbytes < 2 * len(dense), f"密集行号编码过大: {dense}"
+    print(f"  {dense}，Python 列表约 {sys.getsizeof(list(dense)) + 28 * len(dense)} 字节")
+    
+    print("3. 过滤与求交...")
+    candidates = sorted(random.sample(range(400000), 2000))
+    assert dense.filter(candidates) == [r for r in candidates if r % 3 == 0 and r < 300000], "过滤结果错误"
+    lists = [PostingList(range(0, 100000, step)) for step in (2, 3, 7)]
+    assert intersect_postings(lists) == list(range(0, 100000, 42)), "求交结果错误"
+    assert intersect_postings([]) == [] and intersect_postings([PostingList(), dense]) == [], "空输入求交错误"
+    
+    print("4. 拷贝后互不影响...")
+    clone = dense.copy()
+    clone.remove(0)
+    clone.add(1)
+    assert 0 in dense and 1 not in dense and 1 in clone, "拷贝与原列表共享了修改"
+    
+    print("✅ PostingList 测试通过！")
+
+
+def test_multimap() -> None:
+    """测试多值索引的增删查、快照隔离与批量构建"""
+    print("\n=== 测试多值索引 ===")
+    
+    print("1. 随机增删与参照字典对照...")
+    for order in (3, 4, 16):
+        index, reference = BPlusMultimap(order=order), {}
+        snap, frozen = None, None
+        for step in range(5000):
+            key, rowid = random.randint(0, 50), random.randint(0, 400)
+            rows = reference.setdefault(key, set())
+            if random.random() < 0.6:
+                assert index.add(key, rowid) == (rowid not in rows), f"add({key}, {rowid}) 返回值错误"
+                rows.add(rowid)
+            else:
+                assert index.remove(key, rowid) == (rowid in rows), f"remove({key}, {rowid}) 返回值错误"
+                rows.discard(rowid)
+            if not rows:
+                del reference[key]
+            if step == 2500:
+                snap = index.snapshot()
+                frozen = {k: sorted(v) for k, v in reference.items()}
+        check_tree_invariants(index)
+        assert index.traverse() == sorted(reference), f"order={order} 键集合错误"
+        for key, rows in reference.items():
+            assert index.lookup(key) == sorted(rows) and index.count(key) == len(rows), f"order={order} 键 {key} 行号错误"
+        assert {k: list(v) for k, v in snap.items()} == frozen, "快照看到了之后的修改"
+        assert index.count(-1) == 0 and index.lookup(-1) == [] and not index.remove(-1, 0), "不存在的键处理错误"
+    
+    print("2. 多键求交...")
+    rows = [(("color", i % 5), i) for i in range(20000)] + [(("size", i % 7), i) for i in range(20000)]
+    index = BPlusMultimap.from_rows(rows, order=32)
+    check_tree_invariants(index)
+    assert index.count(("color", 2)) == 4000, "批量构建后行号数量错误"
+    assert index.intersect([("color", 2), ("size", 3)]) == [i for i in range(20000) if i % 5 == 2 and i % 7 == 3], "求交错误"
+    assert index.intersect([("color", 2), ("size", 99)]) == [] and index.intersect([]) == [], "缺失键求交应为空"
+    
+    print("3. 多条件查询耗时...")
+    rng = random.Random(7)
+    rows = [(column, rowid) for rowid in range(200000) for column in (rng.randrange(100), 100 + rng.randrange(4))]
+    start_time = time.perf_counter()
+    index = BPlusMultimap.from_rows(rows, order=64)
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    hits = sum(len(index.intersect([k, 100 + k % 4])) for k in range(100))
+    query_time = time.perf_counter() - start_time
+    assert hits == sum(1 for i in range(0, len(rows), 2) if rows[i + 1][0] == 100 + rows[i][0] % 4), "求交命中数错误"
+    print(f"  40 万行建索引 {build_time * 1000:.0f} 毫秒，100 次两条件求交 {query_time * 1000:.1f} 毫秒")
+    
+    for build in (lambda: BPlusMultimap(aggregates=["sum"]), lambda: BPlusMultimap.from_sorted([], aggregates=["sum"])):
+        try:
+            build()
+            assert False, "多值索引启用聚合应抛出 ValueError"
+        except ValueError:
+            pass
+    
+    print("✅ 多值索引测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始多值B+树测试...\n")
+    
+    try:
+        test_posting_list()
+        test_multimap()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
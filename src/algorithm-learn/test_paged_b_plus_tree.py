@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+分页B+树测试文件
+测试持久化、缓冲池淘汰以及与内存版B+树一致的接口
+"""
+
+import os
+import random
+import sys
+import tempfile
+from paged_b_plus_tree import PagedBPlusTree
+
+
+def test_paged_basic_operations() -> None:
+    """测试分页树的插入、查找、删除与范围查询"""
+    print("=== 测试分页树基本操作 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "index.db")
+        # 很小的缓冲池，强制频繁淘汰和回读
+        with PagedBPlusTree(path, order=8, cache_pages=8) as tree:
+            reference = {}
+            print("1. 随机插删与字典对照...")
+            for step in range(4000):
+                key = random.randint(0, 800)
+                if random.random() < 0.6:
+                    tree.insert(key, f"value_{key}_{step}")
+                    reference[key] = f"value_{key}_{step}"
+                else:
+                    assert tree.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+                    reference.pop(key, None)
+            
+            assert len(tree) == len(reference), "键数量错误"
+            assert tree.traverse() == sorted(reference), "遍历结果错误"
+            for key, value in reference.items():
+                assert tree.search(key) == value, f"键 {key} 值错误"
+            assert tree.search(-1) is None and -1 not in tree, "不存在的键不应找到"
+            
+            print("2. 范围查询...")
+            keys = sorted(reference)
+            for _ in range(50):
+                lo, hi = sorted(random.sample(range(-10, 810), 2))
+                expected = [(k, reference[k]) for k in keys if lo <= k <= hi]
+                assert tree.range_query(lo, hi) == expected, f"范围查询 [{lo}, {hi}] 错误"
+                got = [k for k, _ in tree.iter_range(lo, hi, (False, False), limit=5, reverse=True)]
+                assert got == [k for k in reversed(keys) if lo < k < hi][:5], f"逆序范围 ({lo}, {hi}) 错误"
+            
+            stats = tree.stats()
+            print(f"  缓冲池统计: {stats}")
+            assert stats["evictions"] > 0 and stats["misses"] > 0, "小缓冲池应发生淘汰"
+            assert all(frame.pins == 0 for frame in tree.pool.frames.values()), "操作结束后不应残留 pin"
+    
+    print("✅ 分页树基本操作测试通过！")
+
+
+def test_paged_persistence() -> None:
+    """测试关闭后重新打开，以及删除后页被复用"""
+    print("\n=== 测试分页树持久化 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "index.db")
+        
+        print("1. 写入后重新打开...")
+        with PagedBPlusTree(path, order=16, cache_pages=16) as tree:
+            for i in range(3000):
+                tree.insert(i, i * i)
+            height = tree.height
+        
+        with PagedBPlusTree(path, order=99) as tree:
+            assert tree.order == 16, "重新打开应沿用文件中的阶数"
+            assert tree.height == height and len(tree) == 3000, "元数据未持久化"
+            assert all(tree.search(i) == i * i for i in range(0, 3000, 7)), "数据未持久化"
+            
+            print("2. 删除后页被回收复用...")
+            for i in range(3000):
+                assert tree.delete(i), f"删除键 {i} 失败"
+            assert len(tree) == 0 and tree.height == 1, "删除全部键后应只剩根叶子"
+            pages = tree.stats()["pages"]
+            for i in range(3000):
+                tree.insert(i, i)
+            assert tree.stats()["pages"] == pages, "重新插入应复用空闲页而不是扩大文件"
+        
+        print("3. 非法文件...")
+        bogus = os.path.join(workdir, "bogus.db")
+        with open(bogus, "wb") as f:
+            f.write(b"not a tree" * 100)
+        try:
+            PagedBPlusTree(bogus)
+            assert False, "打开非法文件应抛出 ValueError"
+        except ValueError:
+            pass
+        
+        print("4. 节点超出页大小...")
+        tree = PagedBPlusTree(os.path.join(workdir, "tiny.db"), order=64, page_size=256, cache_pages=8)
+        try:
+            for i in range(2000):
+                tree.insert(i, "x" * 50)
+            tree.flush()
+            assert False, "节点超出页大小应抛出 ValueError"
+        except ValueError:
+            pass
+        finally:
+            tree.pager.close()  # 脏页无法写回，直接关闭文件
+    
+    print("✅ 分页树持久化测试通过！")
+
+
+def test_paged_bloom_filter() -> None:
+    """测试叶子布隆过滤器：结果与不用过滤器一致，拦下大部分未命中查找"""
+    print("\n=== 测试叶子布隆过滤器 ===")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "index.db")
+        reference = {}
+        with PagedBPlusTree(path, order=32, cache_pages=16, bloom_fp_rate=0.01) as tree:
+            print("1. 随机插删后查找与字典对照...")
+            for step in range(20000):
+                key = random.randrange(0, 20000, 2)  # 只用偶数键，奇数键一定不存在
+                if random.random() < 0.7:
+                    tree.insert(key, step)
+                    reference[key] = step
+                else:
+                    assert tree.delete(key) == (key in reference), f"删除键 {key} 返回值错误"
+                    reference.pop(key, None)
+            for key in range(-10, 20010):
+                assert tree.search(key) == reference.get(key), f"键 {key} 查找结果错误"
+            
+            print("2. 未命中查找的过滤率...")
+            checks, negatives, false_positives = tree.filter_checks, tree.filter_negatives, tree.filter_false_positives
+            misses = tree.pool.misses
+            for key in range(1, 20000, 2):
+                assert key not in tree, f"奇数键 {key} 不应存在"
+            absent = 10000
+            negatives = tree.filter_negatives - negatives
+            false_positives = tree.filter_false_positives - false_positives
+            assert tree.filter_checks - checks == absent, "每次查找都应先经过过滤器"
+            assert negatives + false_positives == absent, "过滤器不应漏判存在的键"
+            assert false_positives / absent < 0.05, f"误判率过高: {false_positives / absent:.3f}"
+            stats = tree.stats()
+            print(f"  误判 {false_positives}/{absent}, 读叶子页 {tree.pool.misses - misses} 次, "
+                  f"过滤器 {stats['filters']} 个共 {stats['filter_bytes']} 字节, 命中率 {stats['filter_hit_ratio']:.3f}")
+        
+        print("3. 重新打开后按需重建过滤器...")
+        with PagedBPlusTree(path, bloom_fp_rate=0.01) as tree:
+            assert not tree.filters, "过滤器不应持久化"
+            for key in range(-10, 20010):
+                assert tree.search(key) == reference.get(key), f"重新打开后键 {key} 查找结果错误"
+            assert tree.stats()["filters"] > 0 and tree.filter_negatives > 0, "查找后应重建过滤器"
+        
+        try:
+            PagedBPlusTree(os.path.join(workdir, "bad.db"), bloom_fp_rate=1.5)
+            assert False, "非法误判率应抛出 ValueError"
+        except ValueError:
+            pass
+    
+    print("✅ 叶子布隆过滤器测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始分页B+树测试...\n")
+    
+    try:
+        test_paged_basic_operations()
+        test_paged_persistence()
+        test_paged_bloom_filter()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
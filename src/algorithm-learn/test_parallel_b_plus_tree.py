@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+并行扫描测试文件
+测试分段、进程池/线程池下的并行聚合与范围读取结果与单线程一致
+"""
+
+import random
+import sys
+from b_plus_tree import Aggregate, BPlusTree
+from parallel_b_plus_tree import ParallelScanner
+
+
+def _count_even(items) -> int:
+    """自定义分段函数：统计值为偶数的条目（模块级，可发送给工作进程）"""
+    return sum(1 for _, value in items if value % 2 == 0)
+
+
+def _first_key(a, b):
+    return b if a is None else a
+
+
+def _lift_key(key, value):
+    return key
+
+
+def test_parallel_scan() -> None:
+    """测试并行扫描与单线程结果一致"""
+    print("=== 测试并行扫描 ===")
+    
+    tree = BPlusTree(order=16)
+    for key in random.sample(range(100000), 20000):
+        tree.insert(key, key * 3)
+    items = list(tree.items())
+    
+    for use_threads in (True, False):
+        print(f"1. {'线程池' if use_threads else '进程池'}...")
+        with ParallelScanner(tree, workers=2, use_threads=use_threads) as scanner:
+            for _ in range(20):
+                lo, hi = sorted(random.sample(range(-100, 100100), 2))
+                parts = random.choice([None, 1, 3, 50])
+                window = [(k, v) for k, v in items if lo <= k <= hi]
+                assert scanner.range_query(lo, hi, parts) == window, f"范围 [{lo}, {hi}] 结果错误"
+                assert scanner.aggregate(lo, hi, "sum", parts) == sum(v for _, v in window), "并行求和错误"
+                assert scanner.aggregate(lo, hi, "max", parts) == max((v for _, v in window), default=None), "并行最大值错误"
+                partials = scanner.map_partitions(_count_even, lo, hi, parts)
+                assert sum(partials) == sum(1 for _, v in window if v % 2 == 0), "自定义分段函数错误"
+            first = Aggregate(None, _first_key, _lift_key)
+            assert scanner.aggregate(500, None, first) == next(k for k, _ in items if k >= 500), "部分结果应按键序合并"
+            assert scanner.range_query(10, 5) == [] and scanner.aggregate(10, 5) == 0, "空区间错误"
+    
+    print("2. 分段均匀...")
+    with ParallelScanner(tree, workers=1, use_threads=True) as scanner:
+        spans = scanner.partitions(None, None, 7)
+        sizes = [hi - lo for lo, hi in spans]
+        assert spans[0][0] == 0 and spans[-1][1] == len(tree), "分段应覆盖整个区间"
+        assert all(a[1] == b[0] for a, b in zip(spans, spans[1:])), "分段应首尾相接"
+        assert max(sizes) - min(sizes) <= 1, f"分段大小不均匀: {sizes}"
+    
+    print("✅ 并行扫描测试通过！")
+
+
+def test_parallel_typed_keys() -> None:
+    """测试类型化键的树放进共享内存后进程池聚合正确（耗时对比见 parallel_b_plus_tree.py 的 __main__）"""
+    print("\n=== 测试类型化键并行聚合 ===")
+    
+    tree = BPlusTree.from_sorted(((i, i) for i in range(20000)), order=64, key_type="int64")
+    with ParallelScanner(tree, workers=2, use_threads=False) as scanner:
+        assert scanner.aggregate(0, None, "sum") == 19999 * 20000 // 2, "并行求和结果错误"
+        assert scanner.aggregate(100, 199, "sum", parts=4) == sum(range(100, 200)), "区间并行求和错误"
+    
+    print("✅ 类型化键并行聚合测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始并行扫描测试...\n")
+    
+    try:
+        test_parallel_scan()
+        test_parallel_typed_keys()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+字节键B+树测试文件
+测试保序编码、前缀压缩叶子与截断分隔键下的各项操作，以及键占用的字节数与查找速度
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from b_plus_tree import BPlusTree
+from prefix_b_plus_tree import PrefixBPlusTree, PrefixKeys, decode_key, encode_key, shortest_separator
+
+
+def _check_tree(tree: PrefixBPlusTree) -> None:
+    """检查叶子前缀与内部分隔键的不变式：左子树的键 < 分隔键 <= 右子树的键"""
+    stack = [(tree.root, None, None)]
+    while stack:
+        node, low, high = stack.pop()
+        keys = list(node.keys)
+        assert keys == sorted(keys), "节点内的键无序"
+        assert all((low is None or low <= key) and (high is None or key < high) for key in keys), "键越过分隔键"
+        if node.is_leaf:
+            assert isinstance(node.keys, PrefixKeys), "叶子键未压缩"
+            assert all(key.startswith(node.keys.prefix) for key in keys), "叶子前缀错误"
+        else:
+            bounds = [low] + keys + [high]
+            for i, child in enumerate(node.children):
+                stack.append((child, bounds[i], bounds[i + 1]))
+
+
+def test_key_encoding() -> None:
+    """测试编码保序且可以还原"""
+    print("=== 测试保序编码 ===")
+    
+    print("1. 还原...")
+    for value in [None, b'', b'a\x00b', '', 'a\x00', 'é😀', 0, 1, -1, 255, -256, 2 ** 70, -2 ** 70,
+                  -1.5, 0.0, float('inf'), (1, None), ('x', (None, b'z'))]:
+        expected = value if isinstance(value, tuple) else (value,)
+        assert decode_key(encode_key(value)) == expected, f"{value!r} 还原错误"
+    assert encode_key(-0.0) == encode_key(0.0), "-0.0 与 0.0 应编码相同"
+    
+    print("2. 保序...")
+    rows = [(random.choice(['t', 't1', 't\x00', 'tenant-é']), random.randint(-2 ** 40, 2 ** 40),
+             random.choice([b'', b'a', b'a\x00', b'a\x00\x01']), random.uniform(-1e6, 1e6))
+            for _ in range(5000)]
+    rows = [row[:random.randint(1, 4)] if random.random() < 0.2 else row for row in rows]
+    assert sorted(rows, key=encode_key) == sorted(rows), "元组编码后的顺序错误"
+    numbers = [random.randint(-2 ** 80, 2 ** 80) for _ in range(2000)] + list(range(-300, 300))
+    assert sorted(numbers, key=encode_key) == sorted(numbers), "整数编码后的顺序错误"
+    floats = [random.uniform(-1e9, 1e9) for _ in range(2000)] + [float('-inf'), 1e-300, -1e-300, 0.0]
+    assert sorted(floats, key=encode_key) == sorted(floats), "浮点数编码后的顺序错误"
+    
+    print("3. 最短分隔键...")
+    for _ in range(2000):
+        left, right = sorted(random.sample([bytes(random.choices(b'ab\x00', k=random.randint(0, 6)))
+                                            for _ in range(2)], 2))
+        if left == right:
+            continue
+        sep = shortest_separator(left, right)
+        assert left < sep <= right and right.startswith(sep), f"{left!r} 与 {right!r} 的分隔键 {sep!r} 错误"
+    
+    print("✅ 保序编码测试通过！")
+
+
+def test_prefix_tree() -> None:
+    """测试前缀压缩树与普通树结果一致"""
+    print("=== 测试前缀压缩树 ===")
+    
+    def url(i: int) -> bytes:
+        return encode_key(f"https://example.com/tenant/{i % 7}/users/{i:06d}")
+    
+    print("1. 随机插入与删除...")
+    tree, reference = PrefixBPlusTree(order=5), BPlusTree(order=5)
+    for _ in range(4000):
+        i = random.randint(0, 3000)
+        if random.random() < 0.3:
+            assert tree.delete(url(i)) == reference.delete(url(i)), "删除结果错误"
+        else:
+            tree.insert(url(i), i)
+            reference.insert(url(i), i)
+    _check_tree(tree)
+    assert list(tree.items()) == list(reference.items()), "内容与普通树不一致"
+    for i in range(0, 3000, 7):
+        assert tree.search(url(i)) == reference.search(url(i)), f"键 {i} 查找错误"
+    lo, hi = sorted([url(100), url(2000)])
+    assert tree.range_query(lo, hi) == reference.range_query(lo, hi), "范围查询错误"
+    assert list(tree.iter_range(lo, hi, reverse=True)) == list(reference.iter_range(lo, hi, reverse=True)), "逆序范围错误"
+    assert tree.range_keys(lo, hi) == reference.range_keys(lo, hi), "range_keys 错误"
+    assert tree.rank(hi) == reference.rank(hi) and tree.select(17) == reference.select(17), "顺序统计错误"
+    
+    print("2. 批量操作、快照与切分...")
+    snap = tree.snapshot()
+    before = list(tree.items())
+    batch = [(url(i), -i) for i in random.sample(range(6000), 1500)]
+    tree.put_many(batch)
+    reference.put_many(batch)
+    doomed = [url(i) for i in random.sample(range(6000), 1500)]
+    tree.delete_many(doomed)
+    reference.delete_many(doomed)
+    _check_tree(tree)
+    assert list(tree.items()) == list(reference.items()), "批量操作后内容错误"
+    assert list(snap.items()) == before, "快照被修改"
+    middle = url(3000)
+    right = tree.split_at(middle)
+    _check_tree(tree)
+    _check_tree(right)
+    assert all(key < middle for key in tree) and all(key >= middle for key in right), "split_at 错误"
+    tree.concat(right)
+    _check_tree(tree)
+    assert list(tree.items()) == list(reference.items()), "concat 后内容错误"
+    
+    print("3. from_sorted、dump/load 与冻结...")
+    built = PrefixBPlusTree.from_sorted(reference.items(), order=16)
+    _check_tree(built)
+    assert list(built.items()) == list(reference.items()), "from_sorted 错误"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "prefix.bpt")
+        built.dump(path)
+        loaded = PrefixBPlusTree.load(path)
+    _check_tree(loaded)
+    assert list(loaded.items()) == list(reference.items()), "load 错误"
+    assert loaded.freeze().traverse() == reference.traverse(), "冻结错误"
+    
+    print("4. 聚合与类型检查...")
+    counted = PrefixBPlusTree(order=4, aggregates=["count"])
+    for i in range(500):
+        counted.insert(url(i), i)
+    assert counted.aggregate(url(10), url(20), "count") == sum(1 for i in range(500) if url(10) <= url(i) <= url(20)), "聚合错误"
+    for bad in ("str", 1):
+        try:
+            counted.insert(bad, 0)
+            assert False, "非 bytes 键应抛出 TypeError"
+        except TypeError:
+            pass
+    try:
+        PrefixBPlusTree(key_type="int64")
+        assert False, "key_type 应被拒绝"
+    except ValueError:
+        pass
+    
+    print("✅ 前缀压缩树测试通过！")
+
+
+def test_prefix_tree_footprint() -> None:
+    """对比键占用的字节数与查找耗时"""
+    print("=== 测试键字节数与查找耗时 ===")
+    
+    n = 100000
+    # (租户, URL, 时间戳)：同一叶子内共享租户和 URL 的固定部分，相邻叶子在 URL 中部就能区分
+    rows = [(f"tenant-{i % 50:04d}", f"https://example.com/u/{random.getrandbits(64):016x}/profile/settings",
+             1700000000000 + i) for i in range(n)]
+    plain = BPlusTree(order=64)
+    tuples = BPlusTree(order=64)
+    tree = PrefixBPlusTree(order=64)
+    for row in rows:
+        key = encode_key(row)
+        plain.insert(key, None)
+        tuples.insert(row, None)
+        tree.insert(key, None)
+    
+    stats = tree.key_bytes()
+    plain_internal = 0
+    stack = [plain.root]
+    while stack:
+        node = stack.pop()
+        if not node.is_leaf:
+            plain_internal += sum(map(len, node.keys))
+            stack.extend(node.children)
+    print(f"  叶子键: 原始 {stats['leaf_raw'] // 1024} KB, 前缀压缩后 {stats['leaf_stored'] // 1024} KB")
+    print(f"  内部分隔键: 完整键 {plain_internal // 1024} KB, 截断后 {stats['internal'] // 1024} KB")
+    assert stats['leaf_stored'] * 3 < stats['leaf_raw'] * 2, "前缀压缩应明显减少叶子键字节数"
+    assert stats['internal'] * 3 < plain_internal * 2, "截断分隔键应明显缩小内部节点"
+    
+    probes = random.sample(rows, 50000)
+    encoded = [encode_key(row) for row in probes]
+    start = time.perf_counter()
+    for row in probes:
+        tuples.search(row)
+    tuple_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in encoded:
+        tree.search(key)
+    prefix_time = time.perf_counter() - start
+    print(f"  5 万次点查: 元组键 {tuple_time * 1000:.0f} 毫秒, 编码后的字节键 {prefix_time * 1000:.0f} 毫秒")
+    assert prefix_time < tuple_time * 1.5, "字节键查找不应明显慢于元组键"
+    
+    print("✅ 键字节数测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始字节键B+树测试...\n")
+    
+    try:
+        test_key_encoding()
+        test_prefix_tree()
+        test_prefix_tree_footprint()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+B+树键值服务测试文件
+在本机的 TCP 端口和 Unix socket 上测试读写、流水线、点查合并、流式范围查询、错误处理与连接池
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from b_plus_tree import BPlusTree
+from concurrent_b_plus_tree import ConcurrentBPlusTree
+from server_b_plus_tree import TreeClient, TreeServer
+
+
+async def _basic_operations() -> None:
+    reference = {}
+    async with TreeServer(BPlusTree(order=8)) as server:
+        host, port = server.address
+        async with TreeClient(host, port, pool_size=3) as client:
+            print("1. 读写...")
+            for _ in range(2000):
+                key = random.randint(0, 999)
+                if random.random() < 0.3:
+                    assert await client.delete(key) == (reference.pop(key, None) is not None), "删除结果错误"
+                else:
+                    await client.put(key, f"v{key}")
+                    reference[key] = f"v{key}"
+            assert await client.size() == len(reference), "键数错误"
+            assert await client.get(-1) is None, "不存在的键应返回 None"
+            assert await client.get_many(range(1000)) == [reference.get(k) for k in range(1000)], "get_many 错误"
+            
+            print("2. 流水线与合并...")
+            keys = [random.randint(0, 999) for _ in range(5000)]
+            batches = server.stats['batches']
+            values = await asyncio.gather(*(client.get(key) for key in keys))
+            assert values == [reference.get(key) for key in keys], "并发点查结果错误"
+            used = server.stats['batches'] - batches
+            print(f"  5000 次并发点查合并为 {used} 次 get_many")
+            assert used <= 5000 // 50, "并发点查应被合并成少量批次"
+            
+            # 同一连接上流水线的先写后读按顺序生效
+            single = client._connection()
+            futures = [single.send('put', 5000, 'a'), single.send('get', 5000), single.send('delete', 5000),
+                       single.send('get', 5000)]
+            assert await asyncio.gather(*futures) == [None, 'a', True, None], "流水线请求未按顺序生效"
+            
+            print("3. 流式范围查询...")
+            expected = sorted(reference.items())
+            assert await client.range_query() == expected, "全范围查询错误"
+            assert await client.range_query(100, 600) == [(k, v) for k, v in expected if 100 <= k <= 600], "范围查询错误"
+            assert await client.range_query(limit=7, reverse=True) == expected[::-1][:7], "逆序 limit 错误"
+            assert await client.range_query(2000, 3000) == [], "空范围错误"
+            
+            print("4. 错误处理...")
+            try:
+                await client.get('not comparable')
+                assert False, "无法比较的键应返回错误"
+            except RuntimeError as e:
+                assert "TypeError" in str(e), "错误信息应包含异常类型"
+            assert await client.get(min(reference)) == reference[min(reference)], "出错后连接应继续可用"
+            try:
+                await client._call('drop_table')
+                assert False, "未知操作应返回错误"
+            except RuntimeError:
+                pass
+
+
+async def _streaming_snapshot() -> None:
+    tree = BPlusTree.from_sorted(((k, k) for k in range(50000)), order=32)
+    async with TreeServer(tree, range_chunk=100) as server:
+        host, port = server.address
+        async with TreeClient(host, port, pool_size=2) as client:
+            seen = []
+            writes = 0
+            async for key, value in client.range(0, 20000):
+                seen.append(key)
+                if len(seen) % 1000 == 0:
+                    # 扫描进行中删除和插入，已开始的扫描不受影响
+                    await client.delete(len(seen) + 5000)
+                    await client.put(len(seen) + 0.5, -1)
+                    writes += 1
+            assert seen == list(range(20001)), "流式范围应读到请求到达时的快照"
+            assert writes == 20 and await client.size() == 50000, "扫描期间的写入应生效"
+            assert await client.get(6000) is None and await client.get(1000.5) == -1, "写入结果错误"
+            
+            # 提前停止迭代的范围不影响之后的请求
+            async for key, _ in client.range():
+                if key > 10:
+                    break
+            assert await client.get(3) == 3, "中断的范围查询后连接应继续可用"
+        
+        # 流量控制：单个连接、慢消费者，客户端缓存的块不超过窗口，同一连接上的其他请求不被阻塞
+        async with TreeClient(host, port, pool_size=1, range_window=2) as client:
+            connection = client._connection()
+            scan = client.range()
+            assert (await scan.__anext__()) == (0, 0), "范围首项错误"
+            request_id = connection.next_id
+            await asyncio.sleep(0.05)
+            assert connection.waiters[request_id].qsize() <= 2, "客户端缓存的块应不超过窗口"
+            (stream,) = server._streams.values()
+            assert stream.credits == 0, "服务端应在信用用完后暂停"
+            assert await client.get(49999) == 49999, "范围暂停时同一连接上的点查应正常返回"
+            
+            await scan.aclose()
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+                if not server._streams:
+                    break
+            assert request_id not in connection.waiters, "关闭范围迭代后应注销等待者"
+            assert not server._streams, "关闭范围迭代后服务端应取消发送"
+            assert await client.range_query(10, 12) == [(10, 10), (11, 11), (12, 12)], "取消后新的范围查询错误"
+
+
+async def _unix_socket_and_failures() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.sock")
+        async with TreeServer(ConcurrentBPlusTree(order=8), path=path) as server:
+            assert server.address == path, "Unix socket 地址错误"
+            async with TreeClient(path=path, pool_size=2) as client:
+                await asyncio.gather(*(client.put(k, k * k) for k in range(500)))
+                assert await client.range_query(10, 20) == [(k, k * k) for k in range(10, 21)], \
+                    "不支持快照的树应一次性返回范围结果"
+                assert await client.get(499) == 499 * 499, "Unix socket 点查错误"
+            
+            client = TreeClient(path=path, pool_size=1)
+            await client.connect()
+            connection = client._connection()
+            await server.close()
+            connection.writer.transport.abort()
+            try:
+                await client.get(1)
+                assert False, "连接断开后请求应失败"
+            except ConnectionError:
+                pass
+            await client.close()
+
+
+async def _throughput() -> None:
+    tree = BPlusTree.from_sorted(((k, k) for k in range(100000)), order=64)
+    keys = [random.randrange(100000) for _ in range(20000)]
+    async with TreeServer(tree) as server:
+        host, port = server.address
+        async with TreeClient(host, port, pool_size=4) as client:
+            start = time.perf_counter()
+            for key in keys[:2000]:
+                await client.get(key)
+            serial = (time.perf_counter() - start) / 2000
+            start = time.perf_counter()
+            for i in range(0, len(keys), 1000):
+                await asyncio.gather(*(client.get(key) for key in keys[i:i + 1000]))
+            pipelined = (time.perf_counter() - start) / len(keys)
+    print(f"  每次点查: 逐个等待 {serial * 1e6:.0f} us, 流水线 {pipelined * 1e6:.0f} us")
+    assert pipelined < serial, "流水线应提高吞吐量"
+
+
+def test_server_operations() -> None:
+    """测试读写、流水线合并、范围查询与错误处理"""
+    print("=== 测试键值服务 ===")
+    asyncio.run(_basic_operations())
+    print("✅ 键值服务测试通过！")
+
+
+def test_server_streaming() -> None:
+    """测试流式范围查询读到快照，以及 Unix socket 与断开连接"""
+    print("=== 测试流式范围与 Unix socket ===")
+    asyncio.run(_streaming_snapshot())
+    asyncio.run(_unix_socket_and_failures())
+    print("✅ 流式范围与 Unix socket 测试通过！")
+
+
+def test_server_throughput() -> None:
+    """对比逐个等待与流水线的点查耗时"""
+    print("=== 测试流水线吞吐量 ===")
+    asyncio.run(_throughput())
+    print("✅ 流水线吞吐量测试通过！")
+
+
+def main() -> None:
+    """运行所有测试"""
+    print("开始B+树键值服务测试...\n")
+    
+    try:
+        test_server_operations()
+        test_server_streaming()
+        test_server_throughput()
+        
+        print("\n" + "="*50)
+        print("🎉 所有测试通过！")
+        print("="*50)
+    
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()